@@ -12,7 +12,11 @@
 # See the License for the specific language governing permissions and
 # limitations under the License.
 import sys
+import time
+
+# Start of the cold start, reported by AgentEngineApp.set_up
+IMPORT_STARTED = time.perf_counter()
 sys.path.append('/code/app/')
-from .agent import root_agent
+from .agent import root_agent  # noqa: E402
 
 __all__ = ["root_agent"]
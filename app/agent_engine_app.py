@@ -13,8 +13,12 @@
 # limitations under the License.
 
 # mypy: disable-error-code="attr-defined,arg-type"
+import asyncio
+import atexit
 import logging
 import os
+import time
+from collections.abc import AsyncIterator, Callable
 from typing import (
     Any,
     AsyncIterable,
@@ -26,37 +30,50 @@ from typing import (
 import click
 import google.auth
 import vertexai
-from google.adk.artifacts import GcsArtifactService
-from google.cloud import logging as google_cloud_logging
 from opentelemetry import trace
 from opentelemetry.sdk.trace import TracerProvider, export
 from vertexai._genai.types import AgentEngine, AgentEngineConfigDict
 from vertexai.agent_engines.templates.adk import AdkApp
 
+from app import IMPORT_STARTED
 from app.agent import root_agent
-from google.adk.tools.preload_memory_tool import preload_memory_tool
 
 from app.utils.deployment import (
     parse_env_vars,
     print_deployment_success,
     write_deployment_metadata,
 )
-from app.utils.gcs import create_bucket_if_not_exists
+from app.utils.admission import AdmissionController, AdmissionRejected
+from app.utils.context_cache import apply_context_cache, context_cache_config_from_env
+from app.utils.context_window import ContextPolicy, ContextWindowPlugin
+from app.utils.feedback import FeedbackPipeline
+from app.utils.memory_payload import CompactionPolicy, compact_events
+from app.utils.metrics import metrics
+from app.utils.resilience import get_policy
+from app.utils.speculation import enabled_kinds, speculator
+from app.utils.streaming import StreamingPolicy, shape_stream
+from app.utils.structured_logging import CorrelationPlugin, configure_logging
+from app.utils.sessions import (
+    CachingSessionService,
+    SessionServiceBuilder,
+    WriteBehindSessionService,
+)
 from app.utils.tracing import CloudTraceLoggingSpanExporter
 from app.utils.typing import Feedback
+from app.utils.warmup import run_warmup
 
 import functools
-from google.adk.sessions import DatabaseSessionService #VertexAiSessionService, InMemorySessionService
-from google.adk.sessions import VertexAiSessionService
+from google.adk.sessions import BaseSessionService, VertexAiSessionService
 
 from google.adk.memory.base_memory_service import BaseMemoryService
 from google.adk.memory.base_memory_service import SearchMemoryResponse
 from google.adk.memory.memory_entry import MemoryEntry
 from typing_extensions import override
 from google.genai import types
-from typing import Optional
 from google.adk.sessions.session import Session
 
+logger = logging.getLogger(__name__)
+
 class CustomMemoryBankService(BaseMemoryService):
   """Implementation of the BaseMemoryService using Vertex AI Memory Bank."""
 
@@ -69,26 +86,27 @@ class CustomMemoryBankService(BaseMemoryService):
     self._project = project
     self._location = location
     self._agent_engine_id = agent_engine_id
+    self._api_client = None
+    self._compaction_policy = CompactionPolicy.from_env()
 
   @override
   async def add_session_to_memory(self, session: Session):
     if not self._agent_engine_id:
       raise ValueError('Agent Engine ID is required for Memory Bank.')
     
-    print('[CustomMemoryBankService] add_session_to_memory received.')
-
-    events = []
-    for event in session.events:
-      if self._should_filter_out_event(event.content):
-        continue
-      if event.content:
-        events.append({
-            'content': event.content.model_dump(exclude_none=True, mode='json')
-        })
+    logger.debug('add_session_to_memory received')
+
+    # Only what the user said and was answered, truncated, deduplicated and
+    # capped: generation latency and cost grow with the payload
+    events = compact_events(session.events, self._compaction_policy)
     if events:
       client = self._get_api_client()
-      print(f"[CustomMemoryBankService] Generating memory...")
-      operation = client.agent_engines.memories.generate(
+      logger.info('Generating memories from %d events', len(events))
+      # Off the event loop, retried on 429/5xx; skipped while Memory Bank is down
+      operation = await asyncio.to_thread(
+          get_policy("memory_bank_generate").call,
+          client.agent_engines.memories.generate,
+          fallback=self._skip_generation,
           name='reasoningEngines/' + self._agent_engine_id,
           direct_contents_source={'events': events},
           scope={
@@ -102,28 +120,63 @@ class CustomMemoryBankService(BaseMemoryService):
       )
       #print(f"[CustomMemoryBankService] {operation}")
     else:
-      print('[CustomMemoryBankService] No events to add to memory.')
+      logger.debug('No events to add to memory')
 
   @override
   async def search_memory(self, *, app_name: str, user_id: str, query: str):
     if not self._agent_engine_id:
       raise ValueError('Agent Engine ID is required for Memory Bank.')
 
-    print('[CustomMemoryBankService] Search memory received.')
-    
+    logger.debug('search_memory received')
+    # preload_memory searches with the user message on every model call of
+    # the turn, served by the retrieval started with the turn
+    speculated = speculator.get('memory', (app_name, user_id, query))
+    if speculated is not None:
+      return await asyncio.shield(speculated)
+    return await self._search_memory(app_name=app_name, user_id=user_id, query=query)
+
+  def prefetch(self, *, app_name: str, user_id: str, query: str) -> None:
+    """Start retrieving the memories of `query` in the current speculation turn."""
+    if not self._agent_engine_id:
+      return
+    speculator.start(
+        'memory',
+        (app_name, user_id, query),
+        lambda: asyncio.ensure_future(
+            self._search_memory(app_name=app_name, user_id=user_id, query=query)
+        ),
+    )
+
+  async def list_memories(self, *, app_name: str, user_id: str) -> SearchMemoryResponse:
+    """Every memory of the user, used to load them into a local tier."""
+    return await self._search_memory(app_name=app_name, user_id=user_id, query=None)
+
+  async def _search_memory(
+      self, *, app_name: str, user_id: str, query: str | None
+  ) -> SearchMemoryResponse:
+    if not self._agent_engine_id:
+      raise ValueError('Agent Engine ID is required for Memory Bank.')
+    name = 'reasoningEngines/' + self._agent_engine_id
+
     client = self._get_api_client()
-    retrieved_memories_iterator = client.agent_engines.memories.retrieve(
-        name='reasoningEngines/' + self._agent_engine_id,
-        scope={
-            'app_name': app_name,
-            'user_id': user_id,
-        },
-        similarity_search_params={
-            'search_query': query,
-        },
+    # Without a query, retrieval returns all the memories of the scope
+    search_params = {'similarity_search_params': {'search_query': query}} if query else {}
+    # Memories only enrich the prompt, so the turn goes on without them
+    # when Memory Bank is throttled or down
+    retrieved_memories_iterator = await asyncio.to_thread(
+        get_policy("memory_bank_retrieve").call,
+        lambda: list(client.agent_engines.memories.retrieve(
+            name=name,
+            scope={
+                'app_name': app_name,
+                'user_id': user_id,
+            },
+            **search_params,
+        )),
+        fallback=lambda e: [],
     )
 
-    print(f'[CustomMemoryBankService] Retrieving {len(retrieved_memories_iterator)} memories')
+    logger.info('Retrieved %d memories', len(retrieved_memories_iterator))
     memory_events = []
     for retrieved_memory in retrieved_memories_iterator:
       # TODO: add more complex error handling
@@ -139,58 +192,231 @@ class CustomMemoryBankService(BaseMemoryService):
       )
     return SearchMemoryResponse(memories=memory_events)
   
+  def _skip_generation(self, error: BaseException) -> None:
+    logger.warning('Memory generation skipped: %s', error)
+
   def _get_api_client(self):
-    return vertexai.Client(project=self._project, location=self._location)
-  
-  def _should_filter_out_event(self, content: types.Content) -> bool:
-    """Returns whether the event should be filtered out."""
-    if not content or not content.parts:
-        return True
-    for part in content.parts:
-        if part.text or part.inline_data or part.file_data:
-            return False
-    return True
+    # Built once per replica (prebuilt by the set_up warmup)
+    if self._api_client is None:
+      self._api_client = vertexai.Client(project=self._project, location=self._location)
+    return self._api_client
+
+def build_memory_service(
+    project: str | None = None, location: str | None = None
+) -> BaseMemoryService:
+  """Memory service selected by MEMORY_BACKEND at runtime.
+
+  - memory_bank (default): Vertex AI Memory Bank
+  - local: in-process vector index, no Memory Bank (local runs and tests)
+  - tiered: local index for hot users, Memory Bank on miss
+
+  The local index uses MEMORY_EMBEDDER and is persisted under the
+  MEMORY_LOCAL_PATH directory when set.
+  """
+  backend = os.environ.get('MEMORY_BACKEND', 'memory_bank').lower()
+  if backend == 'memory_bank':
+    return CustomMemoryBankService(project=project, location=location)
+  from app.utils.vector_memory import (
+      LocalVectorMemoryService,
+      TieredMemoryService,
+      embedder_from_env,
+  )
+
+  local = LocalVectorMemoryService(
+      embedder=embedder_from_env(), path=os.environ.get('MEMORY_LOCAL_PATH')
+  )
+  if backend == 'local':
+    return local
+  if backend == 'tiered':
+    return TieredMemoryService(
+        CustomMemoryBankService(project=project, location=location),
+        local,
+        max_hot_users=int(os.environ.get('MEMORY_MAX_HOT_USERS', '1000')),
+        hot_ttl_seconds=float(os.environ.get('MEMORY_HOT_TTL_SECONDS', '3600')),
+    )
+  raise ValueError(f'Unsupported MEMORY_BACKEND: {backend}')
+
 
 #Configuration for AgentEngine specific configuration, memory_bank, trace and so on
 class AgentEngineApp(AdkApp):
+    def __init__(self, *, context_policy: ContextPolicy | None = None, **kwargs: Any) -> None:
+        """Adds the context window plugin bounding the history sent to models,
+        the plugin binding correlation ids to logs, and the optional session
+        service layers of `SessionServiceBuilder`.
+
+        Args:
+            context_policy: History limits, defaults to ContextPolicy.from_env()
+                read at runtime
+        """
+        plugins = list(kwargs.pop("plugins", None) or [])
+        if not kwargs.get("app") and not any(
+            isinstance(plugin, ContextWindowPlugin) for plugin in plugins
+        ):
+            plugins.append(ContextWindowPlugin(context_policy))
+        if not kwargs.get("app") and not any(
+            isinstance(plugin, CorrelationPlugin) for plugin in plugins
+        ):
+            plugins.append(CorrelationPlugin())
+        builder = kwargs.get("session_service_builder")
+        if builder and not isinstance(builder, SessionServiceBuilder):
+            kwargs["session_service_builder"] = SessionServiceBuilder(builder)
+        super().__init__(plugins=plugins or None, **kwargs)
+
     def set_up(self) -> None:
         """Set up logging and tracing for the agent engine app."""
         #Update memory_bank to point agent engine
 
-        import logging
+        set_up_started = time.perf_counter()
         super().set_up()
+        # ADK context caching of the prompt and history prefix; the runners are
+        # built without an ADK App since the engine id is not a valid App name
+        apply_context_cache(
+            [self._tmpl_attrs.get("runner"), self._tmpl_attrs.get("in_memory_runner")],
+            context_cache_config_from_env(),
+        )
 
         #TODO: manually update engine_id of memory service after created,
         self.memory_service = self._tmpl_attrs["memory_service"]
-        self.memory_service._agent_engine_id = os.environ.get("GOOGLE_CLOUD_AGENT_ENGINE_ID")
-        
-        logging.basicConfig(level=logging.INFO)
-        logging_client = google_cloud_logging.Client()
-        self.logger = logging_client.logger(__name__)
+        memory_bank = self._memory_bank()
+        if memory_bank is not None:
+            memory_bank._agent_engine_id = os.environ.get("GOOGLE_CLOUD_AGENT_ENGINE_ID")
+        # Admission control of this replica, configured by ADMISSION_* at runtime
+        self._admission = AdmissionController.from_env()
+
+        # JSON lines written off the request thread, LOG_LEVEL/LOG_LEVELS per module
+        configure_logging()
+        self._warmup()
         provider = TracerProvider()
-        processor = export.BatchSpanProcessor(
-            CloudTraceLoggingSpanExporter(
-                project_id=os.environ.get("GOOGLE_CLOUD_PROJECT"),
-            )
+        span_exporter: export.SpanExporter = CloudTraceLoggingSpanExporter(
+            project_id=os.environ.get("GOOGLE_CLOUD_PROJECT"),
         )
+        spool_path = os.environ.get("TRACE_SPOOL_PATH")
+        if spool_path:
+            # Spans are spooled to a local file and exported in the background,
+            # so slow telemetry backends never block or drop them
+            from app.utils.span_spool import SpoolingSpanExporter
+
+            span_exporter = SpoolingSpanExporter(
+                span_exporter,
+                spool_path,
+                capacity_bytes=int(os.environ.get("TRACE_SPOOL_BYTES", str(64 * 1024 * 1024))),
+            )
+        processor = export.BatchSpanProcessor(span_exporter)
         provider.add_span_processor(processor)
         trace.set_tracer_provider(provider)
+        metrics.set_gauge("startup.set_up_ms", (time.perf_counter() - set_up_started) * 1000)
+        metrics.set_gauge("startup.cold_start_ms", (time.perf_counter() - IMPORT_STARTED) * 1000)
+
+    def _app_name(self) -> str:
+        """App name sessions and memories are scoped by, resolved as AdkApp does."""
+        app = self._tmpl_attrs.get("app")
+        return app.name if app else self._tmpl_attrs["app_name"]
+
+    def _memory_bank(self) -> CustomMemoryBankService | None:
+        """The Memory Bank service in use, alone or as the remote tier."""
+        service = getattr(self.memory_service, "remote", self.memory_service)
+        return service if isinstance(service, CustomMemoryBankService) else None
+
+    def _warmup(self) -> None:
+        """Build clients, credentials and caches concurrently before the first query.
+
+        STARTUP_WARMUP=false skips the optional tasks; the Cloud Logging client
+        used by register_feedback is always built.
+        """
+
+        def cloud_logging() -> Any:
+            from google.cloud import logging as google_cloud_logging
+
+            return google_cloud_logging.Client().logger(__name__)
+
+        def credentials() -> None:
+            from google.auth.transport.requests import Request
+
+            creds, _ = google.auth.default()
+            creds.refresh(Request())
+
+        def drive() -> None:
+            # Imports googleapiclient and parses the Drive discovery document
+            from app.utils.drive import drive_discovery_document
+
+            drive_discovery_document()
+
+        tasks: dict[str, Any] = {"cloud_logging": cloud_logging}
+        if os.environ.get("STARTUP_WARMUP", "true").lower() == "true":
+            tasks.update(
+                credentials=credentials,
+                drive=drive,
+            )
+            if (memory_bank := self._memory_bank()) is not None:
+                tasks["memory_bank_client"] = memory_bank._get_api_client
+        results = run_warmup(tasks)
+        self.logger = results.get("cloud_logging") or cloud_logging()
+        self.feedback = FeedbackPipeline.from_env(self.logger)
+        # Best effort: entries still queued at shutdown are written on exit
+        atexit.register(self.feedback.flush, 5.0)
 
     #Custom function to expose
     def register_feedback(self, feedback: dict[str, Any]) -> None:
-        """Collect and log feedback."""
+        """Collect feedback, logged to Cloud Logging in batches off the request path."""
         feedback_obj = Feedback.model_validate(feedback)
-        self.logger.log_struct(feedback_obj.model_dump(), severity="INFO")
+        self.feedback.submit(feedback_obj)
+
+    def get_feedback_summary(
+        self, group_by: str = "agent", last_seconds: int | None = None
+    ) -> dict[str, Any]:
+        """Return the score histograms of the recent feedback of this replica.
+
+        Args:
+            group_by: "agent", "invocation" or "window"
+            last_seconds: Only include recent feedback, defaults to all the
+                retained windows (one hour by default)
+        """
+        return self.feedback.aggregates.summary(group_by, last_seconds)
+
+    def get_metrics(self) -> dict[str, Any]:
+        """Return the in-process counters and latency summaries of this replica."""
+        return metrics.snapshot()
 
     def register_operations(self) -> dict[str, list[str]]:
         """Registers the operations of the Agent.
 
-        Extends the base operations to include feedback registration functionality.
+        Extends the base operations to include feedback registration, feedback
+        summaries and metrics retrieval functionality.
         """
         operations = super().register_operations()
-        operations[""] = operations.get("", []) + ["register_feedback"]
+        operations[""] = operations.get("", []) + [
+            "register_feedback",
+            "get_feedback_summary",
+            "get_metrics",
+        ]
         return operations
     
+    def _speculate(self, message: str | dict[str, Any], user_id: str) -> None:
+        """Start the memory retrieval and recipe search the agents will probably
+        make, while root_agent and user_requirement_agent are still reasoning.
+
+        Results are used only by requests with exactly the speculated
+        parameters and discarded at the end of the turn; the hit rates are
+        published as speculation.<kind>.hit_rate.
+        """
+        kinds = enabled_kinds()
+        text: str | None
+        if isinstance(message, str):
+            text = message
+        else:
+            parts = message.get("parts") or [{}]
+            text = parts[0].get("text") if isinstance(parts[0], dict) else None
+        if not kinds or not text:
+            return
+        if "memory" in kinds and hasattr(self.memory_service, "prefetch"):
+            # Same query as preload_memory_tool: the first text part of the message
+            self.memory_service.prefetch(app_name=self._app_name(), user_id=user_id, query=text)
+        if "search" in kinds:
+            # Shares the module state of the tool, imported the same way as app.agent
+            from sub_agents.Recipe_Finder.agent import speculate_recipe_search
+
+            speculate_recipe_search(text)
+
     async def async_stream_query(
         self,
         *,
@@ -198,11 +424,54 @@ class AgentEngineApp(AdkApp):
         user_id: str,
         session_id: Optional[str] = None,
         run_config: Optional[Dict[str, Any]] = None,
-        **kwargs,
+        **kwargs: Any,
     ) -> AsyncIterable[Dict[str, Any]]:
-       async for item in super().async_stream_query(message=message, user_id=user_id, 
-                                         session_id=session_id, run_config=run_config, **kwargs):
-           yield item
+       # Rejected at once when the user or the replica is saturated, with a
+       # retry hint as the only event; queued fairly between users otherwise
+       admission = self._admission
+       try:
+           admitted = await admission.acquire(user_id)
+       except AdmissionRejected as e:
+           logger.warning('Turn not admitted: %s', e)
+           yield e.event()
+           return
+       try:
+           async for item in self._stream_turn(message=message, user_id=user_id,
+                                               session_id=session_id, run_config=run_config, **kwargs):
+               yield item
+       finally:
+           admission.release(admitted)
+
+    async def _stream_turn(
+        self,
+        *,
+        message: str | dict[str, Any],
+        user_id: str,
+        session_id: str | None = None,
+        run_config: dict[str, Any] | None = None,
+        **kwargs: Any,
+    ) -> AsyncIterator[dict[str, Any]]:
+       if not session_id and kwargs.get("session_events") is None:
+           # Created here so that the session can be found again after the turn
+           session = await self.async_create_session(user_id=user_id)
+           session_id = session.id
+       # Partial events of the user-visible agents, in chunks of STREAM_FLUSH_MS
+       streaming = StreamingPolicy.from_env()
+       with speculator.turn(object()):
+           self._speculate(message, user_id)
+           stream = super().async_stream_query(message=message, user_id=user_id,
+                                             session_id=session_id, run_config=streaming.run_config(run_config), **kwargs)
+           async for item in shape_stream(stream, streaming):
+               yield item
+       if not session_id:
+           # Session created from session_events by the base class, id unknown
+           return
+       # Events buffered by the write-behind layer are persisted once the
+       # whole turn has been streamed
+       session_service = self._tmpl_attrs["session_service"]
+       if isinstance(session_service, (CachingSessionService, WriteBehindSessionService)):
+           await session_service.flush(session_id)
+       # Served by the session cache, when enabled, which saw every event of the turn
        session = await super().async_get_session(user_id=user_id, session_id=session_id)
        await self.memory_service.add_session_to_memory(session)
 
@@ -253,6 +522,114 @@ class AgentEngineApp(AdkApp):
     default="global",
     help="Gemini model location for the agent engine (ADK and Memory Bank, defaults to global)",
 )
+@click.option(
+    "--context-max-events",
+    default=None,
+    type=int,
+    help="Maximum conversation contents sent per model call, 0 for no limit (defaults to 40)",
+)
+@click.option(
+    "--context-max-tokens",
+    default=None,
+    type=int,
+    help="Token budget of the conversation history per model call, 0 for no limit (defaults to 32000)",
+)
+@click.option(
+    "--context-summary",
+    default=None,
+    type=click.Choice(["none", "extractive", "llm"]),
+    help="How history dropped from the window is summarized (defaults to extractive)",
+)
+@click.option(
+    "--db-pool-size",
+    default=None,
+    type=int,
+    help="Connections kept open to the session database (defaults to 5)",
+)
+@click.option(
+    "--db-max-overflow",
+    default=None,
+    type=int,
+    help="Connections allowed above the pool size under load (defaults to 10)",
+)
+@click.option(
+    "--db-pool-pre-ping/--no-db-pool-pre-ping",
+    default=None,
+    help="Check pooled connections before use (defaults to enabled)",
+)
+@click.option(
+    "--db-statement-timeout-ms",
+    default=None,
+    type=int,
+    help="Statement timeout of session database queries in milliseconds",
+)
+@click.option(
+    "--db-pool-recycle",
+    default=None,
+    type=int,
+    help="Seconds after which pooled connections are replaced (defaults to 1800)",
+)
+@click.option(
+    "--session-write-behind/--no-session-write-behind",
+    default=None,
+    help="Persist session events in batches after streaming instead of per event; "
+    "buffered events are lost if the process crashes",
+)
+@click.option(
+    "--session-cache-bytes",
+    type=int,
+    default=None,
+    help="Size of the in-process session cache (0 disables, the default)",
+)
+@click.option(
+    "--recipe-search-hedging/--no-recipe-search-hedging",
+    default=None,
+    help="Send a second recipe search when the first is slower than its p95 latency",
+)
+@click.option(
+    "--speculative-prefetch",
+    default=None,
+    help="Requests started with each turn: comma-separated memory,search, empty to disable (defaults to memory)",
+)
+@click.option(
+    "--trace-spool-path",
+    default=None,
+    help="Local file spooling spans before export, e.g. /tmp/spans.spool (disabled by default)",
+)
+@click.option(
+    "--stream-sse/--no-stream-sse",
+    default=None,
+    help="Stream partial responses of the user-visible agents by default (defaults to enabled)",
+)
+@click.option(
+    "--stream-flush-ms",
+    default=None,
+    type=float,
+    help="Minimum interval between streamed chunks, smaller ones are merged (defaults to 100)",
+)
+@click.option(
+    "--admission-max-concurrent",
+    default=None,
+    type=int,
+    help="Turns run at once per replica, the others are queued fairly between users (defaults to 8)",
+)
+@click.option(
+    "--admission-user-rate",
+    default=None,
+    type=float,
+    help="Turns per second allowed per user after a burst of 5 (defaults to 0.5)",
+)
+@click.option(
+    "--memory-backend",
+    type=click.Choice(["memory_bank", "local", "tiered"]),
+    default=None,
+    help="Memory Bank, an in-process vector index, or the index for hot users in front of Memory Bank (defaults to memory_bank)",
+)
+@click.option(
+    "--memory-local-path",
+    default=None,
+    help="Directory persisting the local memory index, e.g. /tmp/memory (in-memory only by default)",
+)
 def deploy_agent_engine_app(
     project: str | None,
     location: str,
@@ -263,8 +640,33 @@ def deploy_agent_engine_app(
     service_account: str | None,
     db_url: str | None,
     model_location: str | None,
+    context_max_events: int | None,
+    context_max_tokens: int | None,
+    context_summary: str | None,
+    db_pool_size: int | None,
+    db_max_overflow: int | None,
+    db_pool_pre_ping: bool | None,
+    db_statement_timeout_ms: int | None,
+    db_pool_recycle: int | None,
+    session_write_behind: bool | None,
+    session_cache_bytes: int | None,
+    recipe_search_hedging: bool | None,
+    speculative_prefetch: str | None,
+    trace_spool_path: str | None,
+    stream_sse: bool | None,
+    stream_flush_ms: float | None,
+    admission_max_concurrent: int | None,
+    admission_user_rate: float | None,
+    memory_backend: str | None,
+    memory_local_path: str | None,
 ) -> AgentEngine:
     """Deploy the agent engine app to Vertex AI."""
+    # Only needed to deploy, kept out of the runtime import path
+    from google.adk.artifacts import GcsArtifactService
+
+    from app.utils.database import PooledDatabaseSessionService
+    from app.utils.gcs import create_bucket_if_not_exists
+
     # Parse environment variables if provided
 
     env_vars = parse_env_vars(set_env_vars)
@@ -309,7 +711,7 @@ def deploy_agent_engine_app(
     #Added following config for db based session and tracing
     if db_url == "VertexAiSessionService":
         #Following config for VAI Session console
-        session_service = functools.partial(
+        session_service: Callable[..., BaseSessionService] = functools.partial(
             VertexAiSessionService,
             project=project,
             location=location
@@ -318,7 +720,7 @@ def deploy_agent_engine_app(
         #To connect DB using private network, use following link to setup database
         #https://cloud.google.com/sql/docs/postgres/configure-private-service-connect?hl=ko
         session_service = functools.partial(
-            DatabaseSessionService,
+            PooledDatabaseSessionService,
             db_url=db_url
         )
 
@@ -329,7 +731,7 @@ def deploy_agent_engine_app(
         ),
         session_service_builder = session_service,
         memory_service_builder = functools.partial(
-            CustomMemoryBankService,
+            build_memory_service,
             project=project,
             location=location,
         ),
@@ -340,6 +742,31 @@ def deploy_agent_engine_app(
     env_vars["NUM_WORKERS"] = "1"
     env_vars["GOOGLE_CLOUD_AGENT_ENGINE_ENABLE_TELEMETRY"] = "true"
     env_vars["OTEL_INSTRUMENTATION_GENAI_CAPTURE_MESSAGE_CONTENT"] = "true"
+    # Context window policy, read by ContextWindowPlugin at runtime
+    for name, value in (
+        ("CONTEXT_MAX_EVENTS", context_max_events),
+        ("CONTEXT_MAX_TOKENS", context_max_tokens),
+        ("CONTEXT_SUMMARY", context_summary),
+        # Session database pool, read by PooledDatabaseSessionService at runtime
+        ("DB_POOL_SIZE", db_pool_size),
+        ("DB_MAX_OVERFLOW", db_max_overflow),
+        ("DB_POOL_PRE_PING", db_pool_pre_ping),
+        ("DB_STATEMENT_TIMEOUT_MS", db_statement_timeout_ms),
+        ("DB_POOL_RECYCLE", db_pool_recycle),
+        ("SESSION_WRITE_BEHIND", session_write_behind),
+        ("SESSION_CACHE_BYTES", session_cache_bytes),
+        ("RECIPE_SEARCH_HEDGING", recipe_search_hedging),
+        ("SPECULATIVE_PREFETCH", speculative_prefetch),
+        ("TRACE_SPOOL_PATH", trace_spool_path),
+        ("STREAM_SSE", stream_sse),
+        ("STREAM_FLUSH_MS", stream_flush_ms),
+        ("ADMISSION_MAX_CONCURRENT", admission_max_concurrent),
+        ("ADMISSION_USER_RATE", admission_user_rate),
+        ("MEMORY_BACKEND", memory_backend),
+        ("MEMORY_LOCAL_PATH", memory_local_path),
+    ):
+        if value is not None:
+            env_vars[name] = str(value)
 
     # Common configuration for both create and update operations
     labels: dict[str, str] = {}
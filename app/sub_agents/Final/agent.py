@@ -1,5 +1,10 @@
 from google.adk.agents import Agent
 from google.adk.tools.preload_memory_tool import preload_memory_tool
+
+from app.utils.models import agent_model_kwargs
+
+from .validator import fast_path_validation
+
 FINAL_INSTR = """
 You are a final validation agent responsible for ensuring the recipe or dietary plan output meets user requirements.
 
@@ -19,10 +24,12 @@ Output format:
 """
 
 final_agent = Agent(
-    model="gemini-2.5-flash",
+    **agent_model_kwargs("final_agent"),
     name="final_agent",
     description="Agent to validate and finalize the recipe or dietary plan output",
     instruction=FINAL_INSTR,
+    # Structured checks run in code, the model is only called for free-text judgment
+    before_agent_callback=fast_path_validation,
     tools=[
         preload_memory_tool
     ]
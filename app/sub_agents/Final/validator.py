@@ -0,0 +1,266 @@
+"""Rule-based fast path for final validation of recipes and meal plans.
+
+Structured checks (allergen exclusion, cuisine match, numeric protein goals)
+and formatting are done in code. The final_agent model call is only made when
+the output cannot be checked this way, e.g. health conditions or qualitative
+protein goals that need free-text judgment.
+"""
+
+import re
+from collections.abc import Mapping
+from typing import Any, Literal, NamedTuple
+
+from google.adk.agents.callback_context import CallbackContext
+from google.genai import types
+from sub_agents.Recipe_Finder.constraints import constraint_filter, load_requirements
+
+from app.utils.metrics import metrics
+
+_GRAMS_RE = re.compile(r"(\d+(?:\.\d+)?)\s*(?:g\b|gram)", re.IGNORECASE)
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+_PER_DAY_RE = re.compile(r"day|daily|/d\b", re.IGNORECASE)
+_PROTEIN_KEYS = ("protein_g", "protein", "protein_content")
+_CALORIE_KEYS = ("calories", "kcal", "calorie")
+PLAN_REQUEST_TYPES = ("dietary_plan", "diet_plan", "meal_plan")
+
+
+class Verdict(NamedTuple):
+    """Outcome of the rule-based validation."""
+
+    status: Literal["valid", "invalid", "needs_llm"]
+    message: str = ""
+
+
+def parse_protein_goal(goal: Any) -> tuple[float, Literal["meal", "day"]] | None:
+    """Parse goals like "20g per meal" or "100g/day" into (grams, per)."""
+    if isinstance(goal, int | float):
+        return float(goal), "meal"
+    if not isinstance(goal, str):
+        return None
+    match = _GRAMS_RE.search(goal)
+    if not match:
+        return None
+    return float(match.group(1)), "day" if _PER_DAY_RE.search(goal) else "meal"
+
+
+def _amount(item: Mapping[str, Any], keys: tuple[str, ...]) -> float | None:
+    for key in keys:
+        value = item.get(key)
+        if isinstance(value, int | float):
+            return float(value)
+        if isinstance(value, str):
+            match = _NUMBER_RE.search(value)
+            if match:
+                return float(match.group())
+    return None
+
+
+def _cuisine_matches(wanted: str, actual: str) -> bool:
+    wanted, actual = wanted.strip().lower(), actual.strip().lower()
+    return wanted in actual or actual in wanted
+
+
+def _meal_days(meal_plan: Any) -> list[dict[str, Any]] | None:
+    """Return the plan's days as [{"day", "meals": [...]}], or None if unstructured."""
+    if not isinstance(meal_plan, dict):
+        return None
+    days = meal_plan.get("days")
+    if not isinstance(days, list):
+        return None
+    for day in days:
+        if not isinstance(day, dict) or not isinstance(day.get("meals"), list):
+            return None
+        if not all(isinstance(meal, dict) for meal in day["meals"]):
+            return None
+    return days
+
+
+def format_recipes(recipes: list[dict[str, Any]]) -> str:
+    """Render recipes with the layout used by root_agent."""
+    blocks = []
+    for recipe in recipes:
+        lines = [f"**{recipe.get('recipe_name', '')}**"]
+        if recipe.get("ingredients_preview"):
+            lines.append(
+                f"- **Ingredients**: {', '.join(recipe['ingredients_preview'])}"
+            )
+        protein = _amount(recipe, _PROTEIN_KEYS)
+        if protein is not None:
+            lines.append(f"- **Protein Content**: {protein:g}g")
+        if recipe.get("summary"):
+            lines.append(f"- **Description**: {recipe['summary']}")
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def format_meal_plan(days: list[dict[str, Any]]) -> str:
+    """Render a structured meal plan with per-day nutritional summaries."""
+    blocks = []
+    for index, day in enumerate(days, start=1):
+        lines = [f"**{day.get('day') or f'Day {index}'}**"]
+        calories_total = protein_total = 0.0
+        for meal in day["meals"]:
+            calories = _amount(meal, _CALORIE_KEYS)
+            protein = _amount(meal, _PROTEIN_KEYS)
+            calories_total += calories or 0
+            protein_total += protein or 0
+            details = ", ".join(
+                part
+                for part in (
+                    f"{calories:g} kcal" if calories is not None else "",
+                    f"{protein:g}g protein" if protein is not None else "",
+                )
+                if part
+            )
+            label = meal.get("meal") or meal.get("type") or "Meal"
+            name = meal.get("name") or meal.get("recipe_name") or ""
+            lines.append(f"- {label}: {name}" + (f" ({details})" if details else ""))
+        lines.append(
+            f"- **Total**: {calories_total:g} kcal, {protein_total:g}g protein"
+        )
+        blocks.append("\n".join(lines))
+    return "\n\n".join(blocks)
+
+
+def validate_final_output(
+    state: Mapping[str, Any], invocation_id: str | None = None
+) -> Verdict:
+    """Validate the session state produced by the finder against user requirements.
+
+    Args:
+        state: The session state
+        invocation_id: The current invocation; finder output recorded by
+            another invocation is stale and left to the model
+    """
+    if invocation_id is not None and state.get("finder_invocation_id") != invocation_id:
+        return Verdict("needs_llm")
+    requirements = load_requirements(state.get("user_requirements"))
+    request_type = str(requirements.get("request_type") or "").lower()
+    recipes: Any = None
+    meal_plan: Any = None
+    if request_type == "recipe":
+        recipes = state.get("filtered_recipes") or state.get("recipes")
+    elif request_type in PLAN_REQUEST_TYPES:
+        meal_plan = state.get("filtered_meal_plan") or state.get("meal_plan")
+    else:
+        return Verdict("needs_llm")
+
+    days = _meal_days(meal_plan) if meal_plan is not None else None
+    if meal_plan is not None and days is None:
+        return Verdict("needs_llm")
+    if recipes is not None and (
+        not isinstance(recipes, list) or not all(isinstance(r, dict) for r in recipes)
+    ):
+        return Verdict("needs_llm")
+    empty = not (days or recipes)
+    upstream_error = state.get("finder_error") or state.get("health_errors")
+    if upstream_error and empty:
+        return Verdict("invalid", f"Final validation failed: {upstream_error}.")
+    if upstream_error or empty:
+        # Partial output to explain, or nothing found without a reason
+        return Verdict("needs_llm")
+
+    if requirements.get("conditions"):
+        return Verdict("needs_llm")
+    protein_goal = parse_protein_goal(requirements.get("protein_goal"))
+    if requirements.get("protein_goal") and protein_goal is None:
+        return Verdict("needs_llm")
+    allergies = requirements.get("allergies") or []
+    diet = requirements.get("diet_type")
+    cuisine = requirements.get("cuisine")
+    recipe_list: list[dict[str, Any]] = recipes or []
+
+    if days is not None:
+        items = [meal for day in days for meal in day["meals"]]
+        candidates = [
+            {
+                "recipe_name": meal.get("name") or meal.get("recipe_name"),
+                "ingredients_preview": meal.get("ingredients") or [],
+            }
+            for meal in items
+        ]
+    else:
+        # Only an ingredient preview is known, which cannot clear an allergy
+        if allergies:
+            return Verdict("needs_llm")
+        items = candidates = recipe_list
+
+    _, rejected = constraint_filter.filter(candidates, allergies, diet)
+    if rejected:
+        names = ", ".join(str(item["recipe_name"]) for item in rejected)
+        return Verdict(
+            "invalid",
+            f"The output contains ingredients you need to avoid: {names}.",
+        )
+
+    if cuisine:
+        for item in items:
+            if item.get("cuisine") and not _cuisine_matches(cuisine, item["cuisine"]):
+                return Verdict(
+                    "invalid",
+                    f"The output does not match your {cuisine} cuisine preference.",
+                )
+
+    if protein_goal:
+        grams, per = protein_goal
+        if days is not None:
+            for day in days:
+                amounts = [_amount(meal, _PROTEIN_KEYS) for meal in day["meals"]]
+                known = [amount for amount in amounts if amount is not None]
+                if len(known) != len(amounts):
+                    return Verdict("needs_llm")
+                checks = [sum(known)] if per == "day" else known
+                if any(amount < grams for amount in checks):
+                    return Verdict(
+                        "invalid",
+                        f"The plan does not meet your protein goal of {grams:g}g per {per}.",
+                    )
+        else:
+            amounts = [_amount(recipe, _PROTEIN_KEYS) for recipe in recipe_list]
+            known = [amount for amount in amounts if amount is not None]
+            if len(known) != len(amounts):
+                return Verdict("needs_llm")
+            if per == "meal" and any(amount < grams for amount in known):
+                return Verdict(
+                    "invalid",
+                    f"The recipe does not meet your protein goal of {grams:g}g per meal.",
+                )
+
+    return Verdict(
+        "valid",
+        format_meal_plan(days) if days is not None else format_recipes(recipe_list),
+    )
+
+
+def is_english(text: str | None) -> bool:
+    """Whether a message is written in English, judged by its letters' script."""
+    letters = [char for char in text or "" if char.isalpha()]
+    if not letters:
+        return False
+    return sum(char.isascii() for char in letters) / len(letters) >= 0.9
+
+
+def fast_path_validation(callback_context: CallbackContext) -> types.Content | None:
+    """before_agent_callback for final_agent that skips the model when possible."""
+    # The templates are English: other languages are answered by the model
+    user_content = callback_context.user_content
+    text = (
+        " ".join(part.text for part in (user_content.parts or []) if part.text)
+        if user_content
+        else ""
+    )
+    if not is_english(text):
+        metrics.incr("final_validation.llm")
+        return None
+    verdict = validate_final_output(
+        callback_context.state.to_dict(), callback_context.invocation_id
+    )
+    if verdict.status == "needs_llm":
+        metrics.incr("final_validation.llm")
+        return None
+    metrics.incr("final_validation.fast_path")
+    if verdict.status == "valid":
+        callback_context.state["final_output"] = verdict.message
+    else:
+        callback_context.state["final_error"] = verdict.message
+    return types.Content(role="model", parts=[types.Part(text=verdict.message)])
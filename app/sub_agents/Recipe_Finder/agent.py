@@ -1,7 +1,27 @@
+import asyncio
+import functools
+import re
+from concurrent.futures import ThreadPoolExecutor
+
 from google.adk.agents import Agent
 from google.adk.tools import FunctionTool
 from google.adk.tools.preload_memory_tool import preload_memory_tool
 
+from app.utils.hedging import hedger_from_env
+from app.utils.metrics import metrics
+from app.utils.models import (
+    agent_model_kwargs,
+    genai_client,
+    get_model_settings,
+    is_low_confidence,
+)
+from app.utils.resilience import CircuitOpenError, get_policy, is_retryable
+from app.utils.speculation import speculator
+
+from .constraints import constraint_filter, load_requirements
+from .meal_plan import generate_meal_plan
+from .recipe_index import RecipeIndex
+
 RECIPE_FINDER_INSTR = """
 You are a recipe finder agent responsible for fetching recipes or generating meal plans using the google search API.
 
@@ -13,9 +33,10 @@ Steps:
      - Limit to 10 results.
      - Store the results in the session state under 'recipes'.
    - If 'dietary_plan':
-     - Use the google_search_tool API to generate a meal plan for the specified time frame (day or week).
-     - Include parameters like target calories, diet type, and excluded ingredients (allergies).
-     - Store the meal plan in the session state under 'meal_plan'.
+     - Use the generate_meal_plan tool with the number of days of the specified time frame (1 for a day, 7 for a week).
+     - Pass the user's daily calorie goal, diet type, allergies, protein goal, dietary goals, cuisine and health conditions as the tool arguments, leaving out what the user did not state.
+     - The tool plans each day against these requirements and stores the meal plan in the session state under 'meal_plan'.
+     - If the tool result has an 'error', tell the user which days could not be planned and why.
 3. If no suitable recipes or meal plan can be found, return an error message to the user.
 
 Output format:
@@ -26,7 +47,6 @@ Output format:
 """
 from typing import Dict, List, Any
 from google.adk.tools import ToolContext
-from google import genai
 import json
 from pydantic import BaseModel, Field, TypeAdapter
 from google.genai import types
@@ -36,6 +56,25 @@ class Recipe(BaseModel):
     recipe_name: str = Field(description="The name of the recipe.")
     summary: str = Field(description="A very brief 1-sentence summary of the dish.")
     ingredients_preview: list[str] = Field(description="A list of 3-5 main ingredients.")
+    cuisine: str | None = Field(default=None, description="The cuisine of the dish, e.g. Indian.")
+
+recipe_index = RecipeIndex(
+    path=os.environ.get("RECIPE_INDEX_PATH"),
+    min_score=float(os.environ.get("RECIPE_INDEX_MIN_SCORE", "0.8")),
+)
+
+def _validate_recipes(items: Any) -> list[Recipe]:
+    """Keep only the items of a model response that parse as a Recipe."""
+    recipes = []
+    for item in items if isinstance(items, list) else []:
+        try:
+            recipes.append(Recipe.model_validate(item))
+        except ValueError:
+            continue
+    return recipes
+
+# Opt-in with RECIPE_SEARCH_HEDGING=true
+search_hedger = hedger_from_env("recipe_search")
 
 def search_recipes_with_gemini(
     query: str,
@@ -64,38 +103,122 @@ def search_recipes_with_gemini(
     search_prompt += "\nRemove any data in header like ```json"
 
     # 2. 모델 설정 (Google Search Grounding + JSON Schema)
-    client = genai.Client(vertexai=True, 
-                          project=os.environ.get("GOOGLE_CLOUD_PROJECT"), 
-                          location=os.environ.get("GOOGLE_CLOUD_LOCATION"))
-    response = client.models.generate_content(
-        model="gemini-2.5-flash",
-        contents=search_prompt,
-        config={
-            "response_mime_type": "application/json",
-            "response_json_schema": TypeAdapter(list[Recipe]).json_schema(),
-            "tools": [types.Tool(google_search=types.GoogleSearch())],
-            "thinking_config": types.ThinkingConfig(include_thoughts=False, thinking_budget=None),
-            "safety_settings": [types.SafetySetting(
-                category="HARM_CATEGORY_HATE_SPEECH",
-                threshold="OFF"
-                ),types.SafetySetting(
-                category="HARM_CATEGORY_DANGEROUS_CONTENT",
-                threshold="OFF"
-                ),types.SafetySetting(
-                category="HARM_CATEGORY_SEXUALLY_EXPLICIT",
-                threshold="OFF"
-                ),types.SafetySetting(
-                category="HARM_CATEGORY_HARASSMENT",
-                threshold="OFF"
-                )
-            ]
-        },
+    client = genai_client()
+    settings = get_model_settings("recipe_search")
+    config = {
+        "response_mime_type": "application/json",
+        "response_json_schema": TypeAdapter(list[Recipe]).json_schema(),
+        "tools": [types.Tool(google_search=types.GoogleSearch())],
+        "thinking_config": types.ThinkingConfig(include_thoughts=False, thinking_budget=settings.thinking_budget),
+        "max_output_tokens": settings.max_output_tokens,
+        "safety_settings": [types.SafetySetting(
+            category="HARM_CATEGORY_HATE_SPEECH",
+            threshold="OFF"
+            ),types.SafetySetting(
+            category="HARM_CATEGORY_DANGEROUS_CONTENT",
+            threshold="OFF"
+            ),types.SafetySetting(
+            category="HARM_CATEGORY_SEXUALLY_EXPLICIT",
+            threshold="OFF"
+            ),types.SafetySetting(
+            category="HARM_CATEGORY_HARASSMENT",
+            threshold="OFF"
+            )
+        ]
+    }
+
+    # 3. 결과가 JSON이 아니거나 신뢰도가 낮으면 상위 모델로 한 번 더 시도합니다.
+    models = [settings.model] + ([settings.escalation_model] if settings.escalation_model else [])
+    recipes = None
+    for attempt, model in enumerate(models):
+        if attempt:
+            metrics.incr("model_escalation.applied.recipe_search")
+        # Retries 429/5xx with backoff under the endpoint's adaptive concurrency
+        # limit; a hedged search runs each request under the policy on its own
+        request = functools.partial(
+            get_policy("recipe_search").call,
+            client.models.generate_content,
+            model=model,
+            contents=search_prompt,
+            config=config,
+        )
+        response = search_hedger.call(request) if search_hedger else request()
+        text = response.text or ""
+        start = text.find("[")
+        end = text.rfind("]")
+        try:
+            recipes = json.loads(text[start:end+1])
+        except ValueError:
+            recipes = None
+        avg_logprobs = response.candidates[0].avg_logprobs if response.candidates else None
+        if recipes is not None and not is_low_confidence(avg_logprobs, text):
+            return recipes
+    return recipes or []
+
+_RECIPE_REQUEST_PATTERNS = [
+    re.compile(r"\brecipes?\s+(?:of|for)\s+(?P<query>.+)", re.IGNORECASE),
+    re.compile(r"\bhow\s+(?:do\s+i|to|can\s+i)\s+(?:make|cook|prepare)\s+(?P<query>.+)", re.IGNORECASE),
+    re.compile(r"^(?:.*\b(?:want|need|give\s+me|find|show\s+me)\s+)?(?P<query>.+?)\s+recipes?\b", re.IGNORECASE),
+]
+_QUERY_END = re.compile(r"[,.!?;]|\b(?:without|but|that|which|please|i'm|i\s+am)\b", re.IGNORECASE)
+_LEADING_ARTICLE = re.compile(r"^(?:an?|the|some|my)\s+", re.IGNORECASE)
+_ALLERGIES = re.compile(r"\ballergic\s+to\s+(?P<items>[\w\s,]+?)(?:[.!?;]|$)", re.IGNORECASE)
+_DIETS = ("vegetarian", "vegan", "keto", "paleo", "pescatarian", "gluten free", "dairy free", "high-protein", "low-carb")
+_CUISINES = ("Indian", "Italian", "Mexican", "Chinese", "Japanese", "Korean", "Thai", "French", "Greek", "Spanish", "Vietnamese", "Mediterranean")
+
+def guess_search_params(text: str) -> dict[str, Any] | None:
+    """Cheap guess of the search parameters of a recipe request, None if the
+    message does not look like one. Used to speculate, never to answer."""
+    for pattern in _RECIPE_REQUEST_PATTERNS:
+        match = pattern.search(text)
+        if match:
+            break
+    else:
+        return None
+    query = _LEADING_ARTICLE.sub("", _QUERY_END.split(match.group("query"))[0].strip())
+    if not query:
+        return None
+    lowered = text.lower()
+    words = set(re.findall(r"[a-z]+", lowered))
+    intolerances = None
+    if allergies := _ALLERGIES.search(text):
+        intolerances = [item.strip() for item in re.split(r",|\band\b", allergies.group("items")) if item.strip()]
+    return {
+        "query": query,
+        "diet": next((diet for diet in _DIETS if diet in lowered), None),
+        "intolerances": intolerances,
+        "cuisine": next((cuisine for cuisine in _CUISINES if cuisine.lower() in words), None),
+    }
+
+def _search_key(
+    query: str, diet: str | None, intolerances: list[str] | None, cuisine: str | None
+) -> tuple:
+    def norm(value: Any) -> str | None:
+        if not value:
+            return None
+        return " ".join(str(value).lower().split()) or None
+    return (norm(query), norm(diet), tuple(sorted(norm(i) or "" for i in intolerances or [])), norm(cuisine))
+
+# Requirements of root_agent's parsed JSON that the search does not use itself
+_PASSED_REQUIREMENTS = ("dietary_goals", "ingredients", "protein_goal", "conditions")
+
+@functools.lru_cache(maxsize=1)
+def _speculation_executor() -> ThreadPoolExecutor:
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="recipe-speculation")
+
+def speculate_recipe_search(text: str) -> None:
+    """Start the grounded search a recipe request will probably make, in the
+    current speculation turn. Skipped when the local index would answer it."""
+    params = guess_search_params(text)
+    if params is None or recipe_index.lookup(**params):
+        return
+    speculator.start(
+        "search",
+        _search_key(**params),
+        lambda: _speculation_executor().submit(search_recipes_with_gemini, **params),
     )
-    start = response.text.find("[")
-    end = response.text.rfind("]")
-    return json.loads(response.text[start:end+1])
 
-def google_search_tool(query: str, tool_context: ToolContext) -> List[Dict[str, Any]]:
+async def google_search_tool(query: str, tool_context: ToolContext) -> List[Dict[str, Any]]:
     """
     Tool function to search recipes and store results in the tool context state.
 
@@ -110,23 +233,91 @@ def google_search_tool(query: str, tool_context: ToolContext) -> List[Dict[str,
         tool_context.state["recipes"] = []
 
     params = eval(query) if isinstance(query, str) and query.startswith("{") else {"query": query}
+    # The query may also be the requirements JSON parsed by root_agent
+    search_params: dict[str, Any] = {
+        "query": params.get("query", ""),
+        "diet": params.get("diet") or params.get("diet_type"),
+        "intolerances": params.get("intolerances") or params.get("allergies"),
+        "cuisine": params.get("cuisine"),
+    }
 
-    result = search_recipes_with_gemini(
-        query=params.get("query", ""),
-        diet=params.get("diet"),
-        intolerances=params.get("intolerances"),
-        cuisine=params.get("cuisine")
-    )
-    tool_context.state["recipes"] = result
-    return result
+    # Allergies gathered by user_requirement_agent are enforced alongside the
+    # intolerances passed in the query.
+    stored = load_requirements(tool_context.state.get("user_requirements"))
+    allergies = list(dict.fromkeys([*(search_params["intolerances"] or []), *(stored.get("allergies") or [])]))
+    diet = search_params["diet"] or stored.get("diet_type")
+    requirements = {
+        **stored,
+        **{key: params[key] for key in _PASSED_REQUIREMENTS if params.get(key)},
+        "request_type": "recipe",
+        "diet_type": diet,
+        "allergies": allergies or None,
+        "cuisine": search_params["cuisine"] or stored.get("cuisine"),
+    }
+
+    # Searched and looked up under all of the user's constraints: the index
+    # only serves recipes found by a search that excluded every allergy
+    search_params.update(diet=diet, intolerances=allergies or None)
+
+    # Serve from the local index first, only misses go to grounded search
+    cached = recipe_index.lookup(**search_params)
+    accepted = constraint_filter.filter(cached, allergies, diet)[0] if cached else []
+    rejected: list[dict[str, Any]] = []
+    finder_error = None
+    if cached and len(accepted) == len(cached):
+        metrics.incr("recipe_index.hit")
+    else:
+        metrics.incr("recipe_index.miss")
+        try:
+            # Started with the turn when the guessed parameters were exactly these
+            speculated = speculator.get("search", _search_key(**search_params))
+            # Off the event loop: retries back off and wait for a concurrency slot
+            recipes = _validate_recipes(
+                await asyncio.wrap_future(speculated) if speculated
+                else await asyncio.to_thread(search_recipes_with_gemini, **search_params)
+            )
+        except Exception as e:
+            if not (isinstance(e, CircuitOpenError) or is_retryable(e)):
+                raise
+            # Search is overloaded or down: answer with what the index had
+            metrics.incr("recipe_search.degraded")
+            recipes = None
+            if not accepted:
+                finder_error = "Recipe search is temporarily unavailable, please try again shortly"
+        if recipes is not None:
+            accepted, rejected = constraint_filter.filter(
+                [recipe.model_dump() for recipe in recipes], allergies, diet
+            )
+            diet_tags = [search_params["diet"]] if search_params["diet"] else []
+            for recipe in accepted:
+                recipe_index.add(
+                    recipe,
+                    cuisine=search_params["cuisine"],
+                    diet_tags=diet_tags,
+                    intolerances=search_params["intolerances"],
+                )
+    if rejected:
+        metrics.incr("constraint_filter.rejected", len(rejected))
+
+    # Screened against the allergies and diet using only the ingredient
+    # preview, so final validation still checks the full recipes
+    tool_context.state["recipes"] = accepted
+    tool_context.state["rejected_recipes"] = rejected
+    # Cleared once search answers again, so an outage only affects its own turns
+    tool_context.state["finder_error"] = finder_error
+    # Final validation checks the recipes against the requirements they were searched for
+    tool_context.state["user_requirements"] = requirements
+    tool_context.state["finder_invocation_id"] = tool_context.invocation_id
+    return accepted
 
 recipe_finder_agent = Agent(
-    model="gemini-2.5-flash",
+    **agent_model_kwargs("recipe_finder_agent"),
     name="recipe_finder_agent",
     description="Agent to find recipes or generate meal plans using google_search_tool API",
     instruction=RECIPE_FINDER_INSTR,
     tools=[
         FunctionTool(func=google_search_tool),
+        FunctionTool(func=generate_meal_plan),
         preload_memory_tool
         ],
 )
\ No newline at end of file
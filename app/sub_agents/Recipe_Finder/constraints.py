@@ -0,0 +1,322 @@
+"""Deterministic allergy and diet filtering of recipe candidates.
+
+Ingredients are mapped to allergen/diet categories through a fixed taxonomy,
+each category owning one bit of a uint64 mask. A batch of candidates becomes a
+NumPy array of masks that is checked against the forbidden mask in one
+vectorized operation.
+"""
+
+import functools
+import json
+import logging
+from collections.abc import Iterable
+from typing import Any
+
+import numpy as np
+
+from .recipe_index import normalize_term, tokenize
+
+logger = logging.getLogger(__name__)
+
+CATEGORY_TERMS: dict[str, tuple[str, ...]] = {
+    "dairy": (
+        "milk",
+        "cheese",
+        "butter",
+        "cream",
+        "yogurt",
+        "yoghurt",
+        "ghee",
+        "paneer",
+        "curd",
+        "whey",
+        "casein",
+        "mozzarella",
+        "parmesan",
+        "ricotta",
+        "lactose",
+        "buttermilk",
+    ),
+    "egg": ("egg", "mayonnaise", "mayo", "meringue"),
+    "peanut": ("peanut",),
+    "tree_nut": (
+        "almond",
+        "walnut",
+        "cashew",
+        "pecan",
+        "pistachio",
+        "hazelnut",
+        "macadamia",
+        "nut",
+    ),
+    "gluten": (
+        "wheat",
+        "flour",
+        "bread",
+        "pasta",
+        "noodle",
+        "barley",
+        "rye",
+        "couscous",
+        "semolina",
+        "seitan",
+        "breadcrumb",
+        "spaghetti",
+        "tortilla",
+    ),
+    "soy": ("soy", "soya", "tofu", "tempeh", "edamame", "miso"),
+    "fish": (
+        "fish",
+        "salmon",
+        "tuna",
+        "cod",
+        "anchovy",
+        "sardine",
+        "mackerel",
+        "tilapia",
+        "trout",
+        "halibut",
+    ),
+    "shellfish": (
+        "shrimp",
+        "prawn",
+        "crab",
+        "lobster",
+        "clam",
+        "mussel",
+        "oyster",
+        "scallop",
+        "squid",
+        "octopus",
+    ),
+    "sesame": ("sesame", "tahini"),
+    "meat": (
+        "chicken",
+        "beef",
+        "pork",
+        "lamb",
+        "mutton",
+        "bacon",
+        "ham",
+        "sausage",
+        "turkey",
+        "duck",
+        "veal",
+        "goat",
+        "prosciutto",
+        "pepperoni",
+        "steak",
+    ),
+    "honey": ("honey",),
+    "high_carb": (
+        "sugar",
+        "rice",
+        "pasta",
+        "bread",
+        "potato",
+        "flour",
+        "noodle",
+        "corn",
+        "oat",
+        "spaghetti",
+        "tortilla",
+    ),
+}
+
+# Multi-word ingredients whose words would otherwise be misclassified
+# (e.g. "butter" in "peanut butter").
+PHRASE_CATEGORIES: dict[str, tuple[str, ...]] = {
+    "peanut butter": ("peanut",),
+    "almond milk": ("tree_nut",),
+    "coconut milk": (),
+    "coconut cream": (),
+    "soy milk": ("soy",),
+    "oat milk": ("high_carb",),
+    "cocoa butter": (),
+    "soy sauce": ("soy", "gluten"),
+}
+
+ALLERGY_ALIASES: dict[str, tuple[str, ...]] = {
+    "dairy": ("dairy",),
+    "milk": ("dairy",),
+    "lactose": ("dairy",),
+    "egg": ("egg",),
+    "peanut": ("peanut",),
+    "nut": ("peanut", "tree_nut"),
+    "tree nut": ("tree_nut",),
+    "gluten": ("gluten",),
+    "wheat": ("gluten",),
+    "soy": ("soy",),
+    "fish": ("fish",),
+    "shellfish": ("shellfish",),
+    "seafood": ("fish", "shellfish"),
+    "sesame": ("sesame",),
+}
+
+DIET_EXCLUSIONS: dict[str, tuple[str, ...]] = {
+    "vegetarian": ("meat", "fish", "shellfish"),
+    "vegan": ("meat", "fish", "shellfish", "dairy", "egg", "honey"),
+    "pescatarian": ("meat",),
+    "keto": ("high_carb",),
+    "low carb": ("high_carb",),
+    "gluten free": ("gluten",),
+    "dairy free": ("dairy",),
+}
+
+CATEGORY_BITS = {name: bit for bit, name in enumerate(CATEGORY_TERMS)}
+_MAX_BITS = 64
+
+_TERM_MASKS: dict[str, int] = {}
+for _category, _terms in CATEGORY_TERMS.items():
+    for _term in _terms:
+        _TERM_MASKS[_term] = _TERM_MASKS.get(_term, 0) | 1 << CATEGORY_BITS[_category]
+
+
+def _categories_mask(categories: Iterable[str]) -> int:
+    mask = 0
+    for category in categories:
+        mask |= 1 << CATEGORY_BITS[category]
+    return mask
+
+
+def _phrase(text: str) -> str:
+    return " ".join(tokenize(text))
+
+
+@functools.lru_cache(maxsize=4096)
+def ingredient_mask(ingredient: str) -> int:
+    """Return the category mask of a single ingredient string."""
+    text = _phrase(ingredient)
+    mask = 0
+    for phrase, categories in PHRASE_CATEGORIES.items():
+        if phrase in text:
+            mask |= _categories_mask(categories)
+            text = text.replace(phrase, " ")
+    for term in text.split():
+        mask |= _TERM_MASKS.get(term, 0)
+    return mask
+
+
+def load_requirements(value: Any) -> dict[str, Any]:
+    """Return `user_requirements` state as a dict, whatever form it was stored in."""
+    if isinstance(value, dict):
+        return value
+    if isinstance(value, str):
+        start, end = value.find("{"), value.rfind("}")
+        try:
+            parsed = json.loads(value[start : end + 1])
+        except ValueError:
+            return {}
+        return parsed if isinstance(parsed, dict) else {}
+    return {}
+
+
+class ConstraintFilter:
+    """Rejects recipe candidates violating allergy, intolerance or diet constraints."""
+
+    def forbidden_mask(
+        self,
+        allergies: Iterable[str] | None = None,
+        diet: str | None = None,
+    ) -> tuple[int, dict[str, int]]:
+        """Build the forbidden category mask for the given constraints.
+
+        Allergies that are not in the taxonomy (e.g. "kiwi", "kiwi fruit") are
+        matched as literal ingredient phrases, each assigned a spare bit above
+        the category bits. Once the spare bits run out, the remaining phrases
+        share the last bit, so they still reject recipes.
+
+        Returns:
+            The forbidden mask and the literal phrase to bit mapping
+        """
+        mask = 0
+        literals: dict[str, int] = {}
+        for allergy in allergies or []:
+            key = _phrase(allergy)
+            if not key:
+                continue
+            categories = ALLERGY_ALIASES.get(key)
+            if categories is None and key in CATEGORY_BITS:
+                categories = (key,)
+            if categories is not None:
+                mask |= _categories_mask(categories)
+                continue
+            if key in literals:
+                continue
+            bit = len(CATEGORY_BITS) + len(literals)
+            if bit >= _MAX_BITS:
+                bit = _MAX_BITS - 1
+                logger.warning("Too many literal allergies, %r shares bit %d", key, bit)
+            literals[key] = bit
+            mask |= 1 << bit
+        if diet:
+            diet_key = normalize_term(diet.replace("-", " ").replace("_", " "))
+            mask |= _categories_mask(DIET_EXCLUSIONS.get(diet_key, ()))
+        return mask, literals
+
+    def recipe_masks(
+        self, recipes: list[dict[str, Any]], literals: dict[str, int] | None = None
+    ) -> np.ndarray:
+        """Return one uint64 category mask per recipe."""
+        masks = np.zeros(len(recipes), dtype=np.uint64)
+        for i, recipe in enumerate(recipes):
+            texts = [
+                recipe.get("recipe_name") or "",
+                *(recipe.get("ingredients_preview") or []),
+            ]
+            mask = 0
+            for text in texts:
+                mask |= ingredient_mask(text)
+            if literals:
+                # Whole phrases within one text: "kiwi fruit" does not match "fruit"
+                phrases = [f" {_phrase(text)} " for text in texts]
+                for literal, bit in literals.items():
+                    if any(f" {literal} " in phrase for phrase in phrases):
+                        mask |= 1 << bit
+            masks[i] = mask
+        return masks
+
+    def filter(
+        self,
+        recipes: list[dict[str, Any]],
+        allergies: Iterable[str] | None = None,
+        diet: str | None = None,
+    ) -> tuple[list[dict[str, Any]], list[dict[str, Any]]]:
+        """Split candidates into accepted recipes and rejections.
+
+        Returns:
+            The accepted recipes, and a list of {"recipe_name", "violations"}
+            entries for the rejected ones
+        """
+        forbidden, literals = self.forbidden_mask(allergies, diet)
+        if not recipes or not forbidden:
+            return list(recipes), []
+        masks = self.recipe_masks(recipes, literals)
+        violations = masks & np.uint64(forbidden)
+        accepted_rows = violations == 0
+
+        names = {bit: name for name, bit in CATEGORY_BITS.items()}
+        for literal, bit in literals.items():
+            names[bit] = f"{names[bit]}/{literal}" if bit in names else literal
+        accepted, rejected = [], []
+        for recipe, ok, violation in zip(
+            recipes, accepted_rows, violations, strict=True
+        ):
+            if ok:
+                accepted.append(recipe)
+                continue
+            violation = int(violation)
+            rejected.append(
+                {
+                    "recipe_name": recipe.get("recipe_name"),
+                    "violations": [
+                        name
+                        for bit, name in sorted(names.items())
+                        if violation >> bit & 1
+                    ],
+                }
+            )
+        return accepted, rejected
+
+
+constraint_filter = ConstraintFilter()
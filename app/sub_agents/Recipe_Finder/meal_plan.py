@@ -0,0 +1,295 @@
+"""Meal plans generated one day at a time, days in parallel.
+
+A weekly plan used to be one long generation followed by one long
+validation. Each day is now a short, independent generation: days run
+concurrently (bounded by MEAL_PLAN_CONCURRENCY), each is checked on its own
+against the shared constraints (allergies, diet, cuisine, protein goal and
+calorie target) and regenerated with the violation as feedback, then the
+days are assembled in order into the `meal_plan` state read by final_agent.
+"""
+
+import asyncio
+import json
+import os
+import re
+from typing import Any
+
+from google.adk.tools import ToolContext
+from google.genai import types
+from pydantic import BaseModel, Field
+
+from app.utils.metrics import metrics
+from app.utils.models import genai_client, get_model_settings
+from app.utils.resilience import get_policy
+
+from .constraints import constraint_filter, load_requirements
+
+WEEKDAYS = (
+    "Monday",
+    "Tuesday",
+    "Wednesday",
+    "Thursday",
+    "Friday",
+    "Saturday",
+    "Sunday",
+)
+MAX_DAYS = 14
+_CALORIE_KEYS = ("calorie_goal", "target_calories", "calories", "daily_calories")
+_NUMBER_RE = re.compile(r"\d+(?:\.\d+)?")
+
+
+class Meal(BaseModel):
+    meal: str = Field(description="Breakfast, Lunch, Dinner or Snack.")
+    name: str = Field(description="The name of the dish.")
+    ingredients: list[str] = Field(description="The main ingredients.")
+    calories: float = Field(description="Calories of the meal in kcal.")
+    protein_g: float = Field(description="Protein of the meal in grams.")
+    cuisine: str | None = Field(
+        default=None, description="The cuisine of the dish, e.g. Indian."
+    )
+
+
+class DayPlan(BaseModel):
+    day: str
+    meals: list[Meal]
+
+
+def day_labels(days: int) -> list[str]:
+    """Weekday names for a week, "Day N" otherwise."""
+    days = max(1, min(days, MAX_DAYS))
+    if days == len(WEEKDAYS):
+        return list(WEEKDAYS)
+    return [f"Day {i}" for i in range(1, days + 1)]
+
+
+def calorie_target(requirements: dict[str, Any]) -> float | None:
+    """Daily calorie target of the requirements, if they state one."""
+    for key in _CALORIE_KEYS:
+        value = requirements.get(key)
+        if isinstance(value, int | float):
+            return float(value)
+        if isinstance(value, str) and (match := _NUMBER_RE.search(value)):
+            return float(match.group())
+    return None
+
+
+def day_prompt(
+    day: str, index: int, total: int, requirements: dict[str, Any], feedback: str | None
+) -> str:
+    prompt = (
+        f"Plan the meals of {day} (day {index} of a {total}-day plan) for these requirements:\n"
+        f"{json.dumps(requirements, ensure_ascii=False)}\n"
+        "Plan breakfast, lunch and dinner, with a snack only if needed to reach the targets. "
+        "Give calories and protein per meal. Vary the dishes from one day to the next."
+    )
+    if (target := calorie_target(requirements)) is not None:
+        prompt += f"\nThe meals must total about {target:g} kcal."
+    if feedback:
+        prompt += f"\nA previous plan for this day was rejected: {feedback} Fix it."
+    return prompt
+
+
+def check_day(
+    day: dict[str, Any], requirements: dict[str, Any], calorie_tolerance: float
+) -> str | None:
+    """Return why a day breaks the shared constraints, None if it meets them."""
+    # Imported here: the validator imports this package's constraints module
+    from sub_agents.Final.validator import validate_final_output
+
+    # Checked here as well: the validator defers to the model, before its
+    # allergen check, when the requirements hold conditions or a vague goal
+    meals = [
+        {
+            "recipe_name": meal.get("name"),
+            "ingredients_preview": meal.get("ingredients") or [],
+        }
+        for meal in day["meals"]
+    ]
+    _, rejected = constraint_filter.filter(
+        meals, requirements.get("allergies") or [], requirements.get("diet_type")
+    )
+    if rejected:
+        names = ", ".join(str(meal["recipe_name"]) for meal in rejected)
+        return f"The output contains ingredients you need to avoid: {names}."
+    verdict = validate_final_output(
+        {"meal_plan": {"days": [day]}, "user_requirements": requirements}
+    )
+    if verdict.status == "invalid":
+        return verdict.message
+    target = calorie_target(requirements)
+    if target:
+        total = sum(meal.get("calories") or 0 for meal in day["meals"])
+        if abs(total - target) > target * calorie_tolerance:
+            return f"The day totals {total:g} kcal instead of about {target:g} kcal."
+    return None
+
+
+def generate_day(
+    day: str,
+    index: int,
+    total: int,
+    requirements: dict[str, Any],
+    feedback: str | None = None,
+) -> dict[str, Any]:
+    """Generate the meals of one day (blocking, run in a worker thread)."""
+    settings = get_model_settings("meal_plan_day")
+    config = types.GenerateContentConfig(
+        response_mime_type="application/json",
+        response_json_schema=DayPlan.model_json_schema(),
+        thinking_config=types.ThinkingConfig(thinking_budget=settings.thinking_budget)
+        if settings.thinking_budget is not None
+        else None,
+        max_output_tokens=settings.max_output_tokens,
+    )
+    # Invalid JSON is retried on the escalation model, like recipe search
+    models = [settings.model] + (
+        [settings.escalation_model] if settings.escalation_model else []
+    )
+    for attempt, model in enumerate(models):
+        response = get_policy("meal_plan_day").call(
+            genai_client().models.generate_content,
+            model=model,
+            contents=day_prompt(day, index, total, requirements, feedback),
+            config=config,
+        )
+        try:
+            plan = DayPlan.model_validate_json(response.text or "")
+        except ValueError:
+            if attempt == len(models) - 1:
+                raise
+            metrics.incr("model_escalation.applied.meal_plan_day")
+            continue
+        return {**plan.model_dump(exclude_none=True), "day": day}
+    raise AssertionError("unreachable")
+
+
+class MealPlanner:
+    """Generates the days of a plan concurrently, with per-day constraint checks.
+
+    Args:
+        concurrency: Days generated at once
+        max_attempts: Generations per day, each retry gets the violation as feedback
+        calorie_tolerance: Accepted relative deviation from the calorie target
+    """
+
+    def __init__(
+        self,
+        concurrency: int = 4,
+        max_attempts: int = 2,
+        calorie_tolerance: float = 0.15,
+    ) -> None:
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        self.calorie_tolerance = calorie_tolerance
+
+    async def plan(
+        self, requirements: dict[str, Any], days: int
+    ) -> tuple[dict[str, Any], list[str]]:
+        """Return the meal plan {"days": [{"day", "meals": [...]}]} and the errors
+        of the days that could not be planned within the constraints."""
+        labels = day_labels(days)
+        # Per call: a semaphore is bound to the event loop it is first used on
+        semaphore = asyncio.Semaphore(self.concurrency)
+        results = await asyncio.gather(
+            *(
+                self._plan_day(semaphore, label, index, len(labels), requirements)
+                for index, label in enumerate(labels, start=1)
+            )
+        )
+        planned = [day for day, _ in results if day is not None]
+        errors = [error for _, error in results if error]
+        return {"days": planned}, errors
+
+    async def _plan_day(
+        self,
+        semaphore: asyncio.Semaphore,
+        label: str,
+        index: int,
+        total: int,
+        requirements: dict[str, Any],
+    ) -> tuple[dict[str, Any] | None, str | None]:
+        feedback = None
+        async with semaphore:
+            for attempt in range(self.max_attempts):
+                if attempt:
+                    metrics.incr("meal_plan.day_regenerated")
+                try:
+                    day = await asyncio.to_thread(
+                        generate_day, label, index, total, requirements, feedback
+                    )
+                except Exception as e:
+                    metrics.incr("meal_plan.day_failed")
+                    return None, f"{label}: {e}"
+                feedback = check_day(day, requirements, self.calorie_tolerance)
+                if feedback is None:
+                    return day, None
+        metrics.incr("meal_plan.day_rejected")
+        return None, f"{label}: {feedback}"
+
+
+def planner_from_env() -> MealPlanner:
+    """MealPlanner configured by MEAL_PLAN_CONCURRENCY and MEAL_PLAN_MAX_ATTEMPTS."""
+    return MealPlanner(
+        concurrency=int(os.environ.get("MEAL_PLAN_CONCURRENCY", "4")),
+        max_attempts=int(os.environ.get("MEAL_PLAN_MAX_ATTEMPTS", "2")),
+    )
+
+
+async def generate_meal_plan(
+    tool_context: ToolContext,
+    days: int = 7,
+    calorie_goal: int | None = None,
+    diet_type: str | None = None,
+    allergies: list[str] | None = None,
+    protein_goal: str | None = None,
+    dietary_goals: str | None = None,
+    cuisine: str | None = None,
+    conditions: list[str] | None = None,
+) -> dict[str, Any]:
+    """Generate a meal plan for the user's requirements and store it in state.
+
+    Args:
+        tool_context: The ADK tool context.
+        days: Number of days to plan, 1 for a daily plan and 7 for a weekly plan.
+        calorie_goal: Daily calorie target in kcal, e.g. 1800.
+        diet_type: Diet to follow, e.g. "vegetarian" or "keto".
+        allergies: Ingredients to exclude, e.g. ["peanuts", "dairy"].
+        protein_goal: Protein target, e.g. "100g per day" or "25g per meal".
+        dietary_goals: Goal of the plan, e.g. "weight loss".
+        cuisine: Preferred cuisine, e.g. "Indian".
+        conditions: Health conditions to account for, e.g. ["diabetes"].
+
+    Returns:
+        The meal plan, {"days": [{"day", "meals": [...]}]}, with an "error"
+        explaining the days that could not be planned, if any.
+    """
+    given = {
+        "calorie_goal": calorie_goal,
+        "diet_type": diet_type,
+        "allergies": allergies,
+        "protein_goal": protein_goal,
+        "dietary_goals": dietary_goals,
+        "cuisine": cuisine,
+        "conditions": conditions,
+    }
+    # Arguments take precedence over requirements stored by an earlier turn
+    requirements = {
+        **load_requirements(tool_context.state.get("user_requirements")),
+        **{key: value for key, value in given.items() if value},
+        "request_type": "dietary_plan",
+    }
+    meal_plan, errors = await planner_from_env().plan(requirements, days)
+    # Final validation checks the plan against the requirements it was made for
+    tool_context.state["user_requirements"] = requirements
+    tool_context.state["meal_plan"] = meal_plan
+    # Lets final validation tell this turn's plan from an earlier one
+    tool_context.state["finder_invocation_id"] = tool_context.invocation_id
+    if not errors:
+        tool_context.state["finder_error"] = None
+        return meal_plan
+    if meal_plan["days"]:
+        error = "Some days could not be planned: " + "; ".join(errors)
+    else:
+        error = "No day could be planned within the requirements: " + "; ".join(errors)
+    tool_context.state["finder_error"] = error
+    return {**meal_plan, "error": error}
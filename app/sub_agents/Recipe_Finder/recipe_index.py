@@ -0,0 +1,249 @@
+"""Local recipe store queried before falling back to grounded Google Search."""
+
+import json
+import logging
+import math
+import os
+import re
+import threading
+from collections import Counter, defaultdict
+from typing import Any
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+_STOPWORDS = frozenset(
+    "a an and best easy for how i in make me of recipe the to want with".split()
+)
+
+
+def normalize_term(term: str) -> str:
+    """Lower-case a single word and strip simple English plural endings."""
+    term = term.strip().lower()
+    if len(term) > 4 and term.endswith("ies"):
+        return term[:-3] + "y"
+    if len(term) > 3 and term.endswith("s") and not term.endswith("ss"):
+        return term[:-1]
+    return term
+
+
+def tokenize(text: str | None) -> list[str]:
+    """Split free text into normalized terms, dropping common filler words."""
+    if not text:
+        return []
+    terms = (normalize_term(token) for token in _TOKEN_RE.findall(text))
+    return [term for term in terms if term not in _STOPWORDS]
+
+
+def _intolerance_key(intolerance: str) -> str:
+    return " ".join(tokenize(intolerance))
+
+
+class RecipeIndex:
+    """In-process recipe store with an inverted ingredient index.
+
+    Every validated recipe returned by grounded search is added here together
+    with the cuisine, diet and intolerances it was searched for. Lookups score
+    candidates by the IDF-weighted share of query terms found in the recipe
+    name, summary and ingredients (ties broken by TF-IDF cosine similarity),
+    and apply cuisine, diet and intolerance constraints as index filters
+    before scoring.
+    """
+
+    def __init__(self, path: str | None = None, min_score: float = 0.8) -> None:
+        """
+        Args:
+            path: Optional JSON lines file used to persist the store
+            min_score: Query-term coverage below which a match is low-confidence
+        """
+        self.path = path
+        self.min_score = min_score
+        self._lock = threading.Lock()
+        self._entries: list[dict[str, Any]] = []
+        self._term_counts: list[Counter[str]] = []
+        self._names: dict[str, int] = {}
+        self._term_index: defaultdict[str, set[int]] = defaultdict(set)
+        self._ingredient_index: defaultdict[str, set[int]] = defaultdict(set)
+        self._cuisine_index: defaultdict[str, set[int]] = defaultdict(set)
+        self._diet_index: defaultdict[str, set[int]] = defaultdict(set)
+        self._intolerance_index: defaultdict[str, set[int]] = defaultdict(set)
+        if path and os.path.exists(path):
+            self._load(path)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def add(
+        self,
+        recipe: dict[str, Any],
+        cuisine: str | None = None,
+        diet_tags: list[str] | None = None,
+        intolerances: list[str] | None = None,
+    ) -> bool:
+        """Add a recipe to the store.
+
+        Args:
+            recipe: A validated `Recipe` dump (recipe_name, summary, ingredients_preview)
+            cuisine: Cuisine the recipe was found for, if any
+            diet_tags: Diets the recipe was found compliant with
+            intolerances: Ingredients the search that found the recipe excluded
+
+        Returns:
+            False if a recipe with the same name is already stored
+        """
+        with self._lock:
+            added = self._add_locked(
+                recipe, cuisine, diet_tags or [], intolerances or []
+            )
+            # Read under the lock: a concurrent add may append right after
+            entry = self._entries[-1] if added else None
+        if entry is not None and self.path:
+            self._append_to_file(self.path, entry)
+        return added
+
+    def search(
+        self,
+        query: str,
+        cuisine: str | None = None,
+        diet: str | None = None,
+        intolerances: list[str] | None = None,
+        max_results: int = 3,
+    ) -> list[tuple[dict[str, Any], float]]:
+        """Return up to `max_results` (recipe, score) pairs, best first.
+
+        Only recipes found by a search excluding all of the given
+        intolerances are returned, never one whose ingredients contain one.
+        Recipes not matching the requested cuisine or diet are never returned.
+        """
+        query_terms = Counter(tokenize(query))
+        if not query_terms:
+            return []
+        with self._lock:
+            candidates: set[int] = set()
+            for term in query_terms:
+                candidates |= self._term_index.get(term, set())
+            if cuisine:
+                candidates &= self._cuisine_index.get(normalize_term(cuisine), set())
+            if diet:
+                candidates &= self._diet_index.get(normalize_term(diet), set())
+            for intolerance in intolerances or []:
+                # The ingredient preview alone cannot show a recipe is free of it
+                candidates &= self._intolerance_index.get(
+                    _intolerance_key(intolerance), set()
+                )
+                for term in tokenize(intolerance):
+                    candidates -= self._ingredient_index.get(term, set())
+
+            total = len(self._entries)
+            query_weights = {
+                term: count * self._idf(term, total)
+                for term, count in query_terms.items()
+            }
+            query_total = sum(query_weights.values())
+            query_norm = math.sqrt(sum(w * w for w in query_weights.values()))
+            scored = []
+            for doc_id in candidates:
+                doc_terms = self._term_counts[doc_id]
+                coverage = sum(
+                    weight
+                    for term, weight in query_weights.items()
+                    if term in doc_terms
+                )
+                doc_weights = [
+                    count * self._idf(term, total) for term, count in doc_terms.items()
+                ]
+                doc_norm = math.sqrt(sum(w * w for w in doc_weights))
+                dot = sum(
+                    weight * doc_terms[term] * self._idf(term, total)
+                    for term, weight in query_weights.items()
+                    if term in doc_terms
+                )
+                cosine = dot / (doc_norm * query_norm) if doc_norm else 0.0
+                scored.append((coverage / query_total, cosine, doc_id))
+            scored.sort(key=lambda item: (-item[0], -item[1], item[2]))
+            return [
+                (dict(self._entries[doc_id]["recipe"]), score)
+                for score, _, doc_id in scored[:max_results]
+            ]
+
+    def lookup(
+        self,
+        query: str,
+        cuisine: str | None = None,
+        diet: str | None = None,
+        intolerances: list[str] | None = None,
+        max_results: int = 3,
+    ) -> list[dict[str, Any]] | None:
+        """Return stored recipes if the store can confidently answer the query.
+
+        Returns None on a miss or when fewer than `max_results` recipes reach
+        `min_score`, in which case the caller should fall back to the model.
+        """
+        hits = self.search(query, cuisine, diet, intolerances, max_results)
+        confident = [recipe for recipe, score in hits if score >= self.min_score]
+        if len(confident) < max_results:
+            return None
+        return confident
+
+    def _idf(self, term: str, total: int) -> float:
+        return math.log((1 + total) / (1 + len(self._term_index.get(term, ())))) + 1
+
+    def _add_locked(
+        self,
+        recipe: dict[str, Any],
+        cuisine: str | None,
+        diet_tags: list[str],
+        intolerances: list[str],
+    ) -> bool:
+        name_key = " ".join(tokenize(recipe.get("recipe_name")))
+        if not name_key or name_key in self._names:
+            return False
+        doc_id = len(self._entries)
+        ingredients = recipe.get("ingredients_preview") or []
+        entry = {
+            "recipe": recipe,
+            "cuisine": cuisine,
+            "diet_tags": list(diet_tags),
+            "intolerances": list(intolerances),
+        }
+        terms = Counter(tokenize(recipe.get("recipe_name")))
+        terms.update(tokenize(recipe.get("summary")))
+        for ingredient in ingredients:
+            ingredient_terms = tokenize(ingredient)
+            terms.update(ingredient_terms)
+            for term in ingredient_terms:
+                self._ingredient_index[term].add(doc_id)
+        for term in terms:
+            self._term_index[term].add(doc_id)
+        if cuisine:
+            self._cuisine_index[normalize_term(cuisine)].add(doc_id)
+        for tag in diet_tags:
+            self._diet_index[normalize_term(tag)].add(doc_id)
+        for intolerance in intolerances:
+            self._intolerance_index[_intolerance_key(intolerance)].add(doc_id)
+        self._entries.append(entry)
+        self._term_counts.append(terms)
+        self._names[name_key] = doc_id
+        return True
+
+    def _load(self, path: str) -> None:
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    logging.warning(f"Skipping malformed recipe index line in {path}")
+                    continue
+                self._add_locked(
+                    entry["recipe"],
+                    entry.get("cuisine"),
+                    entry.get("diet_tags", []),
+                    entry.get("intolerances", []),
+                )
+
+    def _append_to_file(self, path: str, entry: dict[str, Any]) -> None:
+        try:
+            with open(path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        except OSError as e:
+            logging.warning(f"Unable to persist recipe index entry: {e}")
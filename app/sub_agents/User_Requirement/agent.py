@@ -1,6 +1,11 @@
+from typing import Any
+
 from google.adk.agents import Agent
+from google.adk.tools import FunctionTool, ToolContext
 from google.adk.tools.preload_memory_tool import preload_memory_tool
 
+from app.utils.models import agent_model_kwargs
+
 USER_REQUIREMENT_INSTR = """
 You are a user requirement gathering agent for a personalized recipe and dietary planning system.
 Your role is to extract and process user preferences and constraints from their query, including:
@@ -18,7 +23,7 @@ Steps:
    - If the user asks for a dietary plan (e.g., "I need a weekly diet plan for weight loss"), set 'request_type' to 'dietary_plan'.
 2. Extract relevant preferences and constraints, storing them in a structured format.
 3. If critical information is missing (e.g., calorie goals for a dietary plan), prompt the user for clarification.
-4. Store the extracted data in the session state under 'user_requirements'.
+4. Store the extracted data in the session state under 'user_requirements' by calling the save_user_requirements tool, leaving out what the user did not state.
 
 Output format:
 - Store in the session state as a dictionary:
@@ -36,12 +41,54 @@ Output format:
 - Answer using user language.
 """
 
+def save_user_requirements(
+    tool_context: ToolContext,
+    request_type: str,
+    dietary_goals: str | None = None,
+    cuisine: str | None = None,
+    diet_type: str | None = None,
+    ingredients: list[str] | None = None,
+    allergies: list[str] | None = None,
+    protein_goal: str | None = None,
+    conditions: list[str] | None = None,
+) -> dict[str, Any]:
+    """Store the user's requirements in the session state under 'user_requirements'.
+
+    Args:
+        tool_context: The ADK tool context.
+        request_type: "recipe" for a single recipe, "dietary_plan" for a plan.
+        dietary_goals: Goal of the user, e.g. "weight loss".
+        cuisine: Preferred cuisine, e.g. "Indian".
+        diet_type: Diet to follow, e.g. "vegetarian" or "keto".
+        ingredients: Ingredients to use, e.g. ["chicken", "rice"].
+        allergies: Ingredients to exclude, e.g. ["peanuts", "dairy"].
+        protein_goal: Protein target, e.g. "100g per day" or "25g per meal".
+        conditions: Health conditions to account for, e.g. ["diabetes"].
+
+    Returns:
+        The stored requirements.
+    """
+    requirements = {
+        "request_type": request_type,
+        "dietary_goals": dietary_goals,
+        "cuisine": cuisine,
+        "diet_type": diet_type,
+        "ingredients": ingredients,
+        "allergies": allergies,
+        "protein_goal": protein_goal,
+        "conditions": conditions,
+    }
+    # Read by recipe_finder_agent's tools and by final validation
+    tool_context.state["user_requirements"] = requirements
+    return requirements
+
 user_requirement_agent = Agent(
-    model="gemini-2.5-flash",
+    **agent_model_kwargs("user_requirement_agent"),
     name="user_requirement_agent",
     description="Agent to gather user dietary preferences and constraints",
     instruction=USER_REQUIREMENT_INSTR,
     tools=[
+        FunctionTool(save_user_requirements),
         preload_memory_tool
     ]
 )
\ No newline at end of file
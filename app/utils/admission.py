@@ -0,0 +1,245 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import heapq
+import itertools
+import math
+import os
+import threading
+import time
+from collections.abc import Callable
+from typing import Any
+
+from app.utils.metrics import metrics
+
+# Beyond this many users, idle rate limiting and fairness state is pruned
+MAX_TRACKED_USERS = 10_000
+
+
+class AdmissionRejected(Exception):
+    """A turn was not admitted; the caller may retry after `retry_after` seconds."""
+
+    def __init__(self, reason: str, retry_after: float) -> None:
+        super().__init__(f"Too many requests ({reason}), retry in {retry_after:.0f}s")
+        self.reason = reason
+        self.retry_after = retry_after
+
+    def event(self) -> dict[str, Any]:
+        """The rejection as the single event of the turn's stream."""
+        return {
+            "author": "admission_control",
+            "error_code": "RESOURCE_EXHAUSTED",
+            "error_message": str(self),
+            "custom_metadata": {
+                "reason": self.reason,
+                "retry_after_seconds": math.ceil(self.retry_after),
+            },
+        }
+
+
+class TokenBucket:
+    """Allows `burst` requests at once, refilled at `rate` requests per second."""
+
+    def __init__(self, rate: float, burst: float, now: float) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = now
+
+    def take(self, now: float) -> float:
+        """Take a token; 0 if one was available, else the seconds until one is."""
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens >= 1:
+            self.tokens -= 1
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def full(self, now: float) -> bool:
+        return self.tokens + (now - self.updated) * self.rate >= self.burst
+
+
+def parse_weights(value: str | None) -> dict[str, float]:
+    """Parse ADMISSION_USER_WEIGHTS, e.g. "premium-user=2,batch-user=0.5"."""
+    weights = {}
+    for item in (value or "").split(","):
+        user_id, _, weight = item.partition("=")
+        if user_id.strip() and weight.strip():
+            weights[user_id.strip()] = float(weight)
+    return weights
+
+
+class AdmissionController:
+    """Per-user rate limits, a global concurrency cap and a weighted fair queue.
+
+    Each user has a token bucket of `user_burst` turns refilled at
+    `user_rate` per second; a user out of tokens is rejected at once. At
+    most `max_concurrent` turns run; the others wait in a start-time fair
+    queue where each user's turns are spaced by 1/weight of virtual time,
+    so a user with many queued turns cannot delay the first turn of
+    another user by more than one turn per slot. When `max_queue` turns are
+    waiting, or a turn waited `max_queue_wait` seconds, it is rejected with
+    an estimate of when to retry.
+
+    The state is shared by every event loop of the process (the sync query
+    methods run their own loop per call).
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 8,
+        max_queue: int = 64,
+        max_queue_wait: float = 30.0,
+        user_rate: float = 0.5,
+        user_burst: float = 5.0,
+        weights: dict[str, float] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_wait = max_queue_wait
+        self.user_rate = user_rate
+        self.user_burst = user_burst
+        self.weights = weights or {}
+        self.clock = clock
+        self.in_flight = 0
+        self._lock = threading.Lock()
+        self._buckets: dict[str, TokenBucket] = {}
+        self._last_tag: dict[str, float] = {}
+        self._virtual_time = 0.0
+        self._queue: list[
+            tuple[float, int, asyncio.AbstractEventLoop, asyncio.Future]
+        ] = []
+        # Futures of the queued turns, a turn leaves it when granted or given up
+        self._waiting: set[asyncio.Future] = set()
+        self._seq = itertools.count()
+        self._turn_seconds = 10.0
+
+    @classmethod
+    def from_env(cls) -> "AdmissionController":
+        """Configured by ADMISSION_MAX_CONCURRENT, ADMISSION_MAX_QUEUE,
+        ADMISSION_MAX_QUEUE_WAIT_SECONDS, ADMISSION_USER_RATE,
+        ADMISSION_USER_BURST and ADMISSION_USER_WEIGHTS."""
+        return cls(
+            max_concurrent=int(os.environ.get("ADMISSION_MAX_CONCURRENT", "8")),
+            max_queue=int(os.environ.get("ADMISSION_MAX_QUEUE", "64")),
+            max_queue_wait=float(
+                os.environ.get("ADMISSION_MAX_QUEUE_WAIT_SECONDS", "30")
+            ),
+            user_rate=float(os.environ.get("ADMISSION_USER_RATE", "0.5")),
+            user_burst=float(os.environ.get("ADMISSION_USER_BURST", "5")),
+            weights=parse_weights(os.environ.get("ADMISSION_USER_WEIGHTS")),
+        )
+
+    async def acquire(self, user_id: str) -> float:
+        """Wait for a slot; returns the admission time to pass to `release`.
+
+        Raises:
+            AdmissionRejected: Rate limited, queue full, or waited too long
+        """
+        start = self.clock()
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            self._prune(start)
+            bucket = self._buckets.get(user_id)
+            if bucket is None:
+                bucket = self._buckets[user_id] = TokenBucket(
+                    self.user_rate, self.user_burst, start
+                )
+            wait = bucket.take(start)
+            if wait:
+                raise self._reject("rate_limited", wait)
+            immediate = self.in_flight < self.max_concurrent and not self._waiting
+            if not immediate and len(self._waiting) >= self.max_queue:
+                raise self._reject("queue_full", self._estimated_wait())
+            tag = max(self._virtual_time, self._last_tag.get(user_id, 0.0))
+            self._last_tag[user_id] = tag + 1 / self.weights.get(user_id, 1.0)
+            if immediate:
+                self.in_flight += 1
+                self._virtual_time = tag
+                self._publish()
+                metrics.observe("admission.queue_wait_ms", 0.0)
+                return start
+            future = loop.create_future()
+            heapq.heappush(self._queue, (tag, next(self._seq), loop, future))
+            self._waiting.add(future)
+            self._publish()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.max_queue_wait)
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            with self._lock:
+                granted = future not in self._waiting
+                self._waiting.discard(future)
+                self._publish()
+            if not granted:
+                if isinstance(e, asyncio.TimeoutError):
+                    raise self._reject(
+                        "queue_timeout", self._estimated_wait()
+                    ) from None
+                raise
+            if isinstance(e, asyncio.CancelledError):
+                self.release(self.clock())
+                raise
+            # Granted as the wait timed out: the slot is ours
+        admitted = self.clock()
+        metrics.observe("admission.queue_wait_ms", (admitted - start) * 1000)
+        return admitted
+
+    def release(self, admitted: float) -> None:
+        """Free the slot of a turn admitted at `admitted` and grant the next one."""
+        with self._lock:
+            # Recent turn durations drive the retry hints
+            self._turn_seconds = 0.9 * self._turn_seconds + 0.1 * (
+                self.clock() - admitted
+            )
+            self.in_flight -= 1
+            while self._queue and self.in_flight < self.max_concurrent:
+                tag, _, loop, future = heapq.heappop(self._queue)
+                if future not in self._waiting:
+                    continue
+                self._waiting.discard(future)
+                self.in_flight += 1
+                self._virtual_time = tag
+                loop.call_soon_threadsafe(self._grant, future)
+            self._publish()
+
+    @staticmethod
+    def _grant(future: asyncio.Future) -> None:
+        if not future.done():
+            future.set_result(None)
+
+    def _estimated_wait(self) -> float:
+        return max(
+            1.0, self._turn_seconds * (len(self._waiting) + 1) / self.max_concurrent
+        )
+
+    def _reject(self, reason: str, retry_after: float) -> AdmissionRejected:
+        metrics.incr(f"admission.rejected.{reason}")
+        return AdmissionRejected(reason, retry_after)
+
+    def _publish(self) -> None:
+        metrics.set_gauge("admission.in_flight", self.in_flight)
+        metrics.set_gauge("admission.queued", len(self._waiting))
+
+    def _prune(self, now: float) -> None:
+        if len(self._buckets) > MAX_TRACKED_USERS:
+            self._buckets = {
+                user: b for user, b in self._buckets.items() if not b.full(now)
+            }
+        if len(self._last_tag) > MAX_TRACKED_USERS:
+            # Tags behind the virtual time no longer affect scheduling
+            self._last_tag = {
+                user: t for user, t in self._last_tag.items() if t > self._virtual_time
+            }
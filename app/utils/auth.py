@@ -0,0 +1,111 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import re
+import threading
+from collections import OrderedDict
+from collections.abc import Iterable
+from typing import Any
+
+from google.adk.sessions.state import State
+
+from app.utils.metrics import metrics
+
+
+@functools.lru_cache(maxsize=64)
+def token_key_pattern(auth_id: str) -> re.Pattern[str]:
+    """Return the pattern of state keys holding tokens for `auth_id`: temp:<auth_id>[_N]."""
+    return re.compile(f"temp:{re.escape(auth_id)}(?:_(\\d+))?")
+
+
+def _state_keys(state: Any) -> Iterable[str]:
+    if isinstance(state, State):
+        # Stored value and pending delta, through State's public API
+        return state.to_dict().keys()
+    return state.keys()
+
+
+def _suffix(key: str, auth_id: str) -> int:
+    """Suffix N of temp:<auth_id>_N, 0 for the unsuffixed key (re-authorizations start at _1)."""
+    base = len(f"temp:{auth_id}")
+    return int(key[base + 1 :]) if len(key) > base else 0
+
+
+class TokenResolver:
+    """Resolves OAuth access tokens stored in session state by Gemini Enterprise.
+
+    Tokens are stored under `temp:<auth_id>`, or `temp:<auth_id>_<N>` when the
+    user re-authorized; the key with the highest N is the newest. The key
+    found for each (session, auth id) is indexed, so later lookups probe the
+    indexed key and its successors directly instead of scanning the state.
+    """
+
+    def __init__(self, max_sessions: int = 4096) -> None:
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._index: OrderedDict[tuple[str, str], str] = OrderedDict()
+
+    def resolve(
+        self, state: Any, auth_id: str, session_id: str | None = None
+    ) -> str | None:
+        """Return the newest access token for `auth_id`, or None if there is none.
+
+        Args:
+            state: Session state (ADK `State` or a mapping)
+            auth_id: Authorization id configured in Gemini Enterprise
+            session_id: Session the state belongs to, enables the index
+        """
+        with self._lock:
+            key = self._index.get((session_id, auth_id)) if session_id else None
+        if key is not None and isinstance(state.get(key), str):
+            metrics.incr("token_resolver.indexed")
+        else:
+            key = self._scan(state, auth_id)
+            metrics.incr("token_resolver.scanned")
+            if key is None:
+                return None
+
+        # A re-authorization during the session adds the next suffix
+        suffix = _suffix(key, auth_id)
+        while isinstance(state.get(f"temp:{auth_id}_{suffix + 1}"), str):
+            suffix += 1
+            key = f"temp:{auth_id}_{suffix}"
+
+        if session_id:
+            index_key = (session_id, auth_id)
+            with self._lock:
+                self._index[index_key] = key
+                self._index.move_to_end(index_key)
+                while len(self._index) > self.max_sessions:
+                    self._index.popitem(last=False)
+        return state[key]
+
+    def _scan(self, state: Any, auth_id: str) -> str | None:
+        pattern = token_key_pattern(auth_id)
+        newest, newest_suffix = None, -1
+        for key in _state_keys(state):
+            if not pattern.fullmatch(key) or not isinstance(state.get(key), str):
+                continue
+            suffix = _suffix(key, auth_id)
+            if suffix > newest_suffix:
+                newest, newest_suffix = key, suffix
+        return newest
+
+    def clear(self) -> None:
+        with self._lock:
+            self._index.clear()
+
+
+token_resolver = TokenResolver()
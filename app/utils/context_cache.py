@@ -0,0 +1,45 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+from typing import Any
+
+from google.adk.agents.context_cache_config import ContextCacheConfig
+
+
+def context_cache_config_from_env() -> ContextCacheConfig | None:
+    """Return ADK's context caching config, or None when caching is disabled.
+
+    ADK caches the system instruction, tool declarations and the history of
+    a session as a Vertex AI context cache (created through the async
+    client) and reuses it on the following model calls whose prefix matches.
+    Configured by PROMPT_CACHE_ENABLED, PROMPT_CACHE_TTL_SECONDS,
+    PROMPT_CACHE_INTERVALS (invocations before a cache is refreshed) and
+    PROMPT_CACHE_MIN_TOKENS (smaller requests are sent uncached).
+    """
+    if os.environ.get("PROMPT_CACHE_ENABLED", "true").lower() != "true":
+        return None
+    return ContextCacheConfig(
+        ttl_seconds=int(os.environ.get("PROMPT_CACHE_TTL_SECONDS", "1800")),
+        cache_intervals=int(os.environ.get("PROMPT_CACHE_INTERVALS", "10")),
+        # Gemini does not cache prefixes below this size
+        min_tokens=int(os.environ.get("PROMPT_CACHE_MIN_TOKENS", "4096")),
+    )
+
+
+def apply_context_cache(runners: list[Any], config: ContextCacheConfig | None) -> None:
+    """Enable context caching on runners built without an ADK `App`."""
+    for runner in runners:
+        if runner is not None and runner.context_cache_config is None:
+            runner.context_cache_config = config
@@ -0,0 +1,233 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import os
+from typing import Any, Literal
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.adk.plugins.base_plugin import BasePlugin
+from google.genai import types
+from pydantic import BaseModel
+
+from app.utils.metrics import metrics
+from app.utils.models import genai_client, resolve_model
+
+SUMMARY_PREFIX = "Summary of the earlier conversation:"
+
+_SUMMARY_PROMPT = """Update the running summary of a conversation between a user and a
+recipe and diet planning assistant. Keep user requirements (allergies, diet,
+cuisine, goals), decisions and results; drop small talk. Answer with the
+updated summary only, at most {max_chars} characters.
+
+Current summary:
+{summary}
+
+New messages:
+{messages}
+"""
+
+
+class ContextPolicy(BaseModel):
+    """Limits on the conversation history sent with each model call.
+
+    The oldest turns are dropped until at most `max_events` contents and
+    `max_tokens` estimated tokens remain. Dropped turns are folded into a
+    rolling summary kept in session state and sent ahead of the window.
+    """
+
+    max_events: int | None = 40
+    max_tokens: int | None = 32000
+    summary: Literal["none", "extractive", "llm"] = "extractive"
+    summary_model: str = "fast"
+    summary_max_chars: int = 4000
+
+    @classmethod
+    def from_env(cls) -> "ContextPolicy":
+        """Read CONTEXT_MAX_EVENTS, CONTEXT_MAX_TOKENS, CONTEXT_SUMMARY,
+        CONTEXT_SUMMARY_MODEL and CONTEXT_SUMMARY_MAX_CHARS, 0 disables a limit."""
+        values: dict[str, Any] = {}
+        for field in cls.model_fields:
+            env_value = os.environ.get(f"CONTEXT_{field.upper()}")
+            if env_value is not None:
+                values[field] = env_value
+        policy = cls.model_validate(values)
+        policy.max_events = policy.max_events or None
+        policy.max_tokens = policy.max_tokens or None
+        return policy
+
+
+def estimate_tokens(content: types.Content) -> int:
+    """Rough token estimate of a content, 4 characters per token."""
+    size = 0
+    for part in content.parts or []:
+        if part.text:
+            size += len(part.text)
+        elif part.function_call or part.function_response:
+            size += len(part.model_dump_json(exclude_none=True))
+        else:
+            # Inline media, counted at a flat rate
+            size += 1024
+    return size // 4 + 1
+
+
+def _is_turn_start(content: types.Content) -> bool:
+    # A user message, as opposed to a function response sent with the user role
+    return content.role == "user" and any(
+        part.text and not part.thought for part in content.parts or []
+    )
+
+
+def _turn_starts(contents: list[types.Content]) -> list[int]:
+    return [i for i, content in enumerate(contents) if _is_turn_start(content)]
+
+
+def window_start(contents: list[types.Content], policy: ContextPolicy) -> int:
+    """Index of the first content kept, always at a turn boundary.
+
+    The current (last) turn is always kept whole, so function calls are never
+    separated from their responses.
+    """
+    starts = _turn_starts(contents)
+    if not starts:
+        return 0
+    cut = starts[0]
+    if policy.max_events and len(contents) - cut > policy.max_events:
+        cut = next(
+            (s for s in starts if len(contents) - s <= policy.max_events), starts[-1]
+        )
+    if policy.max_tokens:
+        tokens = [estimate_tokens(content) for content in contents]
+        candidates = [start for start in starts if start >= cut]
+        remaining = sum(tokens[cut:])
+        for i, start in enumerate(candidates):
+            if remaining <= policy.max_tokens or i == len(candidates) - 1:
+                cut = start
+                break
+            remaining -= sum(tokens[start : candidates[i + 1]])
+    return cut
+
+
+def extractive_summary(contents: list[types.Content], max_line_chars: int = 200) -> str:
+    """One line per message: user requests and assistant answers, tool traffic skipped."""
+    lines = []
+    for content in contents:
+        text = " ".join(
+            part.text.strip()
+            for part in content.parts or []
+            if part.text and not part.thought
+        )
+        if not text:
+            continue
+        text = " ".join(text.split())
+        if len(text) > max_line_chars:
+            text = text[: max_line_chars - 3] + "..."
+        lines.append(f"- {'User' if content.role == 'user' else 'Assistant'}: {text}")
+    return "\n".join(lines)
+
+
+def _summary_key(agent_name: str) -> str:
+    return f"context_summary:{agent_name}"
+
+
+class ContextWindowPlugin(BasePlugin):
+    """Applies a `ContextPolicy` to the contents of every model request.
+
+    The summary state of each agent records how many leading contents it
+    covers, so each dropped turn is summarized only once. Without an explicit
+    policy, `ContextPolicy.from_env()` is read on first use, i.e. at runtime
+    on Agent Engine rather than at deployment.
+    """
+
+    def __init__(self, policy: ContextPolicy | None = None) -> None:
+        super().__init__(name="context_window")
+        self.policy = policy
+
+    async def before_model_callback(
+        self, *, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> LlmResponse | None:
+        if self.policy is None:
+            self.policy = ContextPolicy.from_env()
+        policy = self.policy
+        contents = llm_request.contents
+        cut = window_start(contents, policy)
+        if cut == 0:
+            return None
+
+        metrics.incr("context_window.trimmed")
+        metrics.observe("context_window.dropped_contents", cut)
+        window = contents[cut:]
+        if policy.summary != "none":
+            summary = await self._update_summary(
+                callback_context, contents[:cut], policy
+            )
+            if summary:
+                window.insert(
+                    0,
+                    types.Content(
+                        role="user",
+                        parts=[types.Part(text=f"{SUMMARY_PREFIX}\n{summary}")],
+                    ),
+                )
+        llm_request.contents = window
+        return None
+
+    async def _update_summary(
+        self,
+        callback_context: CallbackContext,
+        dropped: list[types.Content],
+        policy: ContextPolicy,
+    ) -> str:
+        key = _summary_key(callback_context.agent_name)
+        stored = callback_context.state.get(key) or {}
+        summary, covered = stored.get("text", ""), stored.get("covered", 0)
+        new = dropped[covered:]
+        if not new:
+            # The window may grow back when recent turns are short, the summary
+            # then overlaps it slightly
+            return summary
+
+        messages = extractive_summary(new)
+        if messages and policy.summary == "llm":
+            summary = await self._llm_summary(summary, messages, policy)
+        elif messages:
+            summary = f"{summary}\n{messages}".strip()
+        if len(summary) > policy.summary_max_chars:
+            # Keep the most recent part, starting at a line boundary
+            summary = summary[-policy.summary_max_chars :].split("\n", 1)[-1]
+        callback_context.state[key] = {"text": summary, "covered": len(dropped)}
+        return summary
+
+    async def _llm_summary(
+        self, summary: str, messages: str, policy: ContextPolicy
+    ) -> str:
+        try:
+            response = await genai_client().aio.models.generate_content(
+                model=resolve_model(policy.summary_model),
+                contents=_SUMMARY_PROMPT.format(
+                    max_chars=policy.summary_max_chars,
+                    summary=summary or "(empty)",
+                    messages=messages,
+                ),
+                config=types.GenerateContentConfig(
+                    thinking_config=types.ThinkingConfig(thinking_budget=0)
+                ),
+            )
+            metrics.incr("context_window.llm_summary")
+            return (response.text or "").strip()
+        except Exception as e:
+            logging.warning(f"LLM summary failed, using extractive summary: {e}")
+            metrics.incr("context_window.llm_summary_error")
+            return f"{summary}\n{messages}".strip()
@@ -0,0 +1,114 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+from typing import Any
+
+from google.adk.sessions import DatabaseSessionService
+from pydantic import BaseModel
+from sqlalchemy.engine import make_url
+
+# DatabaseSessionService builds an async engine, so URLs are switched to the
+# backend's async driver.
+ASYNC_DRIVERS = {
+    "postgresql": "asyncpg",
+    "sqlite": "aiosqlite",
+    "mysql": "aiomysql",
+}
+
+
+class DatabasePoolSettings(BaseModel):
+    """Connection pool settings of the session database engine."""
+
+    pool_size: int = 5
+    max_overflow: int = 10
+    pool_timeout: int = 30
+    pool_recycle: int = 1800
+    pool_pre_ping: bool = True
+    statement_timeout_ms: int | None = None
+
+    @classmethod
+    def from_env(cls) -> "DatabasePoolSettings":
+        """Read DB_POOL_SIZE, DB_MAX_OVERFLOW, DB_POOL_TIMEOUT, DB_POOL_RECYCLE,
+        DB_POOL_PRE_PING and DB_STATEMENT_TIMEOUT_MS."""
+        values: dict[str, Any] = {}
+        for field in cls.model_fields:
+            env_value = os.environ.get(f"DB_{field.upper()}")
+            if env_value:
+                values[field] = env_value
+        return cls.model_validate(values)
+
+
+def database_url(db_url: str) -> str:
+    """Return the URL to connect with, switched to the backend's async driver."""
+    url = make_url(db_url)
+    backend = url.get_backend_name()
+    driver = ASYNC_DRIVERS.get(backend)
+    if driver is None or url.get_driver_name() == driver:
+        return db_url
+    return url.set(drivername=f"{backend}+{driver}").render_as_string(
+        hide_password=False
+    )
+
+
+def engine_kwargs(db_url: str, settings: DatabasePoolSettings) -> dict[str, Any]:
+    """Return the SQLAlchemy engine arguments applying the pool settings.
+
+    The statement timeout is passed the way each driver expects it: a
+    server setting for Postgres, the busy timeout for SQLite.
+    """
+    url = make_url(db_url)
+    backend, driver = url.get_backend_name(), url.get_driver_name()
+    kwargs: dict[str, Any] = {"pool_pre_ping": settings.pool_pre_ping}
+    connect_args: dict[str, Any] = {}
+
+    if backend == "sqlite":
+        if url.database in (None, "", ":memory:"):
+            # In-memory databases use a single static connection
+            return kwargs
+        if settings.statement_timeout_ms:
+            connect_args["timeout"] = settings.statement_timeout_ms / 1000
+    elif settings.statement_timeout_ms:
+        timeout = str(settings.statement_timeout_ms)
+        if driver == "asyncpg":
+            connect_args["server_settings"] = {"statement_timeout": timeout}
+
+    kwargs.update(
+        pool_size=settings.pool_size,
+        max_overflow=settings.max_overflow,
+        pool_timeout=settings.pool_timeout,
+        pool_recycle=settings.pool_recycle,
+    )
+    if connect_args:
+        kwargs["connect_args"] = connect_args
+    return kwargs
+
+
+class PooledDatabaseSessionService(DatabaseSessionService):
+    """`DatabaseSessionService` with a tuned connection pool.
+
+    Without explicit settings, `DatabasePoolSettings.from_env()` is read when
+    the service is built, i.e. at runtime on Agent Engine.
+    """
+
+    def __init__(
+        self,
+        db_url: str,
+        pool_settings: DatabasePoolSettings | None = None,
+        **kwargs: Any,
+    ) -> None:
+        settings = pool_settings or DatabasePoolSettings.from_env()
+        url = database_url(db_url)
+        super().__init__(db_url=url, **{**engine_kwargs(url, settings), **kwargs})
+        self.pool_settings = settings
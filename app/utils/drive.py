@@ -0,0 +1,306 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import contextlib
+import datetime
+import functools
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+import time
+import weakref
+from collections import OrderedDict
+from collections.abc import AsyncIterator, Callable, Iterator
+from typing import Any
+
+import httplib2
+from google.oauth2.credentials import Credentials
+from google_auth_httplib2 import AuthorizedHttp
+from googleapiclient.discovery import build_from_document
+from googleapiclient.discovery_cache import get_static_doc
+from googleapiclient.http import MediaIoBaseUpload
+
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+# Payloads above this size use a chunked resumable upload.
+DEFAULT_RESUMABLE_THRESHOLD = 5 * 1024 * 1024
+# Resumable chunks must be a multiple of 256 KiB.
+DEFAULT_CHUNK_SIZE = 4 * 256 * 1024
+# OAuth access tokens live for an hour; cached services are dropped earlier
+# when the token does not carry its own expiry.
+DEFAULT_SERVICE_TTL_SECONDS = 55 * 60
+# Concurrent uploads allowed per user across all tool calls.
+DEFAULT_UPLOADS_PER_USER = 4
+
+
+@functools.lru_cache(maxsize=1)
+def drive_discovery_document() -> dict[str, Any]:
+    """Return the parsed Drive v3 discovery document bundled with the client library."""
+    document = get_static_doc("drive", "v3")
+    if document is None:
+        raise RuntimeError(
+            "Drive v3 discovery document is not bundled with googleapiclient"
+        )
+    return json.loads(document)
+
+
+class DriveServiceCache:
+    """Per-token cache of Drive v3 service objects.
+
+    Services are built offline from the bundled discovery document. Each
+    token keeps a small pool of authorized HTTP transports: httplib2 is not
+    thread-safe, so concurrent uploads lease one transport each, and
+    connections to the Drive API stay alive between uploads of the same user.
+    Entries expire with the access token they were built for.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 256,
+        default_ttl_seconds: int = DEFAULT_SERVICE_TTL_SECONDS,
+        http_timeout: int = 60,
+    ) -> None:
+        self.max_entries = max_entries
+        self.default_ttl_seconds = default_ttl_seconds
+        self.http_timeout = http_timeout
+        self._lock = threading.Lock()
+        self._services: OrderedDict[str, dict[str, Any]] = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._services)
+
+    def get(self, access_token: str, expiry: datetime.datetime | None = None) -> Any:
+        """Return a Drive service authorized with the given access token.
+
+        Args:
+            access_token: OAuth2 access token of the user
+            expiry: Token expiry (naive UTC, as used by google-auth), if known
+        """
+        return self._entry(access_token, expiry)["service"]
+
+    @contextlib.contextmanager
+    def lease_http(
+        self, access_token: str, expiry: datetime.datetime | None = None
+    ) -> Iterator[AuthorizedHttp]:
+        """Lease an authorized HTTP transport for exclusive use by one upload."""
+        entry = self._entry(access_token, expiry)
+        with self._lock:
+            http = entry["idle_http"].pop() if entry["idle_http"] else None
+        if http is None:
+            http = self._new_http(entry["credentials"])
+        try:
+            yield http
+        finally:
+            with self._lock:
+                entry["idle_http"].append(http)
+
+    def _new_http(self, credentials: Credentials) -> AuthorizedHttp:
+        return AuthorizedHttp(
+            credentials, http=httplib2.Http(timeout=self.http_timeout)
+        )
+
+    def _entry(
+        self, access_token: str, expiry: datetime.datetime | None
+    ) -> dict[str, Any]:
+        key = hashlib.sha256(access_token.encode()).hexdigest()
+        now = time.monotonic()
+        with self._lock:
+            entry = self._services.get(key)
+            if entry and entry["expires_at"] > now:
+                self._services.move_to_end(key)
+                metrics.incr("drive_service_cache.hit")
+                return entry
+
+        metrics.incr("drive_service_cache.miss")
+        ttl: float = self.default_ttl_seconds
+        if expiry is not None:
+            remaining = (expiry - datetime.datetime.utcnow()).total_seconds()
+            ttl = max(0.0, min(ttl, remaining))
+        credentials = Credentials(token=access_token, expiry=expiry)
+        http = self._new_http(credentials)
+        entry = {
+            "service": build_from_document(drive_discovery_document(), http=http),
+            "credentials": credentials,
+            "idle_http": [http],
+            "expires_at": now + ttl,
+        }
+        with self._lock:
+            self._services[key] = entry
+            self._services.move_to_end(key)
+            while len(self._services) > self.max_entries:
+                self._services.popitem(last=False)
+        return entry
+
+    def clear(self) -> None:
+        with self._lock:
+            self._services.clear()
+
+
+drive_services = DriveServiceCache()
+
+
+def _log_progress(uploaded: int, total: int) -> None:
+    # Once per chunk of every upload, rate limited by the logging layer
+    logger.info("Drive upload progress: %d/%d bytes", uploaded, total)
+
+
+def upload_bytes(
+    service: Any,
+    filename: str,
+    data: bytes,
+    mime_type: str = "text/plain",
+    resumable_threshold: int | None = None,
+    chunk_size: int | None = None,
+    on_progress: Callable[[int, int], None] | None = _log_progress,
+    http: Any = None,
+) -> dict[str, Any]:
+    """Upload in-memory content to Google Drive without a temporary file.
+
+    By not specifying 'parents', the file is uploaded to the root "My Drive"
+    folder.
+
+    Args:
+        service: A Drive v3 service object
+        filename: Name of the created file
+        data: File content
+        mime_type: MIME type of the content
+        resumable_threshold: Size above which a chunked resumable upload is
+            used, defaults to DRIVE_RESUMABLE_THRESHOLD_BYTES or 5 MiB
+        chunk_size: Resumable chunk size, defaults to DRIVE_UPLOAD_CHUNK_SIZE or 1 MiB
+        on_progress: Called with (uploaded_bytes, total_bytes) after each chunk
+        http: HTTP transport to use instead of the service's own one
+
+    Returns:
+        The created file resource with its id and name
+    """
+    if resumable_threshold is None:
+        resumable_threshold = int(
+            os.environ.get(
+                "DRIVE_RESUMABLE_THRESHOLD_BYTES", DEFAULT_RESUMABLE_THRESHOLD
+            )
+        )
+    if chunk_size is None:
+        chunk_size = int(os.environ.get("DRIVE_UPLOAD_CHUNK_SIZE", DEFAULT_CHUNK_SIZE))
+    resumable = len(data) > resumable_threshold
+
+    media = MediaIoBaseUpload(
+        io.BytesIO(data), mimetype=mime_type, chunksize=chunk_size, resumable=resumable
+    )
+    request = service.files().create(
+        body={"name": filename}, media_body=media, fields="id, name"
+    )
+    if not resumable:
+        return request.execute(http=http)
+
+    response = None
+    while response is None:
+        status, response = request.next_chunk(http=http)
+        if status and on_progress:
+            on_progress(status.resumable_progress, status.total_size)
+    if on_progress:
+        on_progress(len(data), len(data))
+    return response
+
+
+class UserUploadLimiter:
+    """Per-user semaphores bounding concurrent Drive uploads.
+
+    Semaphores are created on the running event loop and dropped once no
+    upload of the user uses them, so neither loops nor users accumulate.
+    """
+
+    def __init__(self, max_concurrency: int) -> None:
+        self.max_concurrency = max_concurrency
+        self._lock = threading.Lock()
+        # loop -> user_id -> (semaphore, uploads using it)
+        self._semaphores: weakref.WeakKeyDictionary[
+            asyncio.AbstractEventLoop, dict[str, tuple[asyncio.Semaphore, int]]
+        ] = weakref.WeakKeyDictionary()
+
+    @contextlib.asynccontextmanager
+    async def limit(self, user_id: str) -> AsyncIterator[None]:
+        """Hold one of the user's upload slots."""
+        # asyncio primitives belong to one event loop
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            users = self._semaphores.setdefault(loop, {})
+            semaphore, holders = users.get(
+                user_id, (asyncio.Semaphore(self.max_concurrency), 0)
+            )
+            users[user_id] = (semaphore, holders + 1)
+        try:
+            async with semaphore:
+                yield
+        finally:
+            with self._lock:
+                semaphore, holders = users[user_id]
+                if holders > 1:
+                    users[user_id] = (semaphore, holders - 1)
+                else:
+                    del users[user_id]
+
+
+upload_limiter = UserUploadLimiter(
+    int(os.environ.get("DRIVE_UPLOADS_PER_USER", DEFAULT_UPLOADS_PER_USER))
+)
+
+
+async def upload_many(
+    access_token: str,
+    files: list[tuple[str, bytes]],
+    user_id: str,
+    mime_type: str = "text/plain",
+) -> AsyncIterator[dict[str, Any]]:
+    """Upload several files concurrently, yielding results as they complete.
+
+    Uploads run in worker threads so the event loop is never blocked, and at
+    most `DRIVE_UPLOADS_PER_USER` uploads of the same user run at once. The
+    Drive batch endpoint does not accept media uploads, so each file is its
+    own request over a leased keep-alive transport.
+
+    Args:
+        access_token: OAuth2 access token of the user
+        files: (filename, content) pairs
+        user_id: User the concurrency limit applies to
+        mime_type: MIME type of every file
+
+    Yields:
+        The created file resource ({"id", "name"}), or {"name", "error"} on failure
+    """
+    service = drive_services.get(access_token)
+
+    def upload_one(filename: str, data: bytes) -> dict[str, Any]:
+        with drive_services.lease_http(access_token) as http:
+            return upload_bytes(service, filename, data, mime_type=mime_type, http=http)
+
+    async def limited(filename: str, data: bytes) -> dict[str, Any]:
+        async with upload_limiter.limit(user_id):
+            try:
+                return await asyncio.to_thread(upload_one, filename, data)
+            except Exception as e:
+                return {"name": filename, "error": str(e)}
+
+    tasks = [asyncio.ensure_future(limited(name, data)) for name, data in files]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        for task in tasks:
+            task.cancel()
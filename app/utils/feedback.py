@@ -0,0 +1,235 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import datetime
+import logging
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable
+from typing import Any, Literal
+
+from app.utils.metrics import metrics
+from app.utils.typing import Feedback
+
+GroupBy = Literal["agent", "invocation", "window"]
+# Per window and dimension, beyond this many keys the rest is counted under OTHER
+MAX_KEYS_PER_WINDOW = 10_000
+OTHER = "_other"
+
+
+def _score_bucket(score: int | float) -> str:
+    return f"{score:g}"
+
+
+class FeedbackAggregates:
+    """Rolling score histograms per agent and per invocation, in time windows.
+
+    Only the last `retained_windows` windows of `window_seconds` are kept,
+    so memory is bounded by the feedback volume of that period.
+    """
+
+    def __init__(
+        self,
+        window_seconds: int = 60,
+        retained_windows: int = 60,
+        clock: Callable[[], float] = time.time,
+    ) -> None:
+        self.window_seconds = window_seconds
+        self.retained_windows = retained_windows
+        self.clock = clock
+        self._windows: OrderedDict[int, dict[str, dict[str, dict[str, Any]]]] = (
+            OrderedDict()
+        )
+        self._lock = threading.Lock()
+
+    def add(self, feedback: Feedback) -> None:
+        window = int(self.clock() // self.window_seconds)
+        with self._lock:
+            groups = self._windows.get(window)
+            if groups is None:
+                groups = self._windows[window] = {"agent": {}, "invocation": {}}
+                while len(self._windows) > self.retained_windows:
+                    self._windows.popitem(last=False)
+            for group_by, key in (
+                ("agent", feedback.agent_name or "unknown"),
+                ("invocation", feedback.invocation_id),
+            ):
+                stats_by_key = groups[group_by]
+                if key not in stats_by_key and len(stats_by_key) >= MAX_KEYS_PER_WINDOW:
+                    key = OTHER
+                stats = stats_by_key.setdefault(
+                    key, {"count": 0, "sum": 0.0, "histogram": {}}
+                )
+                stats["count"] += 1
+                stats["sum"] += feedback.score
+                bucket = _score_bucket(feedback.score)
+                stats["histogram"][bucket] = stats["histogram"].get(bucket, 0) + 1
+
+    def summary(
+        self, group_by: GroupBy = "agent", last_seconds: int | None = None
+    ) -> dict[str, Any]:
+        """Return {"window_seconds", "groups": {key: {"count", "mean", "histogram"}}}.
+
+        Args:
+            group_by: "agent", "invocation", or "window" (keyed by the ISO
+                start time of each window)
+            last_seconds: Only include the windows of this last period,
+                defaults to all retained windows
+        """
+        if group_by not in ("agent", "invocation", "window"):
+            raise ValueError(f"Unsupported group_by: {group_by}")
+        oldest = None
+        if last_seconds is not None:
+            oldest = int((self.clock() - last_seconds) // self.window_seconds)
+        merged: dict[str, dict[str, Any]] = {}
+        with self._lock:
+            for window, groups in self._windows.items():
+                if oldest is not None and window < oldest:
+                    continue
+                if group_by == "window":
+                    start = datetime.datetime.fromtimestamp(
+                        window * self.window_seconds, tz=datetime.timezone.utc
+                    )
+                    items = [
+                        (start.isoformat(), stats) for stats in groups["agent"].values()
+                    ]
+                else:
+                    items = list(groups[group_by].items())
+                for key, stats in items:
+                    total = merged.setdefault(
+                        key, {"count": 0, "sum": 0.0, "histogram": {}}
+                    )
+                    total["count"] += stats["count"]
+                    total["sum"] += stats["sum"]
+                    for bucket, count in stats["histogram"].items():
+                        total["histogram"][bucket] = (
+                            total["histogram"].get(bucket, 0) + count
+                        )
+        return {
+            "window_seconds": self.window_seconds,
+            "groups": {
+                key: {
+                    "count": total["count"],
+                    "mean": total["sum"] / total["count"],
+                    "histogram": total["histogram"],
+                }
+                for key, total in merged.items()
+            },
+        }
+
+
+class FeedbackPipeline:
+    """Feedback ingestion off the request path.
+
+    `submit` updates the in-process aggregates and queues the entry; a
+    background thread writes queued entries to Cloud Logging in batches of
+    up to `batch_size`, at least every `flush_interval` seconds. When the
+    queue is full (Cloud Logging far behind), new entries are only
+    aggregated and counted as feedback.dropped.
+
+    Args:
+        logger: A google.cloud.logging Logger (anything with `batch()`)
+    """
+
+    def __init__(
+        self,
+        logger: Any,
+        batch_size: int = 100,
+        flush_interval: float = 2.0,
+        max_queue: int = 10_000,
+        aggregates: FeedbackAggregates | None = None,
+    ) -> None:
+        self.logger = logger
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.aggregates = aggregates or FeedbackAggregates()
+        self._queue: queue.Queue[dict[str, Any]] = queue.Queue(maxsize=max_queue)
+        self._thread: threading.Thread | None = None
+        self._start_lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls, logger: Any) -> "FeedbackPipeline":
+        """Configured by FEEDBACK_BATCH_SIZE, FEEDBACK_FLUSH_INTERVAL_SECONDS and
+        FEEDBACK_WINDOW_SECONDS."""
+        return cls(
+            logger,
+            batch_size=int(os.environ.get("FEEDBACK_BATCH_SIZE", "100")),
+            flush_interval=float(
+                os.environ.get("FEEDBACK_FLUSH_INTERVAL_SECONDS", "2")
+            ),
+            aggregates=FeedbackAggregates(
+                window_seconds=int(os.environ.get("FEEDBACK_WINDOW_SECONDS", "60"))
+            ),
+        )
+
+    def submit(self, feedback: Feedback) -> None:
+        self.aggregates.add(feedback)
+        metrics.incr("feedback.received")
+        self._ensure_started()
+        try:
+            self._queue.put_nowait(feedback.model_dump())
+        except queue.Full:
+            metrics.incr("feedback.dropped")
+
+    def flush(self, timeout: float | None = None) -> bool:
+        """Wait until every queued entry was written (or failed), False on timeout."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if deadline is not None and time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def _ensure_started(self) -> None:
+        if self._thread is not None:
+            return
+        with self._start_lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="feedback-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self._write(batch)
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write(self, entries: list[dict[str, Any]]) -> None:
+        start = time.perf_counter()
+        try:
+            with self.logger.batch() as batch:
+                for entry in entries:
+                    batch.log_struct(entry, severity="INFO")
+        except Exception as e:
+            metrics.incr("feedback.write_errors")
+            metrics.incr("feedback.dropped", len(entries))
+            logging.warning(f"Failed to write {len(entries)} feedback entries: {e}")
+            return
+        metrics.incr("feedback.written", len(entries))
+        metrics.observe("feedback.batch_write_ms", (time.perf_counter() - start) * 1000)
@@ -0,0 +1,139 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import threading
+import time
+from collections.abc import Callable
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, TypeVar
+
+from app.utils.metrics import metrics
+
+T = TypeVar("T")
+
+
+class Hedger:
+    """Sends a second, identical request when the first one is slower than usual.
+
+    The hedge fires once the primary request has been running longer than
+    the `percentile` (0-100) of recent latencies (clamped to [min_delay, max_delay]),
+    and the first successful response wins. Hedges draw from a budget that
+    grows by `budget_ratio` per call, so at most that fraction of calls
+    adds a request. The losing request cannot be interrupted mid-flight (the
+    clients are blocking); it is cancelled if it has not started and its
+    result is discarded otherwise.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        percentile: float = 95,
+        default_delay: float = 5.0,
+        min_delay: float = 0.5,
+        max_delay: float = 20.0,
+        budget_ratio: float = 0.1,
+        max_budget: float = 5.0,
+        min_samples: int = 20,
+        max_workers: int = 16,
+    ) -> None:
+        self.name = name
+        self.percentile = percentile
+        self.default_delay = default_delay
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.budget_ratio = budget_ratio
+        self.max_budget = max_budget
+        self.min_samples = min_samples
+        self._budget = max_budget
+        self._samples = 0
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=f"hedge-{name}"
+        )
+
+    def delay(self) -> float:
+        """Seconds to wait for the primary request before hedging."""
+        value = metrics.percentile(f"hedge.{self.name}.latency_ms", self.percentile)
+        if value is None or self._samples < self.min_samples:
+            return self.default_delay
+        return min(self.max_delay, max(self.min_delay, value / 1000))
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self._budget < 1:
+                return False
+            self._budget -= 1
+            return True
+
+    def call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        with self._lock:
+            self._budget = min(self.max_budget, self._budget + self.budget_ratio)
+        start = time.perf_counter()
+        primary = self._executor.submit(fn, *args, **kwargs)
+        done, _ = wait([primary], timeout=self.delay())
+        if done:
+            return self._finish(primary, start)
+
+        if not self._take_budget():
+            metrics.incr(f"hedge.{self.name}.budget_exhausted")
+            return self._finish(primary, start)
+        metrics.incr(f"hedge.{self.name}.fired")
+        hedge = self._executor.submit(fn, *args, **kwargs)
+        pending = {primary, hedge}
+        error: BaseException | None = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is not None:
+                    error = future.exception()
+                    continue
+                for other in pending:
+                    other.cancel()
+                if future is hedge:
+                    metrics.incr(f"hedge.{self.name}.won")
+                self._publish_win_rate()
+                return self._finish(future, start)
+        self._publish_win_rate()
+        raise error
+
+    def _finish(self, future: Future, start: float) -> Any:
+        result = future.result()
+        with self._lock:
+            self._samples += 1
+        metrics.observe(
+            f"hedge.{self.name}.latency_ms", (time.perf_counter() - start) * 1000
+        )
+        return result
+
+    def _publish_win_rate(self) -> None:
+        fired = metrics.counter(f"hedge.{self.name}.fired")
+        if fired:
+            metrics.set_gauge(
+                f"hedge.{self.name}.win_rate",
+                metrics.counter(f"hedge.{self.name}.won") / fired,
+            )
+
+
+def hedger_from_env(name: str) -> Hedger | None:
+    """Return a Hedger if <NAME>_HEDGING=true, configured by <NAME>_HEDGE_PERCENTILE
+    and <NAME>_HEDGE_BUDGET_RATIO."""
+    prefix = name.upper()
+    if os.environ.get(f"{prefix}_HEDGING", "false").lower() != "true":
+        return None
+    return Hedger(
+        name,
+        percentile=float(os.environ.get(f"{prefix}_HEDGE_PERCENTILE", "95")),
+        budget_ratio=float(os.environ.get(f"{prefix}_HEDGE_BUDGET_RATIO", "0.1")),
+    )
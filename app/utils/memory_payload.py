@@ -0,0 +1,144 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import hashlib
+import json
+import os
+from collections.abc import Sequence
+from typing import Any
+
+from google.adk.events import Event
+from pydantic import BaseModel
+
+from app.utils.metrics import metrics
+
+
+class CompactionPolicy(BaseModel):
+    """Limits on the session events sent to Memory Bank for generation.
+
+    Memories are extracted from what the user said and what they were
+    finally answered, so tool traffic, thoughts, inline data and the
+    intermediate messages of sub-agents are dropped. Remaining texts are
+    truncated, repeated texts sent once, and the oldest events dropped
+    until the payload fits `max_bytes`.
+    """
+
+    max_user_chars: int = 2000
+    max_model_chars: int = 1000
+    max_bytes: int = 32000
+    final_responses_only: bool = True
+
+    @classmethod
+    def from_env(cls) -> "CompactionPolicy":
+        """Read MEMORY_MAX_USER_CHARS, MEMORY_MAX_MODEL_CHARS, MEMORY_MAX_BYTES
+        and MEMORY_FINAL_RESPONSES_ONLY."""
+        values: dict[str, Any] = {}
+        for field in cls.model_fields:
+            env_value = os.environ.get(f"MEMORY_{field.upper()}")
+            if env_value is not None:
+                values[field] = env_value
+        return cls.model_validate(values)
+
+
+def _size(payload: dict[str, Any]) -> int:
+    return len(json.dumps(payload, ensure_ascii=False).encode())
+
+
+def _truncate(text: str, max_chars: int) -> str:
+    if len(text) <= max_chars:
+        return text
+    return text[: max_chars - 3].rstrip() + "..."
+
+
+def _last_answers(events: Sequence[Event]) -> set[int]:
+    """Index of the last model text of each invocation, the answer the user saw."""
+    last: dict[str, int] = {}
+    for index, event in enumerate(events):
+        content = event.content
+        if event.author == "user" or event.partial or not content or not content.parts:
+            continue
+        if any(part.text and not part.thought for part in content.parts):
+            last[event.invocation_id] = index
+    return set(last.values())
+
+
+def compact_events(
+    events: Sequence[Event], policy: CompactionPolicy | None = None
+) -> list[dict[str, Any]]:
+    """Return the `direct_contents_source` events of a session for Memory Bank.
+
+    Publishes memory_payload.bytes_in/bytes_out summaries and the
+    memory_payload.bytes_saved counter, measured against sending every
+    content as is.
+    """
+    policy = policy or CompactionPolicy()
+    answers = _last_answers(events) if policy.final_responses_only else None
+    bytes_in = 0
+    seen: set[str] = set()
+    compacted: list[dict[str, Any]] = []
+    for index, event in enumerate(events):
+        content = event.content
+        if not content or not content.parts:
+            continue
+        bytes_in += _size(
+            {"content": content.model_dump(exclude_none=True, mode="json")}
+        )
+        is_user = event.author == "user"
+        if event.partial or (
+            answers is not None and not is_user and index not in answers
+        ):
+            continue
+        parts: list[dict[str, Any]] = []
+        for part in content.parts:
+            if part.text and not part.thought:
+                text = " ".join(part.text.split())
+                text = _truncate(
+                    text, policy.max_user_chars if is_user else policy.max_model_chars
+                )
+                parts.append({"text": text})
+            elif part.file_data:
+                parts.append(
+                    {
+                        "file_data": part.file_data.model_dump(
+                            exclude_none=True, mode="json"
+                        )
+                    }
+                )
+        if not parts:
+            continue
+        digest = hashlib.sha1(
+            json.dumps([content.role, parts], sort_keys=True).encode()
+        ).hexdigest()
+        if digest in seen:
+            metrics.incr("memory_payload.duplicates")
+            continue
+        seen.add(digest)
+        compacted.append({"content": {"role": content.role or "user", "parts": parts}})
+
+    # Over budget, the most recent events are kept
+    kept: list[dict[str, Any]] = []
+    total = 0
+    for payload in reversed(compacted):
+        size = _size(payload)
+        if total + size > policy.max_bytes:
+            metrics.incr("memory_payload.events_dropped", len(compacted) - len(kept))
+            break
+        kept.append(payload)
+        total += size
+    kept.reverse()
+
+    metrics.observe("memory_payload.bytes_in", bytes_in)
+    metrics.observe("memory_payload.bytes_out", total)
+    metrics.incr("memory_payload.bytes_saved", bytes_in - total)
+    return kept
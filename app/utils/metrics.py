@@ -0,0 +1,112 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from collections import deque
+from typing import Any
+
+
+class MetricsRegistry:
+    """Thread-safe in-process counters, gauges and value summaries.
+
+    Values are kept per replica and exposed through the `get_metrics`
+    operation of the agent engine app.
+    """
+
+    def __init__(self, sample_size: int = 512) -> None:
+        """Initialize an empty registry.
+
+        Args:
+            sample_size: Number of recent observations kept per summary for
+                percentile estimation
+        """
+        self._sample_size = sample_size
+        self._lock = threading.Lock()
+        self._counters: dict[str, float] = {}
+        self._gauges: dict[str, float] = {}
+        self._summaries: dict[str, dict[str, Any]] = {}
+
+    def incr(self, name: str, value: float = 1) -> None:
+        """Increment a counter."""
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + value
+
+    def set_gauge(self, name: str, value: float) -> None:
+        """Set a gauge to the given value."""
+        with self._lock:
+            self._gauges[name] = value
+
+    def observe(self, name: str, value: float) -> None:
+        """Record an observation (e.g. a latency in seconds) for a summary."""
+        with self._lock:
+            summary = self._summaries.get(name)
+            if summary is None:
+                summary = {
+                    "count": 0,
+                    "sum": 0.0,
+                    "min": value,
+                    "max": value,
+                    "recent": deque(maxlen=self._sample_size),
+                }
+                self._summaries[name] = summary
+            summary["count"] += 1
+            summary["sum"] += value
+            summary["min"] = min(summary["min"], value)
+            summary["max"] = max(summary["max"], value)
+            summary["recent"].append(value)
+
+    def counter(self, name: str) -> float:
+        """Return the current value of a counter (0 if never incremented)."""
+        with self._lock:
+            return self._counters.get(name, 0)
+
+    def percentile(self, name: str, q: float) -> float | None:
+        """Return the q-th percentile (0-100) of recent observations."""
+        with self._lock:
+            summary = self._summaries.get(name)
+            if not summary or not summary["recent"]:
+                return None
+            values = sorted(summary["recent"])
+        index = min(len(values) - 1, max(0, round(q / 100 * (len(values) - 1))))
+        return values[index]
+
+    def snapshot(self) -> dict[str, Any]:
+        """Return a JSON-serializable copy of all metrics."""
+        with self._lock:
+            summaries = {}
+            for name, summary in self._summaries.items():
+                values = sorted(summary["recent"])
+                summaries[name] = {
+                    "count": summary["count"],
+                    "mean": summary["sum"] / summary["count"],
+                    "min": summary["min"],
+                    "max": summary["max"],
+                    "p50": values[len(values) // 2],
+                    "p99": values[min(len(values) - 1, int(len(values) * 0.99))],
+                }
+            return {
+                "counters": dict(self._counters),
+                "gauges": dict(self._gauges),
+                "summaries": summaries,
+            }
+
+    def reset(self) -> None:
+        """Drop all recorded metrics."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+            self._summaries.clear()
+
+
+metrics = MetricsRegistry()
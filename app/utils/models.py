@@ -0,0 +1,216 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import functools
+import json
+import logging
+import os
+from typing import Any
+
+from google import genai
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.adk.planners import BuiltInPlanner
+from google.genai import types
+from pydantic import BaseModel
+
+from app.utils.metrics import metrics
+
+# Tier names can be used anywhere a model name is expected.
+DEFAULT_TIERS: dict[str, str] = {
+    "fast": "gemini-2.5-flash-lite",
+    "standard": "gemini-2.5-flash",
+    "pro": "gemini-2.5-pro",
+}
+
+# Routing and extraction run on the fast tier, generation and validation on
+# the standard tier. Each one escalates a tier up on low-confidence output.
+DEFAULT_AGENT_SETTINGS: dict[str, dict[str, Any]] = {
+    "root_agent": {
+        "model": "fast",
+        "thinking_budget": 0,
+        "escalation_model": "standard",
+    },
+    "user_requirement_agent": {
+        "model": "fast",
+        "thinking_budget": 0,
+        "escalation_model": "standard",
+    },
+    "recipe_finder_agent": {"model": "standard", "escalation_model": "pro"},
+    "final_agent": {"model": "standard", "escalation_model": "pro"},
+    "recipe_search": {"model": "standard", "escalation_model": "pro"},
+    "meal_plan_day": {
+        "model": "standard",
+        "thinking_budget": 0,
+        "escalation_model": "pro",
+    },
+}
+
+# Responses whose average token log probability is below this are treated as
+# low-confidence.
+DEFAULT_MIN_AVG_LOGPROB = -0.7
+
+
+class ModelSettings(BaseModel):
+    """Model, thinking budget and output limit used by one agent or model call."""
+
+    model: str
+    thinking_budget: int | None = None
+    max_output_tokens: int | None = None
+    escalation_model: str | None = None
+
+
+@functools.lru_cache(maxsize=1)
+def genai_client() -> genai.Client:
+    """Vertex AI client shared by the direct model calls of the tools (thread-safe)."""
+    return genai.Client(
+        vertexai=True,
+        project=os.environ.get("GOOGLE_CLOUD_PROJECT"),
+        location=os.environ.get("GOOGLE_CLOUD_LOCATION"),
+    )
+
+
+def resolve_model(name: str) -> str:
+    """Map a tier name to its model, honoring MODEL_TIER_<TIER> overrides."""
+    if name not in DEFAULT_TIERS:
+        return name
+    return os.environ.get(f"MODEL_TIER_{name.upper()}", DEFAULT_TIERS[name])
+
+
+def _load_config_file() -> dict[str, Any]:
+    path = os.environ.get("MODEL_CONFIG_FILE")
+    if not path:
+        return {}
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        logging.warning(f"Unable to read model config file {path}: {e}")
+        return {}
+
+
+def get_model_settings(name: str) -> ModelSettings:
+    """Return the model settings for an agent or model call.
+
+    Settings are layered: built-in defaults, then the entry for `name` in the
+    JSON file pointed to by MODEL_CONFIG_FILE, then the <NAME>_MODEL,
+    <NAME>_THINKING_BUDGET, <NAME>_MAX_OUTPUT_TOKENS and
+    <NAME>_ESCALATION_MODEL environment variables.
+
+    Args:
+        name: Agent name (e.g. "root_agent") or model call name (e.g. "recipe_search")
+    """
+    values = dict(DEFAULT_AGENT_SETTINGS.get(name, {"model": "standard"}))
+    values.update(_load_config_file().get(name, {}))
+    prefix = name.upper()
+    for field in ModelSettings.model_fields:
+        env_value = os.environ.get(f"{prefix}_{field.upper()}")
+        # An empty variable is treated as unset
+        if env_value:
+            values[field] = env_value
+    settings = ModelSettings.model_validate(values)
+    settings.model = resolve_model(settings.model)
+    if settings.escalation_model:
+        settings.escalation_model = resolve_model(settings.escalation_model)
+    return settings
+
+
+def thinking_planner(settings: ModelSettings) -> BuiltInPlanner | None:
+    """Return a planner applying the thinking budget, or None for the model default."""
+    if settings.thinking_budget is None:
+        return None
+    return BuiltInPlanner(
+        thinking_config=types.ThinkingConfig(thinking_budget=settings.thinking_budget)
+    )
+
+
+def generation_config(settings: ModelSettings) -> types.GenerateContentConfig | None:
+    """Return the generate content config applying the output token limit."""
+    if settings.max_output_tokens is None:
+        return None
+    return types.GenerateContentConfig(max_output_tokens=settings.max_output_tokens)
+
+
+def min_avg_logprob() -> float:
+    """Return the escalation threshold, overridable by MODEL_ESCALATION_MIN_AVG_LOGPROB."""
+    return float(
+        os.environ.get("MODEL_ESCALATION_MIN_AVG_LOGPROB", DEFAULT_MIN_AVG_LOGPROB)
+    )
+
+
+def is_low_confidence(avg_logprobs: float | None, text: str | None) -> bool:
+    """Whether a final (non-partial) model output should trigger escalation."""
+    if avg_logprobs is not None and avg_logprobs < min_avg_logprob():
+        return True
+    return text is not None and not text.strip()
+
+
+def _escalation_key(agent_name: str) -> str:
+    # temp: state is scoped to the current invocation.
+    return f"temp:escalate_model:{agent_name}"
+
+
+def record_confidence(
+    callback_context: CallbackContext, llm_response: LlmResponse
+) -> LlmResponse | None:
+    """after_model_callback flagging the agent for escalation on low confidence.
+
+    The flagged response itself is kept: escalation applies from the agent's
+    next model call in the invocation (e.g. after a tool call or a retry).
+    """
+    if llm_response.partial or llm_response.content is None:
+        return None
+    parts = llm_response.content.parts or []
+    if any(part.function_call for part in parts):
+        text = None
+    else:
+        text = "".join(part.text or "" for part in parts if not part.thought)
+    if is_low_confidence(llm_response.avg_logprobs, text):
+        callback_context.state[_escalation_key(callback_context.agent_name)] = True
+        metrics.incr(f"model_escalation.flagged.{callback_context.agent_name}")
+    return None
+
+
+class EscalateModel:
+    """before_model_callback that switches to the escalation model.
+
+    Once a response of the agent was flagged by `record_confidence`, the
+    following model calls of the same invocation use `settings.escalation_model`.
+    A class rather than a closure so that agents stay picklable for deployment.
+    """
+
+    def __init__(self, settings: ModelSettings) -> None:
+        self.escalation_model = settings.escalation_model
+
+    def __call__(
+        self, callback_context: CallbackContext, llm_request: LlmRequest
+    ) -> LlmResponse | None:
+        if self.escalation_model and callback_context.state.get(
+            _escalation_key(callback_context.agent_name)
+        ):
+            llm_request.model = self.escalation_model
+            metrics.incr(f"model_escalation.applied.{callback_context.agent_name}")
+        return None
+
+
+def agent_model_kwargs(name: str) -> dict[str, Any]:
+    """Return the model related keyword arguments for an ADK `Agent`."""
+    settings = get_model_settings(name)
+    return {
+        "model": settings.model,
+        "planner": thinking_planner(settings),
+        "generate_content_config": generation_config(settings),
+        "before_model_callback": EscalateModel(settings),
+        "after_model_callback": record_confidence,
+    }
@@ -0,0 +1,354 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import email.utils
+import logging
+import os
+import random
+import threading
+import time
+from collections.abc import Callable
+from typing import Any, ClassVar, TypeVar
+
+from app.utils.metrics import metrics
+
+T = TypeVar("T")
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = frozenset({429, 500, 502, 503, 504})
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling the endpoint while its circuit breaker is open."""
+
+
+def status_code(error: BaseException) -> int | None:
+    """HTTP status of an API error (google-genai, google-api-core or googleapiclient)."""
+    for attr in ("code", "status_code"):
+        value = getattr(error, attr, None)
+        if isinstance(value, int):
+            return int(value)
+    response = getattr(error, "resp", None) or getattr(error, "response", None)
+    value = getattr(response, "status_code", None) or getattr(response, "status", None)
+    return int(value) if isinstance(value, int) else None
+
+
+def retry_after_seconds(error: BaseException) -> float | None:
+    """Delay requested by the server through the Retry-After header, if any."""
+    response = getattr(error, "response", None) or getattr(error, "resp", None)
+    headers = getattr(response, "headers", None) or (
+        response if isinstance(response, dict) else None
+    )
+    if not headers:
+        return None
+    value = headers.get("retry-after") or headers.get("Retry-After")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        parsed = email.utils.parsedate_to_datetime(value)
+        return max(0.0, parsed.timestamp() - time.time()) if parsed else None
+
+
+def is_retryable(error: BaseException) -> bool:
+    if isinstance(error, ConnectionError | TimeoutError):
+        return True
+    return status_code(error) in RETRYABLE_STATUS_CODES
+
+
+class Backoff:
+    """Exponential backoff with full jitter, never shorter than Retry-After."""
+
+    def __init__(self, base_seconds: float = 0.5, max_seconds: float = 20.0) -> None:
+        self.base_seconds = base_seconds
+        self.max_seconds = max_seconds
+
+    def delay(self, attempt: int, retry_after: float | None = None) -> float:
+        ceiling = min(self.max_seconds, self.base_seconds * 2**attempt)
+        delay = random.uniform(0, ceiling)
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_seconds))
+        return delay
+
+
+class AdaptiveLimiter:
+    """Concurrency limit adjusted by AIMD on the responses of an endpoint.
+
+    Each success raises the limit by 1/limit (about +1 per round of calls),
+    each throttled response halves it, at most once per `decrease_interval`
+    so that one burst of 429s counts as a single congestion signal.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        initial: float = 8,
+        minimum: float = 1,
+        maximum: float = 64,
+        decrease_factor: float = 0.5,
+        decrease_interval: float = 1.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum
+        self.decrease_factor = decrease_factor
+        self.decrease_interval = decrease_interval
+        self.clock = clock
+        self.inflight = 0
+        self._last_decrease = float("-inf")
+        self._condition = threading.Condition()
+        self._publish()
+
+    def acquire(self, timeout: float | None = None) -> bool:
+        with self._condition:
+            acquired = self._condition.wait_for(
+                lambda: self.inflight < int(self.limit), timeout=timeout
+            )
+            if acquired:
+                self.inflight += 1
+                self._publish()
+            return acquired
+
+    def release(self) -> None:
+        with self._condition:
+            self.inflight -= 1
+            self._publish()
+            self._condition.notify()
+
+    def on_success(self) -> None:
+        with self._condition:
+            self.limit = min(self.maximum, self.limit + 1 / self.limit)
+            self._publish()
+            self._condition.notify()
+
+    def on_throttled(self) -> None:
+        with self._condition:
+            now = self.clock()
+            if now - self._last_decrease < self.decrease_interval:
+                return
+            self._last_decrease = now
+            self.limit = max(self.minimum, self.limit * self.decrease_factor)
+            metrics.incr(f"resilience.{self.name}.limit_decreased")
+            self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"resilience.{self.name}.limit", self.limit)
+        metrics.set_gauge(f"resilience.{self.name}.inflight", self.inflight)
+
+
+class CircuitBreaker:
+    """Opens after consecutive failures and lets one probe through after a cooldown."""
+
+    CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+    _GAUGE: ClassVar[dict[str, int]] = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = self.CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probing = False
+        self._lock = threading.Lock()
+        self._publish()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if (
+                self.state == self.OPEN
+                and self.clock() - self._opened_at >= self.reset_timeout
+            ):
+                self.state = self.HALF_OPEN
+                self._probing = False
+                self._publish()
+            if self.state == self.CLOSED:
+                return True
+            if self.state == self.HALF_OPEN and not self._probing:
+                self._probing = True
+                return True
+            return False
+
+    def cancel(self) -> None:
+        """Give back a call let through by `allow` that was never made."""
+        with self._lock:
+            if self.state == self.HALF_OPEN:
+                self._probing = False
+
+    def on_success(self) -> None:
+        with self._lock:
+            self.failures = 0
+            if self.state != self.CLOSED:
+                self.state = self.CLOSED
+                self._publish()
+
+    def on_failure(self) -> None:
+        with self._lock:
+            self.failures += 1
+            if self.state == self.HALF_OPEN or self.failures >= self.failure_threshold:
+                if self.state != self.OPEN:
+                    metrics.incr(f"resilience.{self.name}.circuit_opened")
+                self.state = self.OPEN
+                self._opened_at = self.clock()
+                self._probing = False
+                self._publish()
+
+    def _publish(self) -> None:
+        metrics.set_gauge(
+            f"resilience.{self.name}.circuit_state", self._GAUGE[self.state]
+        )
+
+
+class ResiliencePolicy:
+    """Retry, adaptive concurrency and circuit breaking for one endpoint.
+
+    Retryable errors (429, 5xx, connection errors) are retried with
+    `Backoff`, honoring Retry-After. Throttling lowers the endpoint's
+    concurrency limit; every retryable failure counts towards its circuit
+    breaker. Other errors are raised at once.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        max_attempts: int = 4,
+        backoff: Backoff | None = None,
+        limiter: AdaptiveLimiter | None = None,
+        breaker: CircuitBreaker | None = None,
+        acquire_timeout: float | None = 30.0,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self.name = name
+        self.max_attempts = max_attempts
+        self.backoff = backoff or Backoff()
+        self.limiter = limiter or AdaptiveLimiter(name)
+        self.breaker = breaker or CircuitBreaker(name)
+        self.acquire_timeout = acquire_timeout
+        self.sleep = sleep
+
+    def call(
+        self,
+        fn: Callable[..., T],
+        *args: Any,
+        fallback: Callable[[BaseException], T] | None = None,
+        **kwargs: Any,
+    ) -> T:
+        """Call `fn(*args, **kwargs)` under the policy.
+
+        Args:
+            fallback: Called with the error instead of raising it when the
+                circuit is open or retries are exhausted
+
+        Raises:
+            CircuitOpenError: The circuit is open and there is no fallback
+        """
+        try:
+            return self._call(fn, *args, **kwargs)
+        except Exception as e:
+            if fallback is None or not (
+                isinstance(e, CircuitOpenError) or is_retryable(e)
+            ):
+                raise
+            metrics.incr(f"resilience.{self.name}.fallback")
+            return fallback(e)
+
+    def _call(self, fn: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+        for attempt in range(self.max_attempts):
+            if not self.breaker.allow():
+                metrics.incr(f"resilience.{self.name}.fast_fail")
+                raise CircuitOpenError(f"{self.name} is unavailable, circuit open")
+            if not self.limiter.acquire(self.acquire_timeout):
+                # Lets another call probe a half-open circuit
+                self.breaker.cancel()
+                metrics.incr(f"resilience.{self.name}.queue_timeout")
+                raise TimeoutError(f"{self.name} concurrency limit wait timed out")
+            try:
+                result = fn(*args, **kwargs)
+            except Exception as e:
+                if not is_retryable(e):
+                    self.breaker.on_success()
+                    raise
+                self.breaker.on_failure()
+                if status_code(e) == 429:
+                    metrics.incr(f"resilience.{self.name}.throttled")
+                    self.limiter.on_throttled()
+                if attempt == self.max_attempts - 1:
+                    metrics.incr(f"resilience.{self.name}.exhausted")
+                    raise
+                delay = self.backoff.delay(attempt, retry_after_seconds(e))
+                metrics.incr(f"resilience.{self.name}.retry")
+                logger.info(
+                    "%s attempt %d failed (%s), retrying in %.2fs",
+                    self.name,
+                    attempt + 1,
+                    e,
+                    delay,
+                )
+            else:
+                self.breaker.on_success()
+                self.limiter.on_success()
+                return result
+            finally:
+                self.limiter.release()
+            self.sleep(delay)
+        raise AssertionError("unreachable")
+
+
+_policies: dict[str, ResiliencePolicy] = {}
+_policies_lock = threading.Lock()
+
+
+def get_policy(name: str) -> ResiliencePolicy:
+    """Return the shared policy of an endpoint, created on first use.
+
+    Configured by RESILIENCE_MAX_ATTEMPTS, RESILIENCE_INITIAL_CONCURRENCY,
+    RESILIENCE_MAX_CONCURRENCY, RESILIENCE_FAILURE_THRESHOLD and
+    RESILIENCE_RESET_TIMEOUT_SECONDS.
+    """
+    with _policies_lock:
+        policy = _policies.get(name)
+        if policy is None:
+            policy = ResiliencePolicy(
+                name,
+                max_attempts=int(os.environ.get("RESILIENCE_MAX_ATTEMPTS", "4")),
+                limiter=AdaptiveLimiter(
+                    name,
+                    initial=float(
+                        os.environ.get("RESILIENCE_INITIAL_CONCURRENCY", "8")
+                    ),
+                    maximum=float(os.environ.get("RESILIENCE_MAX_CONCURRENCY", "64")),
+                ),
+                breaker=CircuitBreaker(
+                    name,
+                    failure_threshold=int(
+                        os.environ.get("RESILIENCE_FAILURE_THRESHOLD", "5")
+                    ),
+                    reset_timeout=float(
+                        os.environ.get("RESILIENCE_RESET_TIMEOUT_SECONDS", "30")
+                    ),
+                ),
+            )
+            _policies[name] = policy
+        return policy
@@ -0,0 +1,500 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import contextlib
+import itertools
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict, deque
+from collections.abc import AsyncIterator, Callable
+from typing import Any
+
+from google.adk.events import Event
+from google.adk.sessions import Session
+from google.adk.sessions.base_session_service import (
+    BaseSessionService,
+    GetSessionConfig,
+    ListSessionsResponse,
+)
+from google.adk.sessions.state import State
+
+from app.utils.metrics import metrics
+
+SessionKey = tuple[str, str, str]
+
+
+def _key(app_name: str, user_id: str, session_id: str) -> SessionKey:
+    return app_name, user_id, session_id
+
+
+def _apply_config(session: Session, config: GetSessionConfig | None) -> Session:
+    """Apply the event filters of a GetSessionConfig to a session copy."""
+    if config is None:
+        return session
+    events = session.events
+    if config.after_timestamp is not None:
+        events = [
+            event for event in events if event.timestamp >= config.after_timestamp
+        ]
+    if config.num_recent_events is not None:
+        events = events[-config.num_recent_events :] if config.num_recent_events else []
+    session.events = events
+    return session
+
+
+def _strip_temp_state(session: Session) -> Session:
+    session.state = {
+        k: v for k, v in session.state.items() if not k.startswith(State.TEMP_PREFIX)
+    }
+    return session
+
+
+class WriteBehindSessionService(BaseSessionService):
+    """Buffers appended events and persists them to a wrapped service in batches.
+
+    `append_event` updates the caller's session in memory and queues the
+    event, so streaming is not gated on a remote write per event. Queued
+    events are written by `flush`: explicitly at the end of a turn, once
+    `max_batch_events` are queued, or `flush_interval_seconds` after the
+    first event was queued.
+
+    Events of a session are written strictly in order, one batch at a time,
+    and an event leaves the queue only once the wrapped service accepted it,
+    so a failed flush leaves no gap and is retried by the next one. Reads of
+    a session with queued events are served from memory (read-your-writes).
+
+    The queue is held in process memory only, it is not crash-safe: events
+    not yet flushed when the process dies are lost, including events kept
+    queued by failing flushes. Ordering is only guaranteed for the events
+    of a running process, which is why `SessionServiceBuilder` leaves this
+    layer off by default and warns when it is enabled.
+
+    Per-session bookkeeping is dropped once a session's queue is written;
+    sessions read or created but not yet appended to keep at most
+    `max_idle_sessions` copies of the wrapped service's session.
+    """
+
+    def __init__(
+        self,
+        inner: BaseSessionService,
+        max_batch_events: int = 32,
+        flush_interval_seconds: float = 2.0,
+        max_idle_sessions: int = 1024,
+    ) -> None:
+        self.inner = inner
+        self.max_batch_events = max_batch_events
+        self.flush_interval_seconds = flush_interval_seconds
+        self.max_idle_sessions = max_idle_sessions
+        self._pending: dict[SessionKey, deque[Event]] = {}
+        # Sessions as last returned by the wrapped service, kept up to date
+        # by its own append_event during flushes; least recently used first
+        self._shadows: OrderedDict[SessionKey, Session] = OrderedDict()
+        # Sessions as seen by the caller, including queued events
+        self._views: dict[SessionKey, Session] = {}
+        # Flush lock of a session and the number of flushes using it
+        self._locks: dict[SessionKey, tuple[asyncio.Lock, int]] = {}
+        self._timers: dict[SessionKey, asyncio.TimerHandle] = {}
+        self._tasks: set[asyncio.Task] = set()
+
+    def pending_events(self, session_id: str | None = None) -> int:
+        """Number of events not yet written, for one session or all of them."""
+        return sum(
+            len(queue)
+            for key, queue in self._pending.items()
+            if session_id is None or key[2] == session_id
+        )
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: dict[str, Any] | None = None,
+        session_id: str | None = None,
+    ) -> Session:
+        session = await self.inner.create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+        self._keep_shadow(_key(app_name, user_id, session.id), session)
+        return session.model_copy(deep=True)
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: GetSessionConfig | None = None,
+    ) -> Session | None:
+        key = _key(app_name, user_id, session_id)
+        session: Session | None
+        if self._pending.get(key):
+            metrics.incr("write_behind.read_from_memory")
+            session = _strip_temp_state(self._views[key].model_copy(deep=True))
+            return _apply_config(session, config)
+        session = await self.inner.get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id, config=config
+        )
+        if session is None:
+            return None
+        if config is None:
+            self._keep_shadow(key, session)
+            return session.model_copy(deep=True)
+        return session
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: str | None = None
+    ) -> ListSessionsResponse:
+        return await self.inner.list_sessions(app_name=app_name, user_id=user_id)
+
+    async def delete_session(
+        self, *, app_name: str, user_id: str, session_id: str
+    ) -> None:
+        key = _key(app_name, user_id, session_id)
+        self._discard(key)
+        await self.inner.delete_session(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.partial:
+            return event
+        # Updates the caller's session and drops temp: state from the event
+        event = await super().append_event(session=session, event=event)
+        session.last_update_time = event.timestamp
+        key = _key(session.app_name, session.user_id, session.id)
+        queue = self._pending.setdefault(key, deque())
+        queue.append(event.model_copy(deep=True))
+        self._views[key] = session
+        metrics.incr("write_behind.queued")
+
+        if len(queue) >= self.max_batch_events:
+            self._flush_in_background(key)
+        elif key not in self._timers:
+            loop = asyncio.get_running_loop()
+            self._timers[key] = loop.call_later(
+                self.flush_interval_seconds, self._flush_in_background, key
+            )
+        return event
+
+    async def flush(self, session_id: str | None = None) -> None:
+        """Write the queued events of one session, or of every session.
+
+        Raises:
+            The error of the wrapped service when a write failed; the
+            remaining events stay queued.
+        """
+        keys = [
+            key
+            for key in list(self._pending)
+            if session_id is None or key[2] == session_id
+        ]
+        for key in keys:
+            await self._flush_key(key)
+
+    def _flush_in_background(self, key: SessionKey) -> None:
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        task = asyncio.ensure_future(self._flush_key(key, raise_errors=False))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def _keep_shadow(self, key: SessionKey, session: Session) -> None:
+        self._shadows[key] = session
+        self._shadows.move_to_end(key)
+        idle = len(self._shadows) - self.max_idle_sessions
+        for old_key in list(itertools.islice(self._shadows, max(idle, 0))):
+            # Refetched by the next flush if its session gets events again
+            if not self._pending.get(old_key):
+                del self._shadows[old_key]
+
+    @contextlib.asynccontextmanager
+    async def _flush_lock(self, key: SessionKey) -> AsyncIterator[None]:
+        lock, users = self._locks.get(key, (asyncio.Lock(), 0))
+        self._locks[key] = (lock, users + 1)
+        try:
+            async with lock:
+                yield
+        finally:
+            lock, users = self._locks[key]
+            if users > 1:
+                self._locks[key] = (lock, users - 1)
+            else:
+                del self._locks[key]
+
+    async def _flush_key(self, key: SessionKey, raise_errors: bool = True) -> None:
+        async with self._flush_lock(key):
+            timer = self._timers.pop(key, None)
+            if timer:
+                timer.cancel()
+            queue = self._pending.get(key)
+            if not queue:
+                return
+            start = time.perf_counter()
+            written = 0
+            try:
+                shadow = self._shadows.get(key)
+                if shadow is None:
+                    app_name, user_id, session_id = key
+                    shadow = await self.inner.get_session(
+                        app_name=app_name, user_id=user_id, session_id=session_id
+                    )
+                    if shadow is None:
+                        # Deleted meanwhile, nothing to write to
+                        self._discard(key)
+                        return
+                    self._keep_shadow(key, shadow)
+                while queue:
+                    await self.inner.append_event(shadow, queue[0])
+                    queue.popleft()
+                    written += 1
+            except Exception as e:
+                # Refetched on the next flush, in case the shadow went stale
+                self._shadows.pop(key, None)
+                metrics.incr("write_behind.flush_error")
+                logging.warning(f"Write-behind flush of session {key[2]} failed: {e}")
+                if raise_errors:
+                    raise
+                loop = asyncio.get_running_loop()
+                self._timers[key] = loop.call_later(
+                    self.flush_interval_seconds, self._flush_in_background, key
+                )
+            finally:
+                metrics.incr("write_behind.flushed", written)
+                metrics.observe(
+                    "write_behind.flush_ms", (time.perf_counter() - start) * 1000
+                )
+            if not queue:
+                self._pending.pop(key, None)
+                self._views.pop(key, None)
+                # The next turn's get_session fetches the session again
+                self._shadows.pop(key, None)
+
+    def _discard(self, key: SessionKey) -> None:
+        timer = self._timers.pop(key, None)
+        if timer:
+            timer.cancel()
+        self._pending.pop(key, None)
+        self._views.pop(key, None)
+        self._shadows.pop(key, None)
+
+
+class CachingSessionService(BaseSessionService):
+    """Read-through, in-process session cache in front of a session service.
+
+    Sessions fetched from or created by the wrapped service are cached, and
+    kept current as events are appended through this service, so repeated
+    reads of a session during and right after a turn are memory hits.
+    Entries are versioned by the session's `last_update_time`: an append made
+    on an outdated copy of a session drops the entry instead of updating it.
+    The cache is an LRU bounded by the serialized size of the sessions, and
+    entries expire after `ttl_seconds` to pick up writes of other replicas.
+    """
+
+    def __init__(
+        self,
+        inner: BaseSessionService,
+        max_bytes: int = 64 * 1024 * 1024,
+        ttl_seconds: float = 300,
+    ) -> None:
+        self.inner = inner
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        # key -> (session, size in bytes, expiry)
+        self._entries: OrderedDict[SessionKey, tuple[Session, int, float]] = (
+            OrderedDict()
+        )
+        self._bytes = 0
+
+    @property
+    def size_bytes(self) -> int:
+        return self._bytes
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def flush(self, session_id: str | None = None) -> None:
+        # Only a write-behind layer below holds events that are not persisted
+        if isinstance(self.inner, WriteBehindSessionService):
+            await self.inner.flush(session_id)
+
+    async def create_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        state: dict[str, Any] | None = None,
+        session_id: str | None = None,
+    ) -> Session:
+        session = await self.inner.create_session(
+            app_name=app_name, user_id=user_id, state=state, session_id=session_id
+        )
+        self._put(session.model_copy(deep=True))
+        return session
+
+    async def get_session(
+        self,
+        *,
+        app_name: str,
+        user_id: str,
+        session_id: str,
+        config: GetSessionConfig | None = None,
+    ) -> Session | None:
+        key = _key(app_name, user_id, session_id)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[2] > time.monotonic():
+                self._entries.move_to_end(key)
+                session = entry[0].model_copy(deep=True)
+            else:
+                session = None
+        if session is not None:
+            metrics.incr("session_cache.hit")
+            return _apply_config(session, config)
+
+        metrics.incr("session_cache.miss")
+        if config is not None:
+            # Partial sessions are not cached
+            return await self.inner.get_session(
+                app_name=app_name, user_id=user_id, session_id=session_id, config=config
+            )
+        session = await self.inner.get_session(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+        if session is not None:
+            self._put(session.model_copy(deep=True))
+        return session
+
+    async def list_sessions(
+        self, *, app_name: str, user_id: str | None = None
+    ) -> ListSessionsResponse:
+        return await self.inner.list_sessions(app_name=app_name, user_id=user_id)
+
+    async def delete_session(
+        self, *, app_name: str, user_id: str, session_id: str
+    ) -> None:
+        self.invalidate(app_name, user_id, session_id)
+        await self.inner.delete_session(
+            app_name=app_name, user_id=user_id, session_id=session_id
+        )
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        version = session.last_update_time
+        event = await self.inner.append_event(session=session, event=event)
+        if event.partial:
+            return event
+        key = _key(session.app_name, session.user_id, session.id)
+        event_size = len(event.model_dump_json(exclude_none=True))
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return event
+            cached, size, expiry = entry
+            if cached.last_update_time != version:
+                # Appended to a copy the cache does not know about
+                self._remove(key)
+                metrics.incr("session_cache.version_mismatch")
+                return event
+            cached.events.append(event.model_copy(deep=True))
+            if event.actions and event.actions.state_delta:
+                cached.state.update(
+                    {
+                        k: v
+                        for k, v in event.actions.state_delta.items()
+                        if not k.startswith(State.TEMP_PREFIX)
+                    }
+                )
+            cached.last_update_time = session.last_update_time
+            self._entries[key] = (cached, size + event_size, expiry)
+            self._entries.move_to_end(key)
+            self._bytes += event_size
+            self._evict()
+        return event
+
+    def invalidate(self, app_name: str, user_id: str, session_id: str) -> None:
+        with self._lock:
+            self._remove(_key(app_name, user_id, session_id))
+
+    def _put(self, session: Session) -> None:
+        _strip_temp_state(session)
+        size = len(session.model_dump_json(exclude_none=True))
+        key = _key(session.app_name, session.user_id, session.id)
+        with self._lock:
+            self._remove(key)
+            if size > self.max_bytes:
+                return
+            self._entries[key] = (session, size, time.monotonic() + self.ttl_seconds)
+            self._bytes += size
+            self._evict()
+
+    def _remove(self, key: SessionKey) -> None:
+        entry = self._entries.pop(key, None)
+        if entry:
+            self._bytes -= entry[1]
+
+    def _evict(self) -> None:
+        while self._bytes > self.max_bytes and self._entries:
+            _, (_, size, _) = self._entries.popitem(last=False)
+            self._bytes -= size
+            metrics.incr("session_cache.evicted")
+
+
+class SessionServiceBuilder:
+    """Session service builder adding optional layers around a base builder.
+
+    Settings are read when the service is built, i.e. at runtime on Agent
+    Engine:
+    - SESSION_WRITE_BEHIND=true (default false, disabled) wraps the service
+      in a `WriteBehindSessionService` configured by SESSION_WRITE_BEHIND_BATCH
+      and SESSION_WRITE_BEHIND_INTERVAL_SECONDS. Buffered events are lost if
+      the process crashes before they are flushed.
+    - SESSION_CACHE_BYTES > 0 (default 0, disabled) and
+      SESSION_CACHE_TTL_SECONDS add an outermost `CachingSessionService`.
+      Only enable it when a session's turns are served by a single replica
+      (e.g. sticky sessions): writes of other replicas are not seen until
+      the entry expires.
+    """
+
+    def __init__(self, builder: Callable[..., BaseSessionService]) -> None:
+        self.builder = builder
+
+    def __call__(self, **kwargs: Any) -> BaseSessionService:
+        service = self.builder(**kwargs)
+        if os.environ.get("SESSION_WRITE_BEHIND", "false").lower() == "true":
+            logging.warning(
+                "SESSION_WRITE_BEHIND is enabled: session events buffered in memory "
+                "are lost if the process crashes before they are flushed"
+            )
+            service = WriteBehindSessionService(
+                service,
+                max_batch_events=int(
+                    os.environ.get("SESSION_WRITE_BEHIND_BATCH", "32")
+                ),
+                flush_interval_seconds=float(
+                    os.environ.get("SESSION_WRITE_BEHIND_INTERVAL_SECONDS", "2")
+                ),
+            )
+        cache_bytes = int(os.environ.get("SESSION_CACHE_BYTES", "0"))
+        if cache_bytes > 0:
+            service = CachingSessionService(
+                service,
+                max_bytes=cache_bytes,
+                ttl_seconds=float(os.environ.get("SESSION_CACHE_TTL_SECONDS", "300")),
+            )
+        return service
@@ -0,0 +1,436 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import fcntl
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import time
+from collections.abc import Sequence
+from typing import Any
+
+from opentelemetry.sdk.resources import Resource
+from opentelemetry.sdk.trace import Event, ReadableSpan
+from opentelemetry.sdk.trace.export import SpanExporter, SpanExportResult
+from opentelemetry.sdk.util.instrumentation import InstrumentationScope
+from opentelemetry.trace import (
+    Link,
+    SpanContext,
+    SpanKind,
+    Status,
+    StatusCode,
+    TraceFlags,
+    TraceState,
+)
+
+from app.utils.metrics import metrics
+from app.utils.resilience import Backoff
+
+logger = logging.getLogger(__name__)
+
+_MAGIC = b"SPANSPL1"
+# magic, data size, head, tail, record count
+_HEADER = struct.Struct("<8sQQQQ")
+_LENGTH = struct.Struct("<I")
+# Written where a record did not fit before the end of the data region
+_WRAP = 0xFFFFFFFF
+
+
+class SpoolLockedError(Exception):
+    """Raised when a spool file is already open in another process."""
+
+
+class MmapRingBuffer:
+    """Size-capped FIFO of byte records in a memory-mapped file.
+
+    Records are length-prefixed and wrap around the end of the file. The
+    head, tail and count live in the file header, so records survive a
+    process restart. When a new record does not fit, the oldest records are
+    overwritten (counted as spool.overwritten).
+
+    Records are numbered in order from the oldest one when the file is
+    opened, so that delivered records can be committed by number even if
+    older ones were overwritten in the meantime.
+
+    The file is locked (flock) until `close`, so that processes never share
+    a spool; opening a file locked by another process raises
+    `SpoolLockedError`.
+    """
+
+    def __init__(self, path: str, capacity_bytes: int) -> None:
+        self.path = path
+        self.size = capacity_bytes - _HEADER.size
+        if self.size < 2 * _LENGTH.size:
+            raise ValueError(
+                f"Spool capacity must be larger than {_HEADER.size + 2 * _LENGTH.size} bytes"
+            )
+        self._lock = threading.Lock()
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            os.close(self._fd)
+            raise SpoolLockedError(
+                f"Span spool {path} is used by another process"
+            ) from None
+        try:
+            if os.fstat(self._fd).st_size != capacity_bytes:
+                os.ftruncate(self._fd, capacity_bytes)
+            self._map = mmap.mmap(self._fd, capacity_bytes)
+        except Exception:
+            os.close(self._fd)
+            raise
+        magic, size, self.head, self.tail, self.count = _HEADER.unpack_from(
+            self._map, 0
+        )
+        # Number of the oldest record, i.e. records removed since opening
+        self.first = 0
+        if magic != _MAGIC or size != self.size:
+            # New file, or written with another capacity: start empty
+            self.head = self.tail = self.count = 0
+            self._save_header()
+
+    def __len__(self) -> int:
+        return self.count
+
+    def used_bytes(self) -> int:
+        with self._lock:
+            if not self.count:
+                return 0
+            if self.tail > self.head:
+                return self.tail - self.head
+            return self.size - self.head + self.tail
+
+    def append(self, record: bytes) -> bool:
+        """Append a record, overwriting the oldest ones if needed. False if the
+        record is larger than the whole buffer."""
+        needed = _LENGTH.size + len(record)
+        if needed > self.size:
+            metrics.incr("spool.oversized")
+            return False
+        with self._lock:
+            while (offset := self._reserve(needed)) is None:
+                self._pop()
+                metrics.incr("spool.overwritten")
+            _LENGTH.pack_into(self._map, _HEADER.size + offset, len(record))
+            start = _HEADER.size + offset + _LENGTH.size
+            self._map[start : start + len(record)] = record
+            self.tail = offset + needed
+            self.count += 1
+            self._save_header()
+        return True
+
+    def peek(self, max_records: int) -> list[bytes]:
+        """Return up to `max_records` of the oldest records without removing them."""
+        return self.read(max_records)[1]
+
+    def read(self, max_records: int) -> tuple[int, list[bytes]]:
+        """Like `peek`, also returning the number of the first record."""
+        records = []
+        with self._lock:
+            first = self.first
+            offset = self.head
+            for _ in range(min(max_records, self.count)):
+                offset = self._record_start(offset)
+                (length,) = _LENGTH.unpack_from(self._map, _HEADER.size + offset)
+                start = _HEADER.size + offset + _LENGTH.size
+                records.append(bytes(self._map[start : start + length]))
+                offset += _LENGTH.size + length
+        return first, records
+
+    def commit(self, records: int, first: int | None = None) -> None:
+        """Remove delivered records: the `records` oldest ones, or the ones
+        numbered from `first` as returned by `read`. Records overwritten since
+        they were read are gone already, newer ones are kept."""
+        with self._lock:
+            end = (self.first if first is None else first) + records
+            while self.count and self.first < end:
+                self._pop()
+            self._save_header()
+
+    def flush(self) -> None:
+        """Write the mapped pages back to the file."""
+        self._map.flush()
+
+    def close(self) -> None:
+        """Write the records back and release the file lock."""
+        with self._lock:
+            self._map.flush()
+            self._map.close()
+            os.close(self._fd)
+
+    def _reserve(self, needed: int) -> int | None:
+        """Offset where a record of `needed` bytes can be written, None if full."""
+        if not self.count:
+            self.head = self.tail = 0
+            return 0
+        if self.tail > self.head:
+            if self.size - self.tail >= needed:
+                return self.tail
+            if self.head >= needed:
+                if self.size - self.tail >= _LENGTH.size:
+                    _LENGTH.pack_into(self._map, _HEADER.size + self.tail, _WRAP)
+                return 0
+            return None
+        # Wrapped (tail before head) or full (tail == head)
+        return self.tail if self.head - self.tail >= needed else None
+
+    def _record_start(self, offset: int) -> int:
+        if self.size - offset < _LENGTH.size:
+            return 0
+        (length,) = _LENGTH.unpack_from(self._map, _HEADER.size + offset)
+        return 0 if length == _WRAP else offset
+
+    def _pop(self) -> None:
+        self.head = self._record_start(self.head)
+        (length,) = _LENGTH.unpack_from(self._map, _HEADER.size + self.head)
+        self.head += _LENGTH.size + length
+        self.count -= 1
+        self.first += 1
+        if not self.count:
+            self.head = self.tail = 0
+
+    def _save_header(self) -> None:
+        _HEADER.pack_into(
+            self._map, 0, _MAGIC, self.size, self.head, self.tail, self.count
+        )
+
+
+def _context_dict(context: SpanContext | None) -> dict[str, Any] | None:
+    if context is None:
+        return None
+    return {
+        "trace_id": context.trace_id,
+        "span_id": context.span_id,
+        "is_remote": context.is_remote,
+        "trace_flags": int(context.trace_flags),
+        "trace_state": list(context.trace_state.items()) if context.trace_state else [],
+    }
+
+
+def _context(value: dict[str, Any]) -> SpanContext:
+    return SpanContext(
+        trace_id=value["trace_id"],
+        span_id=value["span_id"],
+        is_remote=value["is_remote"],
+        trace_flags=TraceFlags(value["trace_flags"]),
+        trace_state=TraceState(value["trace_state"]),
+    )
+
+
+def _attributes(value: dict[str, Any]) -> dict[str, Any]:
+    # Sequence attributes are tuples in the SDK, JSON turns them into lists
+    return {
+        key: tuple(item) if isinstance(item, list) else item
+        for key, item in value.items()
+    }
+
+
+def serialize_span(span: ReadableSpan) -> bytes:
+    """Encode a finished span as JSON, everything exporters read from it."""
+    scope = span.instrumentation_scope
+    return json.dumps(
+        {
+            "name": span.name,
+            "context": _context_dict(span.get_span_context()),
+            "parent": _context_dict(span.parent),
+            "resource": {
+                "attributes": dict(span.resource.attributes),
+                "schema_url": span.resource.schema_url,
+            },
+            "attributes": dict(span.attributes or {}),
+            "events": [
+                {
+                    "name": e.name,
+                    "attributes": dict(e.attributes or {}),
+                    "timestamp": e.timestamp,
+                }
+                for e in span.events
+            ],
+            "links": [
+                {
+                    "context": _context_dict(link.context),
+                    "attributes": dict(link.attributes or {}),
+                }
+                for link in span.links
+            ],
+            "kind": span.kind.value,
+            "status": {
+                "code": span.status.status_code.value,
+                "description": span.status.description,
+            },
+            "start_time": span.start_time,
+            "end_time": span.end_time,
+            "scope": {
+                "name": scope.name,
+                "version": scope.version,
+                "schema_url": scope.schema_url,
+            }
+            if scope
+            else None,
+        },
+        default=str,
+    ).encode()
+
+
+def deserialize_span(data: bytes) -> ReadableSpan:
+    value = json.loads(data)
+    scope = value["scope"]
+    return ReadableSpan(
+        name=value["name"],
+        context=_context(value["context"]) if value["context"] else None,
+        parent=_context(value["parent"]) if value["parent"] else None,
+        resource=Resource(
+            _attributes(value["resource"]["attributes"]),
+            value["resource"]["schema_url"],
+        ),
+        attributes=_attributes(value["attributes"]),
+        events=[
+            Event(e["name"], _attributes(e["attributes"]), e["timestamp"])
+            for e in value["events"]
+        ],
+        links=[
+            Link(_context(link["context"]), _attributes(link["attributes"]))
+            for link in value["links"]
+        ],
+        kind=SpanKind(value["kind"]),
+        status=Status(
+            StatusCode(value["status"]["code"]), value["status"]["description"]
+        ),
+        start_time=value["start_time"],
+        end_time=value["end_time"],
+        instrumentation_scope=InstrumentationScope(**scope) if scope else None,
+    )
+
+
+def open_spool(path: str, capacity_bytes: int, max_files: int = 8) -> MmapRingBuffer:
+    """Open the first of `path`, `path.1`, ... not locked by another process.
+
+    Worker processes configured with the same path each get their own file;
+    spans left in a file by a stopped process are exported by the next
+    process opening it.
+    """
+    for index in range(max_files):
+        try:
+            return MmapRingBuffer(f"{path}.{index}" if index else path, capacity_bytes)
+        except SpoolLockedError:
+            continue
+    raise SpoolLockedError(f"All {max_files} span spools at {path} are in use")
+
+
+class SpoolingSpanExporter(SpanExporter):
+    """Spools spans to a memory-mapped ring buffer and exports them in the background.
+
+    `export` only appends the serialized spans to the spool and returns, so
+    a slow or unavailable backend never blocks the span processor. A drain
+    thread exports the spooled spans in order through `exporter`, in
+    batches of `batch_size`, removing them only once the export succeeded
+    and retrying with backoff otherwise. Bursts beyond the spool capacity
+    overwrite the oldest spans.
+    """
+
+    def __init__(
+        self,
+        exporter: SpanExporter,
+        path: str,
+        capacity_bytes: int = 64 * 1024 * 1024,
+        batch_size: int = 256,
+        backoff: Backoff | None = None,
+        idle_interval: float = 1.0,
+    ) -> None:
+        self.exporter = exporter
+        self.batch_size = batch_size
+        self.backoff = backoff or Backoff(base_seconds=1.0, max_seconds=60.0)
+        self.idle_interval = idle_interval
+        self.spool = open_spool(path, capacity_bytes)
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._drained = threading.Condition()
+        self._thread = threading.Thread(
+            target=self._drain, name="span-spool-drain", daemon=True
+        )
+        self._thread.start()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        if self._stopped.is_set():
+            return SpanExportResult.FAILURE
+        for span in spans:
+            self.spool.append(serialize_span(span))
+        metrics.incr("spool.appended", len(spans))
+        metrics.set_gauge("spool.pending", len(self.spool))
+        metrics.set_gauge("spool.used_bytes", self.spool.used_bytes())
+        self._wakeup.set()
+        return SpanExportResult.SUCCESS
+
+    def force_flush(self, timeout_millis: int = 30000) -> bool:
+        """Wait until every spooled span was exported."""
+        deadline = time.monotonic() + timeout_millis / 1000
+        self._wakeup.set()
+        with self._drained:
+            while len(self.spool):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return False
+                self._drained.wait(remaining)
+        return True
+
+    def shutdown(self, timeout_millis: int = 5000) -> None:
+        """Give the drain thread a chance to export what is spooled, then stop.
+        Spans left in the spool are exported by the next process using it."""
+        self.force_flush(timeout_millis)
+        self._stopped.set()
+        self._wakeup.set()
+        self._thread.join(timeout_millis / 1000)
+        self.spool.close()
+        self.exporter.shutdown()
+
+    def _drain(self) -> None:
+        failures = 0
+        while not self._stopped.is_set():
+            first, records = self.spool.read(self.batch_size)
+            if not records:
+                with self._drained:
+                    self._drained.notify_all()
+                self._wakeup.wait(self.idle_interval)
+                self._wakeup.clear()
+                continue
+            spans = []
+            for record in records:
+                try:
+                    spans.append(deserialize_span(record))
+                except (ValueError, KeyError, TypeError) as e:
+                    metrics.incr("spool.corrupt")
+                    logger.warning("Dropping unreadable spooled span: %s", e)
+            try:
+                result = (
+                    self.exporter.export(spans) if spans else SpanExportResult.SUCCESS
+                )
+            except Exception as e:
+                logger.warning("Spooled span export failed: %s", e)
+                result = SpanExportResult.FAILURE
+            if result is SpanExportResult.SUCCESS:
+                failures = 0
+                # By number: a burst may have overwritten some of them meanwhile
+                self.spool.commit(len(records), first)
+                self.spool.flush()
+                metrics.incr("spool.exported", len(spans))
+                metrics.set_gauge("spool.pending", len(self.spool))
+                continue
+            metrics.incr("spool.export_failures")
+            delay = self.backoff.delay(failures)
+            failures += 1
+            self._stopped.wait(delay)
@@ -0,0 +1,125 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import contextlib
+import contextvars
+import logging
+import os
+import threading
+from collections.abc import Callable, Hashable, Iterator
+from concurrent.futures import Future
+from typing import Any
+
+from app.utils.metrics import metrics
+
+
+def enabled_kinds() -> set[str]:
+    """Kinds of speculative prefetch enabled by SPECULATIVE_PREFETCH
+    (comma-separated "memory" and/or "search", defaults to "memory", empty to
+    disable). Search speculation costs a grounded model call per guessed
+    recipe request, so it is opt-in."""
+    value = os.environ.get("SPECULATIVE_PREFETCH", "memory")
+    return {kind.strip() for kind in value.split(",") if kind.strip()}
+
+
+class _Entry:
+    def __init__(self, future: "asyncio.Future[Any] | Future[Any]") -> None:
+        self.future = future
+        self.used = False
+
+
+class Speculator:
+    """Results started ahead of time, keyed by turn and by the exact request.
+
+    Inside `turn(scope)`, the app starts the requests it expects its agents
+    to make; an agent asks for its request with `get` and uses the result
+    only when the key it computed from its final parameters equals the
+    speculated one. Leaving the turn cancels what is still running and
+    counts each speculation once as a hit (used at least once) or a miss.
+    """
+
+    def __init__(self) -> None:
+        self._entries: dict[Hashable, dict[tuple[str, Hashable], _Entry]] = {}
+        self._lock = threading.Lock()
+        self._scope: contextvars.ContextVar[Hashable | None] = contextvars.ContextVar(
+            "speculation_scope", default=None
+        )
+
+    @contextlib.contextmanager
+    def turn(self, scope: Hashable) -> Iterator[None]:
+        """Make `scope` the current turn of this context, then finish it."""
+        token = self._scope.set(scope)
+        try:
+            yield
+        finally:
+            # A stream closed from another context cannot reset its token
+            with contextlib.suppress(ValueError):
+                self._scope.reset(token)
+            self.finish(scope)
+
+    def start(
+        self,
+        kind: str,
+        key: Hashable,
+        launch: Callable[[], "asyncio.Future[Any] | Future[Any]"],
+    ) -> None:
+        """Start `launch()` (a task or a thread future) unless already speculated."""
+        scope = self._scope.get()
+        if scope is None:
+            return
+        with self._lock:
+            entries = self._entries.setdefault(scope, {})
+            if (kind, key) in entries:
+                return
+            try:
+                future = launch()
+            except Exception as e:
+                logging.warning(f"Speculative {kind} not started: {e}")
+                return
+            entries[(kind, key)] = _Entry(future)
+        metrics.incr(f"speculation.{kind}.started")
+
+    def get(
+        self, kind: str, key: Hashable
+    ) -> "asyncio.Future[Any] | Future[Any] | None":
+        """Return the speculated future of this exact request in the current turn, or None."""
+        scope = self._scope.get()
+        with self._lock:
+            entry = self._entries.get(scope, {}).get((kind, key))
+            if entry is None or entry.future.cancelled():
+                return None
+            entry.used = True
+        metrics.incr(f"speculation.{kind}.served")
+        return entry.future
+
+    def finish(self, scope: Hashable) -> None:
+        """Discard the speculations of a turn and update the hit rates."""
+        with self._lock:
+            entries = self._entries.pop(scope, {})
+        for (kind, _), entry in entries.items():
+            if entry.used:
+                metrics.incr(f"speculation.{kind}.hit")
+            else:
+                future = entry.future
+                if not future.cancel() and future.done() and not future.cancelled():
+                    # Finished unused, its error (if any) is not worth reporting
+                    future.exception()
+                metrics.incr(f"speculation.{kind}.miss")
+            hits = metrics.counter(f"speculation.{kind}.hit")
+            misses = metrics.counter(f"speculation.{kind}.miss")
+            metrics.set_gauge(f"speculation.{kind}.hit_rate", hits / (hits + misses))
+
+
+speculator = Speculator()
@@ -0,0 +1,145 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import os
+import time
+from collections.abc import AsyncIterable, AsyncIterator, Callable
+from typing import Any
+
+from pydantic import BaseModel
+
+from app.utils.metrics import metrics
+
+
+class StreamingPolicy(BaseModel):
+    """How the events of a turn are streamed to the caller.
+
+    With `sse`, models stream partial events as they generate. Only the
+    partials of `visible_agents` reach the caller: the other agents are
+    internal hops (requirement extraction, recipe search) whose final
+    events still go through. Consecutive text partials are merged so that
+    at most one chunk is sent per `flush_ms`; a partial still buffered
+    when the agent's final event arrives is dropped, as the final event
+    carries the whole text.
+    """
+
+    sse: bool = True
+    visible_agents: list[str] = ["root_agent", "final_agent"]
+    flush_ms: float = 100.0
+
+    @classmethod
+    def from_env(cls) -> "StreamingPolicy":
+        """Read STREAM_SSE, STREAM_VISIBLE_AGENTS (comma-separated) and STREAM_FLUSH_MS."""
+        values: dict[str, Any] = {}
+        if (sse := os.environ.get("STREAM_SSE")) is not None:
+            values["sse"] = sse
+        if (agents := os.environ.get("STREAM_VISIBLE_AGENTS")) is not None:
+            values["visible_agents"] = [
+                agent.strip() for agent in agents.split(",") if agent.strip()
+            ]
+        if (flush_ms := os.environ.get("STREAM_FLUSH_MS")) is not None:
+            values["flush_ms"] = flush_ms
+        return cls.model_validate(values)
+
+    def run_config(self, run_config: dict[str, Any] | None) -> dict[str, Any] | None:
+        """The caller's run config, streaming with SSE unless it chose a mode."""
+        if not self.sse or (run_config and "streaming_mode" in run_config):
+            return run_config
+        return {**(run_config or {}), "streaming_mode": "sse"}
+
+
+def _text_chunk(event: dict[str, Any]) -> tuple[str, bool] | None:
+    """(text, thought) of a partial event made only of text parts of one kind."""
+    parts = (event.get("content") or {}).get("parts") or []
+    if not parts or any(set(part) - {"text", "thought"} for part in parts):
+        return None
+    kinds = {bool(part.get("thought")) for part in parts}
+    if len(kinds) != 1:
+        return None
+    return "".join(part.get("text") or "" for part in parts), kinds.pop()
+
+
+def _merge(buffered: list[tuple[dict[str, Any], tuple[str, bool]]]) -> dict[str, Any]:
+    last, (_, thought) = buffered[-1]
+    text = "".join(chunk for _, (chunk, _) in buffered)
+    part: dict[str, Any] = (
+        {"text": text, "thought": True} if thought else {"text": text}
+    )
+    # The newest event keeps its id and timestamp
+    return {**last, "content": {**last["content"], "parts": [part]}}
+
+
+async def shape_stream(
+    events: AsyncIterable[dict[str, Any]],
+    policy: StreamingPolicy,
+    clock: Callable[[], float] = time.monotonic,
+) -> AsyncIterator[dict[str, Any]]:
+    """Filter and coalesce the event dicts of a turn according to `policy`.
+
+    There is no timer: a buffered chunk goes out with the next event of
+    the stream. Publishes streaming.first_chunk_ms (time to the first event
+    sent), streaming.partials_suppressed and streaming.partials_coalesced.
+    """
+    started = clock()
+    first_sent = False
+    # Buffered partial events with their parsed (text, thought) chunk
+    buffer: list[tuple[dict[str, Any], tuple[str, bool]]] = []
+    last_flush = started
+
+    def take_buffer() -> dict[str, Any]:
+        nonlocal last_flush
+        metrics.incr("streaming.partials_coalesced", len(buffer) - 1)
+        merged = _merge(buffer)
+        buffer.clear()
+        last_flush = clock()
+        return merged
+
+    def sent(event: dict[str, Any]) -> dict[str, Any]:
+        nonlocal first_sent
+        if not first_sent:
+            first_sent = True
+            metrics.observe("streaming.first_chunk_ms", (clock() - started) * 1000)
+        return event
+
+    async for event in events:
+        if not event.get("partial"):
+            if buffer and buffer[-1][0].get("author") == event.get("author"):
+                # Superseded by the final event, which carries the whole text
+                metrics.incr("streaming.partials_coalesced", len(buffer))
+                buffer.clear()
+            elif buffer:
+                yield sent(take_buffer())
+            yield sent(event)
+            continue
+        if event.get("author") not in policy.visible_agents:
+            metrics.incr("streaming.partials_suppressed")
+            continue
+        chunk = _text_chunk(event)
+        if buffer:
+            last, (_, last_thought) = buffer[-1]
+            if (
+                chunk is None
+                or chunk[1] != last_thought
+                or event.get("author") != last.get("author")
+                or event.get("invocation_id") != last.get("invocation_id")
+            ):
+                yield sent(take_buffer())
+        if chunk is None:
+            yield sent(event)
+            continue
+        buffer.append((event, chunk))
+        if (clock() - last_flush) * 1000 >= policy.flush_ms:
+            yield sent(take_buffer())
+    if buffer:
+        yield sent(take_buffer())
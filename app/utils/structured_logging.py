@@ -0,0 +1,257 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import atexit
+import contextvars
+import datetime
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+from typing import Any
+
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.plugins.base_plugin import BasePlugin
+from google.genai import types
+
+from app.utils.metrics import metrics
+
+CORRELATION_FIELDS = ("invocation_id", "session_id", "user_id")
+
+_correlation: contextvars.ContextVar[dict[str, str] | None] = contextvars.ContextVar(
+    "log_correlation", default=None
+)
+
+
+def correlation_ids() -> dict[str, str]:
+    """Correlation ids of the current context (invocation, session, user)."""
+    return dict(_correlation.get() or {})
+
+
+class CorrelationPlugin(BasePlugin):
+    """Binds the invocation, session and user ids to the logs of each run.
+
+    The ids live in a context variable, so they also follow the run into
+    tasks and `asyncio.to_thread` workers it starts.
+    """
+
+    def __init__(self) -> None:
+        super().__init__(name="log_correlation")
+        self._tokens: dict[str, contextvars.Token] = {}
+
+    async def before_run_callback(
+        self, *, invocation_context: InvocationContext
+    ) -> types.Content | None:
+        self._tokens[invocation_context.invocation_id] = _correlation.set(
+            {
+                "invocation_id": invocation_context.invocation_id,
+                "session_id": invocation_context.session.id,
+                "user_id": invocation_context.user_id,
+            }
+        )
+        return None
+
+    async def after_run_callback(
+        self, *, invocation_context: InvocationContext
+    ) -> None:
+        token = self._tokens.pop(invocation_context.invocation_id, None)
+        if token is not None:
+            try:
+                _correlation.reset(token)
+            except ValueError:
+                # Run finished in another context, which dies with it
+                pass
+
+
+class CorrelationFilter(logging.Filter):
+    """Copies the correlation ids onto the record on the calling thread,
+    before the record leaves the request's context through the queue."""
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        for field, value in (_correlation.get() or {}).items():
+            setattr(record, field, value)
+        return True
+
+
+class RateLimitFilter(logging.Filter):
+    """Bounds how often each message template is emitted below WARNING.
+
+    Each (logger, template) pair may log `burst` records per `interval`
+    seconds; past that, one record in `sample_every` gets through, carrying
+    the number of records suppressed since the last one. Warnings and
+    errors are never limited.
+    """
+
+    def __init__(
+        self,
+        burst: int = 20,
+        interval: float = 10.0,
+        sample_every: int = 100,
+        max_keys: int = 4096,
+    ) -> None:
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self.sample_every = sample_every
+        self.max_keys = max_keys
+        self._windows: dict[tuple[str, Any], list[Any]] = {}
+        self._lock = threading.Lock()
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.msg)
+        now = time.monotonic()
+        with self._lock:
+            # [window start, records in window, suppressed since last emitted]
+            state = self._windows.get(key)
+            if state is None or now - state[0] >= self.interval:
+                if state is None and len(self._windows) >= self.max_keys:
+                    self._windows.clear()
+                state = self._windows[key] = [now, 0, state[2] if state else 0]
+            state[1] += 1
+            allowed = (
+                state[1] <= self.burst
+                or (state[1] - self.burst) % self.sample_every == 0
+            )
+            if allowed:
+                suppressed, state[2] = state[2], 0
+            else:
+                state[2] += 1
+        if not allowed:
+            metrics.incr("logging.suppressed")
+            return False
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, with the fields Cloud Logging recognizes."""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry: dict[str, Any] = {
+            "severity": record.levelname,
+            "message": record.getMessage(),
+            "logger": record.name,
+            "time": datetime.datetime.fromtimestamp(
+                record.created, tz=datetime.timezone.utc
+            ).isoformat(),
+        }
+        for field in (*CORRELATION_FIELDS, "suppressed"):
+            value = getattr(record, field, None)
+            if value is not None:
+                entry[field] = value
+        fields = getattr(record, "fields", None)
+        if isinstance(fields, dict):
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry["exception"] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class BoundedQueueHandler(logging.handlers.QueueHandler):
+    """QueueHandler that drops records instead of blocking when the queue is full."""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # Only resolve what cannot cross threads; JSON formatting happens on
+        # the listener thread
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            metrics.incr("logging.dropped")
+
+
+def parse_levels(value: str | None) -> dict[str, str]:
+    """Parse LOG_LEVELS, e.g. "app.utils.drive=WARNING,google_adk=INFO"."""
+    levels = {}
+    for item in (value or "").split(","):
+        name, _, level = item.partition("=")
+        if name.strip() and level.strip():
+            levels[name.strip()] = level.strip().upper()
+    return levels
+
+
+_listener: logging.handlers.QueueListener | None = None
+_configure_lock = threading.Lock()
+
+
+def configure_logging(
+    level: str | None = None,
+    levels: dict[str, str] | None = None,
+    stream: Any = None,
+    max_queue: int = 10_000,
+) -> None:
+    """Route all logging through a bounded queue to a JSON writer thread.
+
+    The request thread only filters the record and puts it on the queue;
+    formatting and writing happen on the listener thread. Calling it again
+    replaces the previous configuration.
+
+    Args:
+        level: Root level, defaults to LOG_LEVEL or INFO
+        levels: Per-logger levels, defaults to LOG_LEVELS
+        stream: Where JSON lines are written, defaults to stdout
+        max_queue: Records buffered before new ones are dropped
+    """
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+        root = logging.getLogger()
+        for handler in list(root.handlers):
+            if isinstance(handler, BoundedQueueHandler):
+                root.removeHandler(handler)
+        writer = logging.StreamHandler(stream or sys.stdout)
+        writer.setFormatter(JsonFormatter())
+        log_queue: queue.Queue[logging.LogRecord] = queue.Queue(maxsize=max_queue)
+        handler = BoundedQueueHandler(log_queue)
+        handler.addFilter(CorrelationFilter())
+        handler.addFilter(RateLimitFilter())
+        root.addHandler(handler)
+        root.setLevel(level or os.environ.get("LOG_LEVEL", "INFO").upper())
+        for name, name_level in (
+            levels if levels is not None else parse_levels(os.environ.get("LOG_LEVELS"))
+        ).items():
+            logging.getLogger(name).setLevel(name_level)
+        _listener = logging.handlers.QueueListener(
+            log_queue, writer, respect_handler_level=True
+        )
+        _listener.start()
+
+
+def shutdown_logging() -> None:
+    """Write the queued records and stop the writer thread."""
+    global _listener
+    with _configure_lock:
+        if _listener is not None:
+            _listener.stop()
+            _listener = None
+
+
+atexit.register(shutdown_logging)
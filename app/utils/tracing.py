@@ -15,14 +15,18 @@
 import json
 import logging
 from collections.abc import Sequence
-from typing import Any
+from typing import TYPE_CHECKING, Any
 
-import google.cloud.storage as storage
 from google.cloud import logging as google_cloud_logging
 from opentelemetry.exporter.cloud_trace import CloudTraceSpanExporter
 from opentelemetry.sdk.trace import ReadableSpan
 from opentelemetry.sdk.trace.export import SpanExportResult
 
+if TYPE_CHECKING:
+    import google.cloud.storage as storage
+
+logger = logging.getLogger(__name__)
+
 
 class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
     """
@@ -36,7 +40,7 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
     def __init__(
         self,
         logging_client: google_cloud_logging.Client | None = None,
-        storage_client: storage.Client | None = None,
+        storage_client: "storage.Client | None" = None,
         bucket_name: str | None = None,
         debug: bool = False,
         **kwargs: Any,
@@ -56,11 +60,23 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             project=self.project_id
         )
         self.logger = self.logging_client.logger(__name__)
-        self.storage_client = storage_client or storage.Client(project=self.project_id)
+        # Only large payloads go to GCS, the client is built on first use
+        self._storage_client = storage_client
         self.bucket_name = (
             bucket_name or f"{self.project_id}-agent-engine-test-dev-logs"
         )
-        self.bucket = self.storage_client.bucket(self.bucket_name)
+
+    @property
+    def storage_client(self) -> "storage.Client":
+        if self._storage_client is None:
+            import google.cloud.storage as storage
+
+            self._storage_client = storage.Client(project=self.project_id)
+        return self._storage_client
+
+    @property
+    def bucket(self) -> "storage.Bucket":
+        return self.storage_client.bucket(self.bucket_name)
 
     def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
         """
@@ -83,7 +99,9 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             )
 
             if self.debug:
-                print(span_dict)
+                logger.info(
+                    "Exporting span %s", span_id, extra={"fields": {"span": span_dict}}
+                )
 
             # Log the span data to Google Cloud Logging
             self.logger.log_struct(
@@ -106,7 +124,7 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
         :return: The  GCS URI of the stored content
         """
         if not self.storage_client.bucket(self.bucket_name).exists():
-            logging.warning(
+            logger.warning(
                 f"Bucket {self.bucket_name} not found. "
                 "Unable to store span attributes in GCS."
             )
@@ -143,7 +161,7 @@ class CloudTraceLoggingSpanExporter(CloudTraceSpanExporter):
             )
 
             span_dict["attributes"] = attributes_retain
-            logging.info(
+            logger.info(
                 "Length of payload span above 250 KB, storing attributes in GCS "
                 "to avoid large log entry errors"
             )
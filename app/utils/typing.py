@@ -26,6 +26,7 @@ class Feedback(BaseModel):
     score: int | float
     text: str | None = ""
     invocation_id: str
+    agent_name: str = ""
     log_type: Literal["feedback"] = "feedback"
     service_name: Literal["agent-engine-test"] = "agent-engine-test"
     user_id: str = ""
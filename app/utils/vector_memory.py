@@ -0,0 +1,466 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import glob
+import hashlib
+import itertools
+import json
+import logging
+import math
+import os
+import re
+import tempfile
+import threading
+import time
+from collections import Counter, OrderedDict
+from collections.abc import Callable, Sequence
+from typing import Protocol
+
+import numpy as np
+from google.adk.memory.base_memory_service import (
+    BaseMemoryService,
+    SearchMemoryResponse,
+)
+from google.adk.memory.memory_entry import MemoryEntry
+from google.adk.sessions.session import Session
+from google.genai import types
+
+from app.utils.memory_payload import CompactionPolicy, compact_events
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_TOKEN_RE = re.compile(r"[^\W_]+", re.UNICODE)
+
+Key = tuple[str, str]
+
+
+class Embedder(Protocol):
+    """Turns texts into L2-normalized vectors of `dimension` floats."""
+
+    name: str
+    dimension: int
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray: ...
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.where(norms == 0, 1, norms)
+
+
+class HashingEmbedder:
+    """Deterministic local embedder: hashed word and word-pair features.
+
+    No model and no network, the same text always gives the same vector, so
+    memories can be exercised in local runs and tests. Similarity is lexical.
+    """
+
+    def __init__(self, dimension: int = 512) -> None:
+        self.dimension = dimension
+        self.name = f"hashing-{dimension}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = _TOKEN_RE.findall(text.lower())
+            features = Counter(
+                words + [f"{a} {b}" for a, b in itertools.pairwise(words)]
+            )
+            for feature, count in features.items():
+                digest = int.from_bytes(
+                    hashlib.blake2b(feature.encode(), digest_size=8).digest(), "little"
+                )
+                sign = 1.0 if digest & 1 else -1.0
+                vectors[row, (digest >> 1) % self.dimension] += sign * (
+                    1 + math.log(count)
+                )
+        return _normalize(vectors)
+
+
+class GenaiEmbedder:
+    """Vertex AI text embeddings (one network call per `embed`)."""
+
+    def __init__(self, model: str = "text-embedding-005", dimension: int = 768) -> None:
+        self.model = model
+        self.dimension = dimension
+        self.name = f"{model}-{dimension}"
+
+    def embed(self, texts: Sequence[str]) -> np.ndarray:
+        from app.utils.models import genai_client
+
+        response = genai_client().models.embed_content(
+            model=self.model,
+            contents=list(texts),
+            config=types.EmbedContentConfig(output_dimensionality=self.dimension),
+        )
+        embeddings = response.embeddings or []
+        if len(embeddings) != len(texts):
+            raise ValueError(
+                f"{self.model} returned {len(embeddings)} embeddings for {len(texts)} texts"
+            )
+        vectors = np.array(
+            [embedding.values or [] for embedding in embeddings], dtype=np.float32
+        )
+        return _normalize(vectors.reshape(len(texts), self.dimension))
+
+
+def embedder_from_env() -> Embedder:
+    """MEMORY_EMBEDDER: "hashing" (default) or a Vertex AI embedding model name."""
+    name = os.environ.get("MEMORY_EMBEDDER", "hashing")
+    if name == "hashing":
+        return HashingEmbedder()
+    return GenaiEmbedder(model=name)
+
+
+class _Partition:
+    """Memories of one (app_name, user_id): a vector matrix and its rows."""
+
+    def __init__(self, dimension: int) -> None:
+        self.vectors = np.zeros((0, dimension), dtype=np.float32)
+        self.entries: list[dict[str, str]] = []
+        self.texts: set[str] = set()
+
+
+class LocalVectorMemoryService(BaseMemoryService):
+    """In-process memory service backed by a NumPy embedding index.
+
+    Memories are partitioned per app and user; a search embeds the query and
+    scores it against the user's partition only, by cosine similarity.
+    Sessions are added as their compacted events (what the user said and was
+    answered, see `compact_events`), one memory per text.
+
+    Args:
+        embedder: Defaults to a `HashingEmbedder`
+        path: Optional directory the index is loaded from, with one .npz
+            file per user rewritten when that user's memories change
+        top_k: Memories returned per search
+        min_score: Cosine similarity below which a memory is not returned
+        max_entries_per_user: Beyond this, the oldest memories of a user are dropped
+    """
+
+    def __init__(
+        self,
+        embedder: Embedder | None = None,
+        path: str | None = None,
+        top_k: int = 5,
+        min_score: float = 0.15,
+        max_entries_per_user: int = 1000,
+        compaction_policy: CompactionPolicy | None = None,
+    ) -> None:
+        self.embedder = embedder or HashingEmbedder()
+        self.path = path
+        self.top_k = top_k
+        self.min_score = min_score
+        self.max_entries_per_user = max_entries_per_user
+        self.compaction_policy = compaction_policy or CompactionPolicy.from_env()
+        self._partitions: dict[Key, _Partition] = {}
+        self._lock = threading.Lock()
+        # Saves of one user are serialized, striped so the locks never grow
+        self._save_locks = [threading.Lock() for _ in range(16)]
+        if path:
+            os.makedirs(path, exist_ok=True)
+            for file_path in sorted(glob.glob(os.path.join(path, "*.npz"))):
+                self._load(file_path)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(
+                len(partition.entries) for partition in self._partitions.values()
+            )
+
+    def has_user(self, app_name: str, user_id: str) -> bool:
+        return (app_name, user_id) in self._partitions
+
+    async def add_session_to_memory(self, session: Session) -> None:
+        memories = []
+        for event in compact_events(session.events, self.compaction_policy):
+            content = event["content"]
+            author = "user" if content["role"] == "user" else "model"
+            for part in content["parts"]:
+                if part.get("text"):
+                    memories.append({"text": part["text"], "author": author})
+        if memories:
+            await asyncio.to_thread(
+                self.add, session.app_name, session.user_id, memories
+            )
+
+    async def search_memory(
+        self, *, app_name: str, user_id: str, query: str
+    ) -> SearchMemoryResponse:
+        results = await asyncio.to_thread(self.search, app_name, user_id, query)
+        return SearchMemoryResponse(
+            memories=[
+                MemoryEntry(
+                    author=entry["author"],
+                    content=types.Content(
+                        parts=[types.Part(text=entry["text"])], role=entry["author"]
+                    ),
+                    timestamp=entry["timestamp"],
+                )
+                for entry, _ in results
+            ]
+        )
+
+    def add(
+        self, app_name: str, user_id: str, memories: Sequence[dict[str, str]]
+    ) -> int:
+        """Index memories ({"text", "author", optional "timestamp"}) of a user,
+        skipping texts it already has. Returns the number added (blocking)."""
+        key = (app_name, user_id)
+        with self._lock:
+            known = self._partitions[key].texts if key in self._partitions else set()
+            new: dict[str, dict[str, str]] = {}
+            for memory in memories:
+                if memory["text"] not in known and memory["text"] not in new:
+                    new[memory["text"]] = memory
+        if not new:
+            return 0
+        vectors = self.embedder.embed(list(new))
+        now = time.strftime("%Y-%m-%dT%H:%M:%S+00:00", time.gmtime())
+        entries = [
+            {
+                "text": text,
+                "author": memory.get("author", "user"),
+                "timestamp": memory.get("timestamp") or now,
+            }
+            for text, memory in new.items()
+        ]
+        with self._lock:
+            partition = self._partitions.setdefault(
+                key, _Partition(self.embedder.dimension)
+            )
+            fresh = [
+                i
+                for i, entry in enumerate(entries)
+                if entry["text"] not in partition.texts
+            ]
+            partition.vectors = np.concatenate([partition.vectors, vectors[fresh]])
+            partition.entries.extend(entries[i] for i in fresh)
+            partition.texts.update(entries[i]["text"] for i in fresh)
+            overflow = len(partition.entries) - self.max_entries_per_user
+            if overflow > 0:
+                partition.texts.difference_update(
+                    entry["text"] for entry in partition.entries[:overflow]
+                )
+                partition.vectors = partition.vectors[overflow:]
+                del partition.entries[:overflow]
+        metrics.incr("memory.local.added", len(fresh))
+        self._save(key)
+        return len(fresh)
+
+    def search(
+        self, app_name: str, user_id: str, query: str
+    ) -> list[tuple[dict[str, str], float]]:
+        """Return up to `top_k` (memory, score) pairs of a user, best first (blocking)."""
+        start = time.perf_counter()
+        partition = self._partitions.get((app_name, user_id))
+        if partition is None or not query.strip():
+            return []
+        query_vector = self.embedder.embed([query])[0]
+        with self._lock:
+            vectors, entries = partition.vectors, list(partition.entries)
+        scores = vectors @ query_vector
+        k = min(self.top_k, len(scores))
+        if not k:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best])]
+        results = [
+            (entries[i], float(scores[i])) for i in best if scores[i] >= self.min_score
+        ]
+        metrics.observe("memory.local.search_ms", (time.perf_counter() - start) * 1000)
+        return results
+
+    def forget(self, app_name: str, user_id: str) -> None:
+        """Drop every memory of a user."""
+        key = (app_name, user_id)
+        with self._lock:
+            removed = self._partitions.pop(key, None)
+        if removed is not None:
+            self._save(key)
+
+    def _file_path(self, key: Key) -> str:
+        assert self.path
+        name = hashlib.blake2b("\0".join(key).encode(), digest_size=16).hexdigest()
+        return os.path.join(self.path, f"{name}.npz")
+
+    def _save(self, key: Key) -> None:
+        """Persist the memories of one user, or delete its file once it has none."""
+        if not self.path:
+            return
+        file_path = self._file_path(key)
+        # Snapshot taken under the save lock, so the last write is the newest
+        with self._save_locks[hash(key) % len(self._save_locks)]:
+            with self._lock:
+                partition = self._partitions.get(key)
+                if partition is not None:
+                    vectors, entries = partition.vectors, list(partition.entries)
+            if partition is None:
+                if os.path.exists(file_path):
+                    os.remove(file_path)
+                return
+            meta = {
+                "embedder": self.embedder.name,
+                "app_name": key[0],
+                "user_id": key[1],
+                "entries": entries,
+            }
+            # Written next to the file and renamed, so a crash never leaves a torn index
+            with tempfile.NamedTemporaryFile(
+                dir=self.path,
+                prefix=os.path.basename(file_path),
+                suffix=".tmp",
+                delete=False,
+            ) as tmp:
+                try:
+                    np.savez(
+                        tmp,
+                        vectors=vectors,
+                        meta=np.array(json.dumps(meta, ensure_ascii=False)),
+                    )
+                except BaseException:
+                    os.remove(tmp.name)
+                    raise
+            os.replace(tmp.name, file_path)
+
+    def _load(self, file_path: str) -> None:
+        try:
+            with np.load(file_path) as data:
+                meta = json.loads(str(data["meta"]))
+                vectors = data["vectors"]
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("Ignoring unreadable memory index %s: %s", file_path, e)
+            return
+        if meta.get("embedder") != self.embedder.name:
+            # Vectors of another embedder cannot be compared with ours
+            logger.warning(
+                "Ignoring memory index %s built with %s",
+                file_path,
+                meta.get("embedder"),
+            )
+            return
+        partition = _Partition(self.embedder.dimension)
+        partition.entries = meta["entries"]
+        partition.texts = {entry["text"] for entry in partition.entries}
+        partition.vectors = vectors
+        self._partitions[meta["app_name"], meta["user_id"]] = partition
+
+
+class TieredMemoryService(BaseMemoryService):
+    """Serves hot users from a local index, everyone else from `remote`.
+
+    The first search of a user (a miss) is answered by `remote` while all of
+    the user's remote memories are loaded into `local` in the background;
+    the user is then hot and searched locally, without a network hop, until
+    `hot_ttl_seconds` have passed or more than `max_hot_users` users are hot
+    (least recently used users are evicted first). Sessions are added to
+    both tiers, so hot users find their latest turns before `remote` has
+    generated memories from them.
+
+    Args:
+        remote: Typically a `CustomMemoryBankService`; its `list_memories` is
+            used to load users if it has one, its search results otherwise
+        local: The local tier
+    """
+
+    def __init__(
+        self,
+        remote: BaseMemoryService,
+        local: LocalVectorMemoryService,
+        max_hot_users: int = 1000,
+        hot_ttl_seconds: float = 3600.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.remote = remote
+        self.local = local
+        self.max_hot_users = max_hot_users
+        self.hot_ttl_seconds = hot_ttl_seconds
+        self.clock = clock
+        self._hot: OrderedDict[Key, float] = OrderedDict()
+        self._loading: dict[Key, asyncio.Task] = {}
+
+    def is_hot(self, app_name: str, user_id: str) -> bool:
+        loaded_at = self._hot.get((app_name, user_id))
+        return loaded_at is not None and self.clock() - loaded_at < self.hot_ttl_seconds
+
+    async def add_session_to_memory(self, session: Session) -> None:
+        await asyncio.gather(
+            self.remote.add_session_to_memory(session),
+            self.local.add_session_to_memory(session),
+        )
+
+    async def search_memory(
+        self, *, app_name: str, user_id: str, query: str
+    ) -> SearchMemoryResponse:
+        key = (app_name, user_id)
+        if self.is_hot(app_name, user_id):
+            self._hot.move_to_end(key)
+            metrics.incr("memory.tiered.hit")
+            return await self.local.search_memory(
+                app_name=app_name, user_id=user_id, query=query
+            )
+        metrics.incr("memory.tiered.miss")
+        response = await self.remote.search_memory(
+            app_name=app_name, user_id=user_id, query=query
+        )
+        if key not in self._loading:
+            task = asyncio.ensure_future(self._load_user(app_name, user_id, response))
+            self._loading[key] = task
+            task.add_done_callback(lambda _: self._loading.pop(key, None))
+        return response
+
+    def prefetch(self, *, app_name: str, user_id: str, query: str) -> None:
+        """Start the remote search of a cold user early (see speculation)."""
+        prefetch = getattr(self.remote, "prefetch", None)
+        if prefetch is not None and not self.is_hot(app_name, user_id):
+            prefetch(app_name=app_name, user_id=user_id, query=query)
+
+    async def _load_user(
+        self, app_name: str, user_id: str, searched: SearchMemoryResponse
+    ) -> None:
+        start = time.perf_counter()
+        try:
+            list_memories = getattr(self.remote, "list_memories", None)
+            response = (
+                await list_memories(app_name=app_name, user_id=user_id)
+                if list_memories
+                else searched
+            )
+            memories = [
+                {
+                    "text": part.text,
+                    "author": memory.author or "user",
+                    "timestamp": memory.timestamp or "",
+                }
+                for memory in response.memories
+                if memory.content and memory.content.parts
+                for part in memory.content.parts
+                if part.text
+            ]
+            await asyncio.to_thread(self.local.add, app_name, user_id, memories)
+        except Exception as e:
+            # Stays cold, the next search tries again
+            logger.warning(
+                "Loading the memories of a user into the local tier failed: %s", e
+            )
+            return
+        self._hot[app_name, user_id] = self.clock()
+        self._hot.move_to_end((app_name, user_id))
+        while len(self._hot) > self.max_hot_users:
+            (evicted_app, evicted_user), _ = self._hot.popitem(last=False)
+            self.local.forget(evicted_app, evicted_user)
+            metrics.incr("memory.tiered.evicted")
+        metrics.observe("memory.tiered.load_ms", (time.perf_counter() - start) * 1000)
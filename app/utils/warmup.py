@@ -0,0 +1,64 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import logging
+import time
+from collections.abc import Callable
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any
+
+from app.utils.metrics import metrics
+
+
+def run_warmup(
+    tasks: dict[str, Callable[[], Any]], max_workers: int = 8
+) -> dict[str, Any]:
+    """Run independent startup tasks concurrently and record their durations.
+
+    Most of the work (imports, credential refresh, client construction)
+    waits on I/O or releases the GIL, so the tasks overlap well in threads.
+    A failing task is logged and skipped; the replica then pays that cost on
+    first use instead.
+
+    Args:
+        tasks: Task name to callable
+        max_workers: Maximum number of tasks running at once
+
+    Returns:
+        Task name to result, for the tasks that succeeded
+    """
+
+    def timed(name: str, task: Callable[[], Any]) -> Any:
+        start = time.perf_counter()
+        try:
+            return task()
+        finally:
+            metrics.set_gauge(
+                f"startup.warmup.{name}_ms", (time.perf_counter() - start) * 1000
+            )
+
+    results: dict[str, Any] = {}
+    with ThreadPoolExecutor(
+        max_workers=max_workers, thread_name_prefix="warmup"
+    ) as executor:
+        futures = {
+            name: executor.submit(timed, name, task) for name, task in tasks.items()
+        }
+        for name, future in futures.items():
+            try:
+                results[name] = future.result()
+            except Exception as e:
+                metrics.incr(f"startup.warmup.{name}_error")
+                logging.warning(f"Warmup task {name} failed: {e}")
+    return results
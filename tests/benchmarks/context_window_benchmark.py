@@ -0,0 +1,116 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Per-turn latency across session lengths, with and without the context window.
+
+Runs offline against a fake model whose latency grows with the prompt size
+(a fixed overhead plus a per-token cost), the way a real model's prefill does.
+With the context window the model latency of late turns stays flat; what
+remains of the end-to-end growth is the framework replaying the stored
+session events, which the window does not change.
+
+    PYTHONPATH=.:app uv run python tests/benchmarks/context_window_benchmark.py
+"""
+
+import asyncio
+import time
+from collections.abc import AsyncGenerator
+
+from google.adk.agents import Agent
+from google.adk.models import LlmRequest, LlmResponse
+from google.adk.models.base_llm import BaseLlm
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+from pydantic import Field
+
+from app.utils.context_window import ContextPolicy, ContextWindowPlugin, estimate_tokens
+
+SESSION_TURNS = (5, 50, 200)
+MEASURED_TURNS = 5
+BASE_LATENCY_SECONDS = 0.002
+SECONDS_PER_TOKEN = 0.000002
+ANSWER = "Here is a high-protein vegetarian plan with lentils, tofu and quinoa. " * 20
+
+
+class FakeLlm(BaseLlm):
+    """Answers every request, sleeping in proportion to the prompt tokens."""
+
+    prompt_tokens: list[int] = Field(default_factory=list)
+    latencies: list[float] = Field(default_factory=list)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        tokens = sum(estimate_tokens(content) for content in llm_request.contents)
+        self.prompt_tokens.append(tokens)
+        latency = BASE_LATENCY_SECONDS + tokens * SECONDS_PER_TOKEN
+        self.latencies.append(latency)
+        await asyncio.sleep(latency)
+        yield LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(text=ANSWER)])
+        )
+
+
+async def _run_session(
+    turns: int, policy: ContextPolicy | None
+) -> tuple[float, float, int]:
+    model = FakeLlm(model="fake")
+    agent = Agent(name="root_agent", model=model, instruction="Plan meals.")
+    runner = Runner(
+        app_name="benchmark",
+        agent=agent,
+        session_service=InMemorySessionService(),
+        plugins=[ContextWindowPlugin(policy)] if policy else [],
+    )
+    session = await runner.session_service.create_session(
+        app_name="benchmark", user_id="u"
+    )
+    latencies = []
+    for turn in range(turns):
+        message = types.Content(
+            role="user", parts=[types.Part(text=f"Plan day {turn} please.")]
+        )
+        start = time.perf_counter()
+        async for _ in runner.run_async(
+            user_id="u", session_id=session.id, new_message=message
+        ):
+            pass
+        latencies.append(time.perf_counter() - start)
+    tail = latencies[-MEASURED_TURNS:]
+    model_tail = model.latencies[-MEASURED_TURNS:]
+    return (
+        sum(tail) / len(tail) * 1000,
+        sum(model_tail) / len(model_tail) * 1000,
+        model.prompt_tokens[-1],
+    )
+
+
+async def main() -> None:
+    policy = ContextPolicy(max_events=20, max_tokens=4000)
+    print(f"{'':>6} {'full history':^30} {'context window':^30}")
+    print(f"{'turns':>6}" + f" {'ms/turn':>9} {'model ms':>9} {'tokens':>10}" * 2)
+    for turns in SESSION_TURNS:
+        row = [*await _run_session(turns, None), *await _run_session(turns, policy)]
+        print(
+            f"{turns:>6}"
+            + "".join(
+                f" {total:>9.2f} {model_ms:>9.2f} {tokens:>10}"
+                for total, model_ms, tokens in (row[:3], row[3:])
+            )
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,55 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Compares building a Drive service per upload with the per-token service cache.
+
+Runs offline: both paths use the discovery document bundled with
+google-api-python-client, so only client-side construction cost is measured.
+
+    PYTHONPATH=.:app uv run python tests/benchmarks/drive_service_benchmark.py
+"""
+
+import time
+from collections.abc import Callable
+
+from google.oauth2.credentials import Credentials
+from googleapiclient.discovery import build
+
+from app.utils.drive import DriveServiceCache
+
+ITERATIONS = 200
+
+
+def _timed(label: str, fn: Callable[[int], object]) -> float:
+    start = time.perf_counter()
+    for i in range(ITERATIONS):
+        fn(i)
+    per_call = (time.perf_counter() - start) / ITERATIONS * 1000
+    print(f"{label:<40} {per_call:8.3f} ms/call")
+    return per_call
+
+
+def main() -> None:
+    cache = DriveServiceCache()
+    baseline = _timed(
+        "build() per call",
+        lambda i: build("drive", "v3", credentials=Credentials(token="token")),
+    )
+    cold = _timed("cache miss (new token per call)", lambda i: cache.get(f"token-{i}"))
+    warm = _timed("cache hit (same token)", lambda i: cache.get("token-0"))
+    print(f"\nspeedup: miss {baseline / cold:.1f}x, hit {baseline / warm:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Import-time profile of the agent runtime, based on `python -X importtime`.
+
+Imports the module in a fresh interpreter and reports the slowest imports
+(cumulative) and the self time spent per distribution-level package, which
+is what lazy imports can win back.
+
+    uv run python tests/benchmarks/import_time_report.py [module] [--top N]
+"""
+
+import argparse
+import os
+import re
+import subprocess
+import sys
+from collections import defaultdict
+
+_LINE_RE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)")
+
+
+def profile(module: str) -> list[tuple[str, int, int, int]]:
+    """Return (module, self_us, cumulative_us, depth) for each import."""
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [root, os.path.join(root, "app"), env.get("PYTHONPATH", "")]
+    )
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        env=env,
+        check=True,
+    )
+    rows = []
+    for line in result.stderr.splitlines():
+        match = _LINE_RE.match(line)
+        if match:
+            self_us, cumulative_us, indent, name = match.groups()
+            rows.append((name, int(self_us), int(cumulative_us), len(indent) // 2))
+    return rows
+
+
+def package_of(name: str) -> str:
+    parts = name.split(".")
+    # Namespace packages are reported one level deeper (google.genai, google.cloud.logging)
+    if parts[0] == "google" and len(parts) > 1:
+        depth = 3 if parts[1] == "cloud" and len(parts) > 2 else 2
+        return ".".join(parts[:depth])
+    return parts[0]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("module", nargs="?", default="app.agent_engine_app")
+    parser.add_argument("--top", type=int, default=20)
+    args = parser.parse_args()
+
+    rows = profile(args.module)
+    total = max(cumulative for _, _, cumulative, depth in rows if depth == 0)
+    print(f"import {args.module}: {total / 1000:.0f} ms\n")
+
+    print(f"{'slowest imports (cumulative)':<60} {'ms':>8}")
+    for name, _, cumulative, _ in sorted(rows, key=lambda r: -r[2])[: args.top]:
+        print(f"{name:<60} {cumulative / 1000:>8.1f}")
+
+    by_package: dict[str, int] = defaultdict(int)
+    for name, self_us, _, _ in rows:
+        by_package[package_of(name)] += self_us
+    print(f"\n{'self time by package':<60} {'ms':>8} {'share':>6}")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[
+        : args.top
+    ]:
+        print(f"{package:<60} {self_us / 1000:>8.1f} {self_us / total:>6.0%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,138 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+
+import pytest
+
+from app.utils.admission import (
+    AdmissionController,
+    AdmissionRejected,
+    TokenBucket,
+    parse_weights,
+)
+from app.utils.metrics import metrics
+
+
+def test_token_bucket_refills_at_rate() -> None:
+    bucket = TokenBucket(rate=0.5, burst=2, now=0.0)
+
+    assert bucket.take(0.0) == 0 and bucket.take(0.0) == 0
+    assert bucket.take(0.0) == pytest.approx(2.0)
+    assert bucket.take(1.0) == pytest.approx(1.0)
+    assert bucket.take(2.0) == 0
+
+
+def test_parse_weights() -> None:
+    assert parse_weights("premium=2, batch=0.5,,bad") == {"premium": 2.0, "batch": 0.5}
+
+
+def test_users_over_their_rate_are_rejected_at_once() -> None:
+    async def scenario() -> None:
+        controller = AdmissionController(
+            user_rate=0.1, user_burst=1, clock=lambda: 100.0
+        )
+        admitted = await controller.acquire("heavy")
+        with pytest.raises(AdmissionRejected) as rejected:
+            await controller.acquire("heavy")
+        assert rejected.value.reason == "rate_limited"
+        assert rejected.value.event()["custom_metadata"]["retry_after_seconds"] == 10
+        await controller.acquire("light")
+        controller.release(admitted)
+
+    asyncio.run(scenario())
+
+
+def test_light_users_are_not_queued_behind_heavy_users() -> None:
+    async def scenario() -> list[str]:
+        controller = AdmissionController(max_concurrent=1, user_burst=10)
+        order: list[str] = []
+
+        async def turn(user_id: str) -> None:
+            admitted = await controller.acquire(user_id)
+            order.append(user_id)
+            await asyncio.sleep(0)
+            controller.release(admitted)
+
+        running = await controller.acquire("heavy")
+        tasks = [asyncio.create_task(turn("heavy")) for _ in range(3)]
+        await asyncio.sleep(0)
+        tasks.append(asyncio.create_task(turn("light")))
+        await asyncio.sleep(0)
+        assert metrics.snapshot()["gauges"]["admission.queued"] == 4
+        controller.release(running)
+        await asyncio.gather(*tasks)
+        return order
+
+    # The heavy user already holds the slot: the light user's turn goes
+    # before the heavy user's queued turns instead of after them
+    assert asyncio.run(scenario()) == ["light", "heavy", "heavy", "heavy"]
+
+
+def test_saturated_replica_rejects_with_retry_hint() -> None:
+    async def scenario() -> None:
+        controller = AdmissionController(
+            max_concurrent=1, max_queue=1, max_queue_wait=0.05
+        )
+        running = await controller.acquire("a")
+        waiting = asyncio.create_task(controller.acquire("b"))
+        await asyncio.sleep(0)
+
+        with pytest.raises(AdmissionRejected) as full:
+            await controller.acquire("c")
+        assert full.value.reason == "queue_full" and full.value.retry_after >= 1
+
+        with pytest.raises(AdmissionRejected) as timed_out:
+            await waiting
+        assert timed_out.value.reason == "queue_timeout"
+
+        # The slot freed by the running turn is not granted to the gone waiter
+        controller.release(running)
+        assert controller.in_flight == 0
+        controller.release(await controller.acquire("c"))
+
+    asyncio.run(scenario())
+
+
+def test_cancelled_waiter_gives_its_slot_back() -> None:
+    async def scenario() -> None:
+        controller = AdmissionController(max_concurrent=1)
+        running = await controller.acquire("a")
+        waiting = asyncio.create_task(controller.acquire("b"))
+        await asyncio.sleep(0)
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        controller.release(running)
+        assert controller.in_flight == 0
+
+    asyncio.run(scenario())
+
+
+def test_queue_wait_is_observed() -> None:
+    before = (
+        metrics.snapshot()["summaries"]
+        .get("admission.queue_wait_ms", {})
+        .get("count", 0)
+    )
+
+    async def scenario() -> None:
+        controller = AdmissionController()
+        controller.release(await controller.acquire("a"))
+
+    asyncio.run(scenario())
+    assert (
+        metrics.snapshot()["summaries"]["admission.queue_wait_ms"]["count"]
+        == before + 1
+    )
@@ -0,0 +1,94 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+from google.adk.sessions import InMemorySessionService, Session
+from google.cloud.aiplatform import initializer
+from vertexai.agent_engines.templates.adk import AdkApp
+
+from app.agent import root_agent
+from app.agent_engine_app import AgentEngineApp
+
+ANSWER = {
+    "author": "final_agent",
+    "invocation_id": "inv-1",
+    "partial": False,
+    "content": {"role": "model", "parts": [{"text": "Here is your recipe."}]},
+}
+
+
+class RecordingMemoryService:
+    """Memory service recording prefetches and the sessions added to it."""
+
+    def __init__(self) -> None:
+        self.prefetched: list[dict[str, str]] = []
+        self.added: list[Session] = []
+
+    def prefetch(self, **scope: str) -> None:
+        self.prefetched.append(scope)
+
+    async def add_session_to_memory(self, session: Session) -> None:
+        self.added.append(session)
+
+
+@pytest.fixture
+def agent_app(monkeypatch: pytest.MonkeyPatch) -> AgentEngineApp:
+    """AgentEngineApp with in-memory services, answering without models."""
+
+    async def answer(self: AdkApp, **kwargs: Any) -> AsyncIterator[dict[str, Any]]:
+        yield ANSWER
+
+    monkeypatch.setattr(AdkApp, "async_stream_query", answer)
+    monkeypatch.delenv("SPECULATIVE_PREFETCH", raising=False)
+    # No Google Cloud credentials are needed to build the app
+    monkeypatch.setattr(initializer.global_config, "_project", "test-project")
+    agent_app = AgentEngineApp(agent=root_agent, app_name="recipes")
+    agent_app._tmpl_attrs["session_service"] = InMemorySessionService()
+    agent_app.memory_service = RecordingMemoryService()
+    return agent_app
+
+
+def _turn(agent_app: AgentEngineApp, **kwargs: Any) -> list[dict[str, Any]]:
+    async def collect() -> list[dict[str, Any]]:
+        return [event async for event in agent_app._stream_turn(user_id="u", **kwargs)]
+
+    return asyncio.run(collect())
+
+
+def test_turn_prefetches_memories_of_the_app(agent_app: AgentEngineApp) -> None:
+    session = asyncio.run(agent_app.async_create_session(user_id="u"))
+
+    events = _turn(agent_app, message="Find me a vegan curry", session_id=session.id)
+
+    assert events == [ANSWER]
+    memory = agent_app.memory_service
+    assert memory.prefetched == [
+        {"app_name": "recipes", "user_id": "u", "query": "Find me a vegan curry"}
+    ]
+    assert [added.id for added in memory.added] == [session.id]
+
+
+def test_first_turn_creates_the_session(agent_app: AgentEngineApp) -> None:
+    events = _turn(agent_app, message="Find me a vegan curry")
+
+    assert events == [ANSWER]
+    [session] = agent_app.memory_service.added
+    stored = asyncio.run(
+        agent_app.async_get_session(user_id="u", session_id=session.id)
+    )
+    assert stored.app_name == "recipes"
@@ -0,0 +1,170 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+"""
+Runs a recipe request through the real agent tree with scripted models, so
+that the requirements final validation reads are the ones the agents stored.
+"""
+
+import asyncio
+from collections.abc import AsyncGenerator
+from typing import Any
+
+import pytest
+import sub_agents.Recipe_Finder.agent as recipe_finder
+from google.adk.memory import InMemoryMemoryService
+from google.adk.models import LlmRequest, LlmResponse
+from google.adk.models.base_llm import BaseLlm
+from google.adk.runners import Runner
+from google.adk.sessions import InMemorySessionService
+from google.genai import types
+from pydantic import PrivateAttr
+from sub_agents.Final.agent import final_agent
+from sub_agents.User_Requirement.agent import user_requirement_agent
+
+from app.agent import root_agent
+
+SEARCH_RESULTS = [
+    {
+        "recipe_name": "Chicken Biryani",
+        "summary": "Spiced rice with chicken.",
+        "ingredients_preview": ["chicken", "rice"],
+        "cuisine": "Indian",
+    },
+    {
+        "recipe_name": "Satay Chicken",
+        "summary": "Chicken in peanut sauce.",
+        "ingredients_preview": ["chicken", "peanut butter"],
+        "cuisine": "Indian",
+    },
+]
+
+
+def _call(name: str, **args: Any) -> LlmResponse:
+    return LlmResponse(
+        content=types.Content(
+            role="model",
+            parts=[types.Part(function_call=types.FunctionCall(name=name, args=args))],
+        )
+    )
+
+
+class ScriptedLlm(BaseLlm):
+    """Returns its scripted responses in order, one per model call."""
+
+    _responses: list[LlmResponse] = PrivateAttr()
+
+    def __init__(self, *responses: LlmResponse) -> None:
+        super().__init__(model="scripted")
+        self._responses = list(responses)
+
+    @property
+    def calls_left(self) -> int:
+        return len(self._responses)
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        yield self._responses.pop(0)
+
+
+def _run_recipe_request(
+    monkeypatch: pytest.MonkeyPatch, requirements: dict[str, Any]
+) -> tuple[dict[str, Any], ScriptedLlm]:
+    """Run one recipe turn and return the session state and final_agent's model."""
+    final_model = ScriptedLlm(
+        LlmResponse(
+            content=types.Content(role="model", parts=[types.Part(text="Checked.")])
+        )
+    )
+    models = [
+        (
+            root_agent,
+            ScriptedLlm(
+                _call("transfer_to_agent", agent_name="user_requirement_agent")
+            ),
+        ),
+        (
+            user_requirement_agent,
+            ScriptedLlm(
+                _call("save_user_requirements", request_type="recipe", **requirements),
+                _call("transfer_to_agent", agent_name="recipe_finder_agent"),
+            ),
+        ),
+        (
+            recipe_finder.recipe_finder_agent,
+            ScriptedLlm(
+                # The search query leaves out the allergies
+                _call("google_search_tool", query='{"query": "chicken biryani"}'),
+                _call("transfer_to_agent", agent_name="final_agent"),
+            ),
+        ),
+        (final_agent, final_model),
+    ]
+    for agent, model in models:
+        monkeypatch.setattr(agent, "model", model)
+    monkeypatch.setattr(recipe_finder.recipe_index, "lookup", lambda **kwargs: [])
+    monkeypatch.setattr(recipe_finder.recipe_index, "add", lambda *args, **kwargs: None)
+    monkeypatch.setattr(
+        recipe_finder, "search_recipes_with_gemini", lambda **kwargs: SEARCH_RESULTS
+    )
+
+    async def run() -> dict[str, Any]:
+        runner = Runner(
+            app_name="app",
+            agent=root_agent,
+            session_service=InMemorySessionService(),
+            memory_service=InMemoryMemoryService(),
+        )
+        session = await runner.session_service.create_session(
+            app_name="app", user_id="u"
+        )
+        message = types.Content(
+            role="user", parts=[types.Part(text="I want a chicken biryani recipe")]
+        )
+        async for _ in runner.run_async(
+            user_id="u", session_id=session.id, new_message=message
+        ):
+            pass
+        stored = await runner.session_service.get_session(
+            app_name="app", user_id="u", session_id=session.id
+        )
+        assert stored is not None
+        return stored.state
+
+    state = asyncio.run(run())
+    for _, model in models:
+        if model is not final_model:
+            assert model.calls_left == 0
+    return state, final_model
+
+
+def test_stored_requirements_reach_final_validation(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    state, final_model = _run_recipe_request(monkeypatch, {"cuisine": "Indian"})
+    assert state["user_requirements"]["request_type"] == "recipe"
+    # Answered by the rule fast path, final_agent's model is never called
+    assert final_model.calls_left == 1
+    assert "**Chicken Biryani**" in state["final_output"]
+
+
+def test_stored_allergies_filter_the_search(monkeypatch: pytest.MonkeyPatch) -> None:
+    state, final_model = _run_recipe_request(monkeypatch, {"allergies": ["peanuts"]})
+    assert [recipe["recipe_name"] for recipe in state["recipes"]] == ["Chicken Biryani"]
+    assert [recipe["recipe_name"] for recipe in state["rejected_recipes"]] == [
+        "Satay Chicken"
+    ]
+    assert state["user_requirements"]["allergies"] == ["peanuts"]
+    # An ingredient preview cannot clear an allergy, so the model validates
+    assert final_model.calls_left == 0
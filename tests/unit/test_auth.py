@@ -0,0 +1,79 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from google.adk.sessions.state import State
+
+from app.utils.auth import TokenResolver
+
+
+class CountingState(State):
+    """State counting key reads and full scans."""
+
+    def __init__(self, value: dict) -> None:
+        super().__init__(value=value, delta={})
+        self.reads = 0
+        self.scans = 0
+
+    def to_dict(self) -> dict:
+        self.scans += 1
+        return super().to_dict()
+
+    def __contains__(self, key: str) -> bool:
+        self.reads += 1
+        return super().__contains__(key)
+
+
+def test_resolves_newest_suffix() -> None:
+    state = CountingState(
+        {
+            "temp:my_auth_001": "t0",
+            "temp:my_auth_001_2": "t2",
+            "temp:my_auth_001_10": "t10",
+            "temp:my_auth_0011": "other",
+            "user:name": "x",
+        }
+    )
+    assert TokenResolver().resolve(state, "my_auth_001") == "t10"
+
+
+def test_scan_sees_pending_delta() -> None:
+    state = State(value={"temp:my_auth_001": "t0"}, delta={"temp:my_auth_001_1": "t1"})
+    assert TokenResolver().resolve(state, "my_auth_001") == "t1"
+
+
+def test_indexed_lookup_does_not_scan_and_follows_reauthorization() -> None:
+    resolver = TokenResolver()
+    filler = {f"key_{i}": i for i in range(1000)}
+    state = CountingState({**filler, "temp:my_auth_001_1": "t1"})
+    assert resolver.resolve(state, "my_auth_001", "session-1") == "t1"
+
+    state.reads = state.scans = 0
+    assert resolver.resolve(state, "my_auth_001", "session-1") == "t1"
+    assert state.reads < 5 and state.scans == 0
+
+    state["temp:my_auth_001_2"] = "t2"
+    assert resolver.resolve(state, "my_auth_001", "session-1") == "t2"
+
+
+def test_reauthorization_of_unsuffixed_key_is_probed_from_1() -> None:
+    resolver = TokenResolver()
+    state = CountingState({"temp:my_auth_001": "t0"})
+    assert resolver.resolve(state, "my_auth_001", "session-1") == "t0"
+    state["temp:my_auth_001_1"] = "t1"
+    assert resolver.resolve(state, "my_auth_001", "session-1") == "t1"
+
+
+def test_missing_token() -> None:
+    state = CountingState({"temp:my_auth_001": 42})
+    assert TokenResolver().resolve(state, "my_auth_001", "session-1") is None
@@ -0,0 +1,81 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from sub_agents.Recipe_Finder.constraints import (
+    ConstraintFilter,
+    ingredient_mask,
+    load_requirements,
+)
+
+CANDIDATES = [
+    {"recipe_name": "Chicken Curry", "ingredients_preview": ["chicken", "onion"]},
+    {"recipe_name": "Paneer Tikka", "ingredients_preview": ["paneer", "yogurt"]},
+    {"recipe_name": "Satay Tofu", "ingredients_preview": ["tofu", "peanut butter"]},
+    {"recipe_name": "Kiwi Salad", "ingredients_preview": ["kiwis", "lettuce"]},
+]
+
+
+def _names(recipes: list[dict]) -> list[str]:
+    return [recipe["recipe_name"] for recipe in recipes]
+
+
+def test_allergies_map_to_categories() -> None:
+    accepted, rejected = ConstraintFilter().filter(CANDIDATES, allergies=["Nuts"])
+    assert _names(accepted) == ["Chicken Curry", "Paneer Tikka", "Kiwi Salad"]
+    assert rejected == [{"recipe_name": "Satay Tofu", "violations": ["peanut"]}]
+
+
+def test_phrases_override_single_words() -> None:
+    # "butter" in "peanut butter" is not dairy
+    accepted, _ = ConstraintFilter().filter(CANDIDATES, allergies=["dairy"])
+    assert _names(accepted) == ["Chicken Curry", "Satay Tofu", "Kiwi Salad"]
+    assert ingredient_mask("almond milk") == ingredient_mask("almonds")
+
+
+def test_diet_and_unknown_allergens() -> None:
+    accepted, rejected = ConstraintFilter().filter(
+        CANDIDATES, allergies=["kiwi"], diet="Vegan"
+    )
+    assert _names(accepted) == ["Satay Tofu"]
+    assert {"recipe_name": "Kiwi Salad", "violations": ["kiwi"]} in rejected
+
+
+def test_unknown_allergens_match_as_phrases() -> None:
+    recipes = [
+        {"recipe_name": "Fruit Salad", "ingredients_preview": ["mixed fruit", "mint"]},
+        {"recipe_name": "Green Bowl", "ingredients_preview": ["kiwi fruit", "spinach"]},
+    ]
+    accepted, rejected = ConstraintFilter().filter(recipes, allergies=["kiwi fruit"])
+    assert _names(accepted) == ["Fruit Salad"]
+    assert rejected == [{"recipe_name": "Green Bowl", "violations": ["kiwi fruit"]}]
+
+
+def test_allergens_beyond_the_spare_bits_still_reject() -> None:
+    allergies = [f"allergen{i}" for i in range(80)]
+    recipes = [{"recipe_name": "Dish", "ingredients_preview": ["allergen79"]}]
+    accepted, rejected = ConstraintFilter().filter(recipes, allergies=allergies)
+    assert accepted == []
+    assert "allergen79" in rejected[0]["violations"][0]
+
+
+def test_no_constraints_accepts_everything() -> None:
+    assert ConstraintFilter().filter(CANDIDATES) == (CANDIDATES, [])
+
+
+def test_load_requirements() -> None:
+    assert load_requirements('```json\n{"allergies": ["nuts"]}\n```') == {
+        "allergies": ["nuts"]
+    }
+    assert load_requirements("not json") == {}
+    assert load_requirements(None) == {}
@@ -0,0 +1,49 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import pytest
+from google.adk.agents import Agent
+from google.adk.agents.context_cache_config import ContextCacheConfig
+from google.adk.runners import InMemoryRunner
+
+from app.utils.context_cache import apply_context_cache, context_cache_config_from_env
+
+
+def test_config_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("PROMPT_CACHE_TTL_SECONDS", "600")
+    monkeypatch.setenv("PROMPT_CACHE_INTERVALS", "5")
+
+    config = context_cache_config_from_env()
+    assert config is not None
+    assert (config.ttl_seconds, config.cache_intervals, config.min_tokens) == (
+        600,
+        5,
+        4096,
+    )
+
+    monkeypatch.setenv("PROMPT_CACHE_ENABLED", "false")
+    assert context_cache_config_from_env() is None
+
+
+def test_cache_config_applied_to_runners() -> None:
+    runner = InMemoryRunner(agent=Agent(name="agent", model="gemini-2.5-flash"))
+    configured = ContextCacheConfig(ttl_seconds=60)
+    runner.context_cache_config = configured
+
+    apply_context_cache([None, runner], ContextCacheConfig())
+    assert runner.context_cache_config is configured
+
+    runner.context_cache_config = None
+    apply_context_cache([runner], context_cache_config_from_env())
+    assert runner.context_cache_config == ContextCacheConfig(min_tokens=4096)
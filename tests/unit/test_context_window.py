@@ -0,0 +1,158 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from types import SimpleNamespace
+from typing import Any, cast
+
+import pytest
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest
+from google.genai import types
+
+import app.utils.context_window as context_window
+from app.utils.context_window import (
+    SUMMARY_PREFIX,
+    ContextPolicy,
+    ContextWindowPlugin,
+    window_start,
+)
+
+
+def _text(role: str, text: str) -> types.Content:
+    return types.Content(role=role, parts=[types.Part(text=text)])
+
+
+def _first_text(content: types.Content) -> str:
+    assert content.parts and content.parts[0].text is not None
+    return content.parts[0].text
+
+
+def _callback_context() -> CallbackContext:
+    return cast(CallbackContext, SimpleNamespace(agent_name="root_agent", state={}))
+
+
+def _turns(count: int, with_tool: bool = False) -> list[types.Content]:
+    contents = []
+    for i in range(count):
+        contents.append(_text("user", f"question {i}"))
+        if with_tool:
+            contents.append(
+                types.Content(
+                    role="model",
+                    parts=[
+                        types.Part(
+                            function_call=types.FunctionCall(
+                                name="search", args={"q": i}
+                            )
+                        )
+                    ],
+                )
+            )
+            contents.append(
+                types.Content(
+                    role="user",
+                    parts=[
+                        types.Part(
+                            function_response=types.FunctionResponse(
+                                name="search", response={"r": i}
+                            )
+                        )
+                    ],
+                )
+            )
+        contents.append(_text("model", f"answer {i}"))
+    return contents
+
+
+def test_window_keeps_last_events_at_turn_boundary() -> None:
+    contents = _turns(10, with_tool=True)
+    cut = window_start(contents, ContextPolicy(max_events=9, max_tokens=None))
+    # 4 contents per turn: two whole turns fit
+    assert cut == len(contents) - 8
+    assert _first_text(contents[cut]) == "question 8"
+
+
+def test_window_token_budget_keeps_current_turn() -> None:
+    contents = [*_turns(5), _text("user", "x" * 4000)]
+    cut = window_start(contents, ContextPolicy(max_events=None, max_tokens=10))
+    assert cut == len(contents) - 1
+
+
+def test_plugin_folds_dropped_turns_into_rolling_summary() -> None:
+    plugin = ContextWindowPlugin(ContextPolicy(max_events=4, max_tokens=None))
+    context = _callback_context()
+
+    def run(turns: int) -> list[types.Content]:
+        request = LlmRequest(contents=_turns(turns))
+        asyncio.run(
+            plugin.before_model_callback(callback_context=context, llm_request=request)
+        )
+        return request.contents
+
+    first = run(3)
+    assert len(first) == 5
+    assert _first_text(first[0]).startswith(SUMMARY_PREFIX)
+    assert "- User: question 0" in _first_text(first[0])
+    assert context.state["context_summary:root_agent"]["covered"] == 2
+
+    second = run(6)
+    summary = _first_text(second[0])
+    assert summary.count("question 0") == 1
+    assert "- Assistant: answer 3" in summary
+    assert "question 4" not in summary
+    assert [_first_text(c) for c in second[1:]] == [
+        "question 4",
+        "answer 4",
+        "question 5",
+        "answer 5",
+    ]
+
+
+def test_short_history_is_untouched() -> None:
+    plugin = ContextWindowPlugin(ContextPolicy())
+    contents = _turns(3)
+    request = LlmRequest(contents=list(contents))
+    context = _callback_context()
+    asyncio.run(
+        plugin.before_model_callback(callback_context=context, llm_request=request)
+    )
+    assert request.contents == contents
+    assert context.state == {}
+
+
+def test_llm_summary_uses_the_shared_client(monkeypatch: pytest.MonkeyPatch) -> None:
+    calls = []
+
+    async def generate_content(**kwargs: Any) -> SimpleNamespace:
+        calls.append(kwargs)
+        return SimpleNamespace(text="User asked 2 questions.")
+
+    client = SimpleNamespace(
+        aio=SimpleNamespace(models=SimpleNamespace(generate_content=generate_content))
+    )
+    monkeypatch.setattr(context_window, "genai_client", lambda: client)
+    plugin = ContextWindowPlugin(
+        ContextPolicy(max_events=4, max_tokens=None, summary="llm")
+    )
+    request = LlmRequest(contents=_turns(3))
+    asyncio.run(
+        plugin.before_model_callback(
+            callback_context=_callback_context(), llm_request=request
+        )
+    )
+    assert len(calls) == 1
+    assert (
+        _first_text(request.contents[0]) == f"{SUMMARY_PREFIX}\nUser asked 2 questions."
+    )
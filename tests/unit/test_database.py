@@ -0,0 +1,143 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import time
+from collections.abc import Callable
+from pathlib import Path
+from typing import Any
+
+import pytest
+import sqlalchemy
+from google.adk.events import Event
+from google.adk.sessions import Session
+from google.genai import types
+
+from app.utils.database import (
+    DatabasePoolSettings,
+    PooledDatabaseSessionService,
+    database_url,
+    engine_kwargs,
+)
+
+
+def test_settings_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("DB_POOL_SIZE", "20")
+    monkeypatch.setenv("DB_POOL_PRE_PING", "False")
+    monkeypatch.setenv("DB_STATEMENT_TIMEOUT_MS", "5000")
+    settings = DatabasePoolSettings.from_env()
+    assert settings.pool_size == 20
+    assert settings.pool_pre_ping is False
+    assert settings.statement_timeout_ms == 5000
+    assert settings.max_overflow == 10
+
+
+def test_engine_kwargs_per_driver() -> None:
+    settings = DatabasePoolSettings(statement_timeout_ms=5000)
+    url = database_url("postgresql+pg8000://u:p@10.0.0.1/db")
+    assert url == "postgresql+asyncpg://u:p@10.0.0.1/db"
+    assert database_url("postgresql://u:p@10.0.0.1/db") == url
+    asyncpg = engine_kwargs(url, settings)
+    assert asyncpg["pool_size"] == 5
+    assert asyncpg["connect_args"] == {"server_settings": {"statement_timeout": "5000"}}
+    assert engine_kwargs("sqlite+aiosqlite:///:memory:", settings) == {
+        "pool_pre_ping": True
+    }
+
+
+def test_service_connects_to_postgres_with_asyncpg() -> None:
+    # Builds the async engine without connecting
+    service = PooledDatabaseSessionService("postgresql+pg8000://u:p@127.0.0.1/db")
+    assert service.db_engine.url.drivername == "postgresql+asyncpg"
+
+
+def _percentile(samples: list[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def test_sqlite_concurrent_turns(
+    tmp_path: Path, record_property: Callable[[str, object], None]
+) -> None:
+    """Concurrent turns share the pooled engine without exceeding its bounds.
+
+    Read and write latencies are reported (p50/p95) but not asserted on.
+    """
+    pool_settings = DatabasePoolSettings(
+        pool_size=2, max_overflow=2, statement_timeout_ms=5000
+    )
+    service = PooledDatabaseSessionService(
+        f"sqlite:///{tmp_path / 'sessions.db'}", pool_settings=pool_settings
+    )
+    pool = service.db_engine.sync_engine.pool
+    checked_out = [0, 0]  # current, peak
+    latencies: dict[str, list[float]] = {"read": [], "write": []}
+
+    @sqlalchemy.event.listens_for(pool, "checkout")
+    def on_checkout(*args: Any) -> None:
+        checked_out[0] += 1
+        checked_out[1] = max(checked_out)
+
+    @sqlalchemy.event.listens_for(pool, "checkin")
+    def on_checkin(*args: Any) -> None:
+        checked_out[0] -= 1
+
+    sessions_count, turns = 8, 5
+
+    async def run_session(session: Session) -> None:
+        for turn in range(turns):
+            start = time.perf_counter()
+            session = await service.get_session(
+                app_name="app", user_id=session.user_id, session_id=session.id
+            )
+            latencies["read"].append(time.perf_counter() - start)
+            start = time.perf_counter()
+            await service.append_event(
+                session,
+                Event(
+                    author="user",
+                    invocation_id=f"turn-{turn}",
+                    content=types.Content(
+                        role="user", parts=[types.Part(text=f"turn {turn}")]
+                    ),
+                ),
+            )
+            latencies["write"].append(time.perf_counter() - start)
+
+    async def run() -> None:
+        # Sessions are created up front: the turns are what run concurrently
+        sessions = [
+            await service.create_session(app_name="app", user_id=f"user-{i}")
+            for i in range(sessions_count)
+        ]
+        await asyncio.gather(*(run_session(session) for session in sessions))
+        for i in range(sessions_count):
+            listed = await service.list_sessions(app_name="app", user_id=f"user-{i}")
+            session = await service.get_session(
+                app_name="app", user_id=f"user-{i}", session_id=listed.sessions[0].id
+            )
+            assert [event.invocation_id for event in session.events] == [
+                f"turn-{turn}" for turn in range(turns)
+            ]
+        assert checked_out[0] == 0
+        await service.db_engine.dispose()
+
+    asyncio.run(run())
+    assert 1 < checked_out[1] <= pool_settings.pool_size + pool_settings.max_overflow
+    for kind, samples in latencies.items():
+        assert len(samples) == sessions_count * turns
+        p50, p95 = _percentile(samples, 0.5) * 1000, _percentile(samples, 0.95) * 1000
+        record_property(f"sqlite_{kind}_p50_ms", round(p50, 1))
+        record_property(f"sqlite_{kind}_p95_ms", round(p95, 1))
+        print(f"sqlite {kind} latency p50={p50:.1f}ms p95={p95:.1f}ms")
@@ -0,0 +1,183 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import datetime
+import gc
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+
+from app.utils import drive
+from app.utils.drive import (
+    DriveServiceCache,
+    UserUploadLimiter,
+    upload_bytes,
+    upload_many,
+)
+
+
+class FakeCreateRequest:
+    """Mimics the HttpRequest returned by `files().create(...)`."""
+
+    def __init__(self, media: Any) -> None:
+        self.media = media
+        self.offset = 0
+        self.chunks: list[bytes] = []
+
+    def execute(self, http: Any = None) -> dict[str, str]:
+        self.chunks.append(self.media.getbytes(0, self.media.size()))
+        return {"id": "file-1", "name": "plan.txt"}
+
+    def next_chunk(self, http: Any = None) -> tuple[Any, dict[str, str] | None]:
+        chunk = self.media.getbytes(self.offset, self.media.chunksize())
+        self.chunks.append(chunk)
+        self.offset += len(chunk)
+        if self.offset >= self.media.size():
+            return None, {"id": "file-1", "name": "plan.txt"}
+        return SimpleNamespace(
+            resumable_progress=self.offset, total_size=self.media.size()
+        ), None
+
+
+class FakeDriveService:
+    def __init__(self) -> None:
+        self.requests: list[FakeCreateRequest] = []
+
+    def files(self) -> "FakeDriveService":
+        return self
+
+    def create(self, *, body: dict, media_body: Any, fields: str) -> FakeCreateRequest:
+        self.requests.append(FakeCreateRequest(media_body))
+        return self.requests[-1]
+
+
+def test_small_payload_single_request_from_memory() -> None:
+    service = FakeDriveService()
+    result = upload_bytes(service, "plan.txt", b"hello", resumable_threshold=1024)
+    assert result["id"] == "file-1"
+    request = service.requests[0]
+    assert not request.media.resumable()
+    assert request.chunks == [b"hello"]
+
+
+def test_large_payload_uses_resumable_chunks_with_progress() -> None:
+    service = FakeDriveService()
+    data = b"x" * (256 * 1024 * 2 + 10)
+    progress: list[tuple[int, int]] = []
+    upload_bytes(
+        service,
+        "plan.txt",
+        data,
+        resumable_threshold=1024,
+        chunk_size=256 * 1024,
+        on_progress=lambda done, total: progress.append((done, total)),
+    )
+    request = service.requests[0]
+    assert request.media.resumable()
+    assert b"".join(request.chunks) == data
+    assert len(request.chunks) == 3
+    assert progress[-1] == (len(data), len(data))
+    assert [done for done, _ in progress] == sorted(done for done, _ in progress)
+
+
+def test_service_cache_reuses_service_per_token() -> None:
+    cache = DriveServiceCache(max_entries=2)
+    service = cache.get("token-a")
+    assert cache.get("token-a") is service
+    assert cache.get("token-b") is not service
+    assert service.files() is not None
+
+    cache.get("token-c")
+    assert len(cache) == 2
+    assert cache.get("token-a") is not service
+
+
+def test_service_cache_expires_with_token() -> None:
+    cache = DriveServiceCache()
+    expired = datetime.datetime.utcnow() - datetime.timedelta(seconds=1)
+    service = cache.get("token-a", expiry=expired)
+    assert cache.get("token-a") is not service
+
+
+class SlowDriveService:
+    """Fake service recording how many uploads run at the same time."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.active = self.peak = 0
+        self.transports: set[int] = set()
+
+    def files(self) -> "SlowDriveService":
+        return self
+
+    def create(self, *, body: dict, media_body: Any, fields: str) -> Any:
+        service = self
+
+        class Request:
+            def execute(self, http: Any = None) -> dict[str, str]:
+                with service.lock:
+                    service.active += 1
+                    service.peak = max(service.peak, service.active)
+                    service.transports.add(id(http))
+                # Larger files take longer, so they complete last
+                time.sleep(0.01 * media_body.size())
+                with service.lock:
+                    service.active -= 1
+                if body["name"] == "broken.txt":
+                    raise RuntimeError("quota exceeded")
+                return {"id": f"id-{body['name']}", "name": body["name"]}
+
+        return Request()
+
+
+def test_upload_many_bounds_concurrency_and_yields_as_completed(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    service = SlowDriveService()
+    cache = DriveServiceCache()
+    limiter = UserUploadLimiter(2)
+    monkeypatch.setattr(cache, "get", lambda access_token, expiry=None: service)
+    monkeypatch.setattr(drive, "drive_services", cache)
+    monkeypatch.setattr(drive, "upload_limiter", limiter)
+    files = [
+        ("c.txt", b"c" * 8),
+        ("broken.txt", b"x"),
+        ("a.txt", b"a"),
+        ("b.txt", b"bb"),
+    ]
+
+    async def collect() -> list[dict[str, Any]]:
+        results = [result async for result in upload_many("token", files, "user-1")]
+        # Idle users hold no semaphore
+        assert limiter._semaphores[asyncio.get_running_loop()] == {}
+        return results
+
+    results = asyncio.run(collect())
+    # Nor do finished event loops
+    gc.collect()
+    assert len(limiter._semaphores) == 0
+    assert service.peak == 2
+    assert len(service.transports) == 2
+    assert results[-1] == {"id": "id-c.txt", "name": "c.txt"}
+    assert {"name": "broken.txt", "error": "quota exceeded"} in results
+    assert sorted(r["name"] for r in results) == [
+        "a.txt",
+        "b.txt",
+        "broken.txt",
+        "c.txt",
+    ]
@@ -0,0 +1,116 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+from typing import Any
+
+import pytest
+
+from app.utils.feedback import FeedbackAggregates, FeedbackPipeline
+from app.utils.metrics import metrics
+from app.utils.typing import Feedback
+
+
+class FakeLogger:
+    """In-memory stand-in for a google.cloud.logging Logger."""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False) -> None:
+        self.delay = delay
+        self.fail = fail
+        self.commits: list[list[dict[str, Any]]] = []
+        self.lock = threading.Lock()
+
+    def batch(self) -> "FakeBatch":
+        return FakeBatch(self)
+
+
+class FakeBatch:
+    def __init__(self, logger: FakeLogger) -> None:
+        self.logger = logger
+        self.entries: list[dict[str, Any]] = []
+
+    def __enter__(self) -> "FakeBatch":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        time.sleep(self.logger.delay)
+        if self.logger.fail:
+            raise ConnectionError("unavailable")
+        with self.logger.lock:
+            self.logger.commits.append(self.entries)
+
+    def log_struct(self, info: dict[str, Any], **kwargs: Any) -> None:
+        self.entries.append(info)
+
+
+def _feedback(
+    score: float, agent: str = "root_agent", invocation: str = "inv-1"
+) -> Feedback:
+    return Feedback(score=score, invocation_id=invocation, agent_name=agent)
+
+
+def test_submit_does_not_wait_for_cloud_logging() -> None:
+    logger = FakeLogger(delay=0.2)
+    pipeline = FeedbackPipeline(logger, batch_size=50, flush_interval=0.05)
+
+    start = time.perf_counter()
+    for i in range(120):
+        pipeline.submit(_feedback(5, invocation=f"inv-{i}"))
+    assert time.perf_counter() - start < 0.1
+
+    assert pipeline.flush(timeout=5)
+    assert sum(len(commit) for commit in logger.commits) == 120
+    assert len(logger.commits) < 120
+    assert all(len(commit) <= 50 for commit in logger.commits)
+
+
+def test_failed_batches_are_counted_as_dropped() -> None:
+    dropped = metrics.counter("feedback.dropped")
+    pipeline = FeedbackPipeline(FakeLogger(fail=True), flush_interval=0.01)
+    pipeline.submit(_feedback(1))
+    assert pipeline.flush(timeout=5)
+    assert metrics.counter("feedback.dropped") == dropped + 1
+    assert pipeline.aggregates.summary()["groups"]["root_agent"]["count"] == 1
+
+
+def test_rolling_aggregates() -> None:
+    now = [1_000.0]
+    aggregates = FeedbackAggregates(
+        window_seconds=60, retained_windows=2, clock=lambda: now[0]
+    )
+    aggregates.add(_feedback(1, invocation="old"))
+    now[0] += 60
+    aggregates.add(_feedback(5, agent="final_agent"))
+    aggregates.add(_feedback(4, agent="final_agent"))
+    aggregates.add(_feedback(5))
+
+    by_agent = aggregates.summary("agent")["groups"]
+    assert by_agent["final_agent"] == {
+        "count": 2,
+        "mean": 4.5,
+        "histogram": {"5": 1, "4": 1},
+    }
+    assert by_agent["root_agent"]["histogram"] == {"1": 1, "5": 1}
+    assert set(aggregates.summary("invocation", last_seconds=30)["groups"]) == {"inv-1"}
+    assert [g["count"] for g in aggregates.summary("window")["groups"].values()] == [
+        1,
+        3,
+    ]
+
+    now[0] += 60
+    aggregates.add(_feedback(3))
+    assert "old" not in aggregates.summary("invocation")["groups"]
+    with pytest.raises(ValueError):
+        aggregates.summary("user")  # type: ignore[arg-type]
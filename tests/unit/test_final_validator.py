@@ -0,0 +1,192 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+from types import SimpleNamespace
+
+from google.adk.sessions.state import State
+from google.genai import types
+from sub_agents.Final.validator import (
+    fast_path_validation,
+    is_english,
+    parse_protein_goal,
+    validate_final_output,
+)
+
+from app.utils.metrics import metrics
+
+RECIPES = [
+    {
+        "recipe_name": "Chicken Biryani",
+        "summary": "Spiced rice with chicken.",
+        "ingredients_preview": ["chicken", "rice"],
+        "cuisine": "Indian",
+    }
+]
+
+
+def _plan(*proteins: float) -> dict:
+    meals = [
+        {"meal": "Lunch", "name": f"Meal {i}", "calories": 500, "protein_g": p}
+        for i, p in enumerate(proteins)
+    ]
+    return {"days": [{"day": "Monday", "meals": meals}]}
+
+
+def _recipe_request(**requirements: object) -> dict:
+    return {"request_type": "recipe", **requirements}
+
+
+def _plan_request(**requirements: object) -> dict:
+    return {"request_type": "dietary_plan", **requirements}
+
+
+def test_parse_protein_goal() -> None:
+    assert parse_protein_goal("20g per meal") == (20.0, "meal")
+    assert parse_protein_goal("100 grams/day") == (100.0, "day")
+    assert parse_protein_goal("high") is None
+
+
+def test_valid_recipes_are_formatted() -> None:
+    verdict = validate_final_output(
+        {"recipes": RECIPES, "user_requirements": _recipe_request(cuisine="indian")}
+    )
+    assert verdict.status == "valid"
+    assert "**Chicken Biryani**" in verdict.message
+    assert "- **Ingredients**: chicken, rice" in verdict.message
+
+
+def test_structured_violations_are_rejected() -> None:
+    allergy = validate_final_output(
+        {
+            "recipes": RECIPES,
+            "user_requirements": _recipe_request(diet_type="vegetarian"),
+        }
+    )
+    assert allergy.status == "invalid"
+    cuisine = validate_final_output(
+        {"recipes": RECIPES, "user_requirements": _recipe_request(cuisine="Italian")}
+    )
+    assert cuisine.status == "invalid"
+    protein = validate_final_output(
+        {
+            "meal_plan": _plan(25, 15),
+            "user_requirements": _plan_request(protein_goal="20g per meal"),
+        }
+    )
+    assert (
+        protein.message == "The plan does not meet your protein goal of 20g per meal."
+    )
+    daily = validate_final_output(
+        {
+            "meal_plan": _plan(25, 15),
+            "user_requirements": _plan_request(protein_goal="30g per day"),
+        }
+    )
+    assert daily.status == "valid"
+    assert "**Total**: 1000 kcal, 40g protein" in daily.message
+
+
+def test_output_is_chosen_by_request_type() -> None:
+    state = {
+        "recipes": RECIPES,
+        "meal_plan": _plan(25),
+        "user_requirements": _recipe_request(),
+    }
+    assert "**Chicken Biryani**" in validate_final_output(state).message
+    state["user_requirements"] = _plan_request()
+    assert "**Monday**" in validate_final_output(state).message
+
+
+def test_stale_output_is_left_to_the_model() -> None:
+    state = {
+        "meal_plan": _plan(25),
+        "user_requirements": _plan_request(),
+        "finder_invocation_id": "old",
+    }
+    assert validate_final_output(state, "new").status == "needs_llm"
+    assert validate_final_output(state, "old").status == "valid"
+
+
+def test_empty_or_errored_output_is_not_valid() -> None:
+    failed = validate_final_output(
+        {
+            "meal_plan": {"days": []},
+            "finder_error": "Monday: timeout",
+            "user_requirements": _plan_request(),
+        }
+    )
+    assert failed == ("invalid", "Final validation failed: Monday: timeout.")
+    partial = validate_final_output(
+        {
+            "meal_plan": _plan(25),
+            "finder_error": "Tuesday: timeout",
+            "user_requirements": _plan_request(),
+        }
+    )
+    assert partial.status == "needs_llm"
+    assert (
+        validate_final_output(
+            {"recipes": [], "user_requirements": _recipe_request()}
+        ).status
+        == "needs_llm"
+    )
+
+
+def test_free_text_judgment_falls_back_to_llm() -> None:
+    for state in (
+        {},
+        {"recipes": RECIPES},
+        {
+            "recipes": RECIPES,
+            "user_requirements": _recipe_request(conditions=["diabetes"]),
+        },
+        {"recipes": RECIPES, "user_requirements": _recipe_request(protein_goal="high")},
+        # A recipe preview cannot show that a recipe is allergy-safe
+        {"recipes": RECIPES, "user_requirements": _recipe_request(allergies=["nuts"])},
+        {"meal_plan": "Monday: oatmeal", "user_requirements": _plan_request()},
+    ):
+        assert validate_final_output(state).status == "needs_llm"
+
+
+def test_is_english() -> None:
+    assert is_english("Give me a chicken curry recipe")
+    assert not is_english("닭고기 카레 레시피 알려줘")
+    assert not is_english("")
+
+
+def _callback_context(state: dict, text: str) -> SimpleNamespace:
+    return SimpleNamespace(
+        state=State(state, {}),
+        invocation_id="inv-1",
+        user_content=types.Content(role="user", parts=[types.Part(text=text)]),
+    )
+
+
+def test_callback_counts_fast_path() -> None:
+    metrics.reset()
+    state: dict = {
+        "recipes": RECIPES,
+        "user_requirements": _recipe_request(),
+        "finder_invocation_id": "inv-1",
+    }
+    context = _callback_context(state, "Chicken biryani recipe please")
+    content = fast_path_validation(context)
+    assert (
+        content is not None and context.state["final_output"] == content.parts[0].text
+    )
+    assert (
+        fast_path_validation(_callback_context(state, "치킨 비리야니 레시피")) is None
+    )
+    assert metrics.counter("final_validation.fast_path") == 1
+    assert metrics.counter("final_validation.llm") == 1
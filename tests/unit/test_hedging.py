@@ -0,0 +1,85 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import itertools
+import threading
+import time
+
+import pytest
+
+from app.utils.hedging import Hedger
+from app.utils.metrics import metrics
+
+
+class SlowFirstCall:
+    """Fake search whose calls take the given latencies in turn."""
+
+    def __init__(self, *latencies: float, fail_first: bool = False) -> None:
+        self.latencies = itertools.chain(latencies, itertools.repeat(0.0))
+        self.fail_first = fail_first
+        self.calls = 0
+        self.lock = threading.Lock()
+
+    def __call__(self) -> str:
+        with self.lock:
+            self.calls += 1
+            call, latency = self.calls, next(self.latencies)
+        time.sleep(latency)
+        if call == 1 and self.fail_first:
+            raise ConnectionError("reset")
+        return f"call-{call}"
+
+
+def test_fast_primary_is_not_hedged() -> None:
+    hedger = Hedger("test_fast", default_delay=0.1)
+    search = SlowFirstCall(0.0)
+    assert hedger.call(search) == "call-1"
+    assert search.calls == 1
+
+
+def test_slow_primary_is_hedged_and_hedge_wins() -> None:
+    hedger = Hedger("test_slow", default_delay=0.02)
+    hedge_returned = threading.Event()
+    calls = itertools.count(1)
+
+    def search() -> str:
+        if next(calls) == 1:
+            # The primary is stuck until the hedge has answered
+            hedge_returned.wait(timeout=5)
+            return "primary"
+        return "hedge"
+
+    result = hedger.call(search)
+    hedge_returned.set()
+    assert result == "hedge"
+    assert metrics.counter("hedge.test_slow.won") == 1
+    assert metrics.snapshot()["gauges"]["hedge.test_slow.win_rate"] == 1
+
+
+def test_failed_request_falls_back_to_the_other() -> None:
+    hedger = Hedger("test_error", default_delay=0.01)
+    assert hedger.call(SlowFirstCall(0.05, 0.2, fail_first=True)) == "call-2"
+    with pytest.raises(ConnectionError):
+        Hedger("test_error_only", default_delay=1).call(
+            SlowFirstCall(0.0, fail_first=True)
+        )
+
+
+def test_budget_caps_extra_requests() -> None:
+    hedger = Hedger("test_budget", default_delay=0.01, budget_ratio=0.0, max_budget=1)
+    searches = [SlowFirstCall(0.05, 0.0) for _ in range(3)]
+    for search in searches:
+        hedger.call(search)
+    assert [search.calls for search in searches] == [2, 1, 1]
+    assert metrics.counter("hedge.test_budget.budget_exhausted") == 2
@@ -0,0 +1,189 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+import sub_agents.Recipe_Finder.meal_plan as meal_plan
+from sub_agents.Final.validator import validate_final_output
+
+REQUIREMENTS = {
+    "request_type": "dietary_plan",
+    "allergies": ["peanut"],
+    "protein_goal": "25g per meal",
+    "calorie_goal": "1800 kcal",
+}
+
+
+class FakeDayGenerator:
+    """Stands in for the model: slow, counts concurrency, and puts peanuts in
+    the first Wednesday it is asked for."""
+
+    def __init__(self) -> None:
+        self.lock = threading.Lock()
+        self.running = self.max_running = 0
+        self.calls: list[tuple[str, str | None]] = []
+
+    def __call__(
+        self,
+        day: str,
+        index: int,
+        total: int,
+        requirements: dict[str, Any],
+        feedback: str | None = None,
+    ) -> dict[str, Any]:
+        with self.lock:
+            self.calls.append((day, feedback))
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+            first_wednesday = day == "Wednesday" and feedback is None
+        time.sleep(0.02)
+        with self.lock:
+            self.running -= 1
+        lunch = "peanut noodles" if first_wednesday else "lentil curry"
+        return {
+            "day": day,
+            "meals": [
+                {
+                    "meal": "Breakfast",
+                    "name": "tofu scramble",
+                    "ingredients": ["tofu"],
+                    "calories": 500,
+                    "protein_g": 25,
+                },
+                {
+                    "meal": "Lunch",
+                    "name": lunch,
+                    "ingredients": [lunch],
+                    "calories": 600,
+                    "protein_g": 30,
+                },
+                {
+                    "meal": "Dinner",
+                    "name": "grilled chicken",
+                    "ingredients": ["chicken"],
+                    "calories": 700,
+                    "protein_g": 40,
+                },
+            ],
+        }
+
+
+@pytest.fixture
+def generator(monkeypatch: pytest.MonkeyPatch) -> FakeDayGenerator:
+    fake = FakeDayGenerator()
+    monkeypatch.setattr(meal_plan, "generate_day", fake)
+    return fake
+
+
+def test_days_are_generated_concurrently_with_a_bound(
+    generator: FakeDayGenerator,
+) -> None:
+    planner = meal_plan.MealPlanner(concurrency=3)
+    plan, errors = asyncio.run(planner.plan(REQUIREMENTS, 7))
+
+    assert errors == []
+    assert [day["day"] for day in plan["days"]] == list(meal_plan.WEEKDAYS)
+    assert generator.max_running == 3
+    assert (
+        validate_final_output(
+            {"meal_plan": plan, "user_requirements": REQUIREMENTS}
+        ).status
+        == "valid"
+    )
+
+
+def test_day_breaking_a_constraint_is_regenerated_with_feedback(
+    generator: FakeDayGenerator,
+) -> None:
+    plan, _ = asyncio.run(meal_plan.MealPlanner().plan(REQUIREMENTS, 7))
+
+    wednesday = [feedback for day, feedback in generator.calls if day == "Wednesday"]
+    assert wednesday[0] is None
+    assert wednesday[1] is not None and "peanut noodles" in wednesday[1]
+    assert plan["days"][2]["meals"][1]["name"] == "lentil curry"
+
+
+@pytest.mark.parametrize(
+    "extra", [{"conditions": ["diabetes"]}, {"protein_goal": "high"}]
+)
+def test_allergies_are_checked_when_the_validator_defers(extra: dict[str, Any]) -> None:
+    day = {
+        "day": "Monday",
+        "meals": [
+            {
+                "meal": "Lunch",
+                "name": "satay",
+                "ingredients": ["peanut sauce"],
+                "calories": 1800,
+            }
+        ],
+    }
+    requirements = {**REQUIREMENTS, **extra}
+
+    assert (
+        validate_final_output(
+            {"meal_plan": {"days": [day]}, "user_requirements": requirements}
+        ).status
+        == "needs_llm"
+    )
+    assert "satay" in (meal_plan.check_day(day, requirements, 0.15) or "")
+
+
+def test_days_out_of_constraints_are_reported(generator: FakeDayGenerator) -> None:
+    requirements = {**REQUIREMENTS, "calorie_goal": 1200}
+    tool_context = SimpleNamespace(
+        state={"user_requirements": requirements}, invocation_id="inv-1"
+    )
+    plan = asyncio.run(meal_plan.generate_meal_plan(tool_context, days=2))
+
+    assert plan["days"] == [] and tool_context.state["meal_plan"] == {"days": []}
+    assert plan["error"] == tool_context.state["finder_error"]
+    assert plan["error"].startswith("No day could be planned")
+    assert "1800 kcal instead of about 1200 kcal" in plan["error"]
+
+
+def test_requirements_are_taken_from_the_tool_arguments(
+    generator: FakeDayGenerator,
+) -> None:
+    tool_context = SimpleNamespace(
+        state={"finder_error": "stale"}, invocation_id="inv-1"
+    )
+    plan = asyncio.run(
+        meal_plan.generate_meal_plan(
+            tool_context,
+            days=1,
+            calorie_goal=1800,
+            allergies=["peanut"],
+            diet_type=None,
+        )
+    )
+
+    assert "error" not in plan and tool_context.state["finder_error"] is None
+    assert tool_context.state["user_requirements"] == {
+        "calorie_goal": 1800,
+        "allergies": ["peanut"],
+        "request_type": "dietary_plan",
+    }
+    assert validate_final_output(tool_context.state, "inv-1").status == "valid"
+
+
+def test_day_labels() -> None:
+    assert meal_plan.day_labels(1) == ["Day 1"]
+    assert meal_plan.day_labels(7)[0] == "Monday"
+    assert len(meal_plan.day_labels(30)) == meal_plan.MAX_DAYS
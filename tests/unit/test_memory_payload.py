@@ -0,0 +1,127 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+
+from google.adk.events import Event
+from google.genai import types
+
+from app.utils.memory_payload import CompactionPolicy, compact_events
+from app.utils.metrics import metrics
+
+
+def _event(
+    author: str, *parts: types.Part, invocation: str = "inv-1", partial: bool = False
+) -> Event:
+    role = "user" if author == "user" else "model"
+    return Event(
+        author=author,
+        invocation_id=invocation,
+        partial=partial,
+        content=types.Content(role=role, parts=list(parts)),
+    )
+
+
+RECIPES = json.dumps(
+    [{"recipe_name": f"Recipe {i}", "summary": "x" * 200} for i in range(10)]
+)
+
+
+def _turn(invocation: str, question: str) -> list[Event]:
+    return [
+        _event("user", types.Part(text=question), invocation=invocation),
+        _event(
+            "root_agent",
+            types.Part(
+                function_call=types.FunctionCall(
+                    name="transfer_to_agent", args={"agent_name": "recipe_finder_agent"}
+                )
+            ),
+            invocation=invocation,
+        ),
+        _event(
+            "recipe_finder_agent",
+            types.Part(text="Searching...", thought=True),
+            types.Part(
+                function_call=types.FunctionCall(
+                    name="google_search_tool", args={"query": question}
+                )
+            ),
+            invocation=invocation,
+        ),
+        _event(
+            "recipe_finder_agent",
+            types.Part(
+                function_response=types.FunctionResponse(
+                    name="google_search_tool", response={"result": RECIPES}
+                )
+            ),
+            invocation=invocation,
+        ),
+        _event("recipe_finder_agent", types.Part(text=RECIPES), invocation=invocation),
+        _event(
+            "final_agent", types.Part(text="Here"), invocation=invocation, partial=True
+        ),
+        _event(
+            "final_agent",
+            types.Part(text="Here is your   vegan curry recipe."),
+            invocation=invocation,
+        ),
+    ]
+
+
+def test_only_user_messages_and_final_answers_are_sent() -> None:
+    saved = metrics.counter("memory_payload.bytes_saved")
+    payload = compact_events(_turn("inv-1", "I'm vegan, give me a curry recipe"))
+
+    assert payload == [
+        {
+            "content": {
+                "role": "user",
+                "parts": [{"text": "I'm vegan, give me a curry recipe"}],
+            }
+        },
+        {
+            "content": {
+                "role": "model",
+                "parts": [{"text": "Here is your vegan curry recipe."}],
+            }
+        },
+    ]
+    assert metrics.counter("memory_payload.bytes_saved") - saved > 2 * len(RECIPES)
+
+
+def test_long_texts_are_truncated_and_repeats_sent_once() -> None:
+    events = _turn("inv-1", "hello") + _turn("inv-2", "hello")
+    events.append(_event("root_agent", types.Part(text="y" * 5000), invocation="inv-3"))
+    payload = compact_events(events, CompactionPolicy(max_model_chars=100))
+
+    texts = [p["content"]["parts"][0]["text"] for p in payload]
+    assert texts[:2] == ["hello", "Here is your vegan curry recipe."]
+    assert len(texts) == 3
+    assert texts[2] == "y" * 97 + "..."
+
+
+def test_payload_is_capped_keeping_recent_events() -> None:
+    events = [
+        _event(
+            "user", types.Part(text=f"message {i} " + "z" * 100), invocation=f"inv-{i}"
+        )
+        for i in range(50)
+    ]
+    payload = compact_events(events, CompactionPolicy(max_bytes=1000))
+
+    assert len(json.dumps(payload).encode()) <= 1000 + 2 * len(payload)
+    assert payload[-1]["content"]["parts"][0]["text"].startswith("message 49")
+    assert len(payload) < 50
@@ -0,0 +1,77 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+from pathlib import Path
+from types import SimpleNamespace
+from typing import cast
+
+import pytest
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.models import LlmRequest, LlmResponse
+from google.genai import types
+
+from app.utils.models import (
+    EscalateModel,
+    agent_model_kwargs,
+    get_model_settings,
+    record_confidence,
+)
+
+
+def test_defaults_use_fast_tier_for_routing() -> None:
+    settings = get_model_settings("root_agent")
+    assert settings.model == "gemini-2.5-flash-lite"
+    assert settings.thinking_budget == 0
+    assert settings.escalation_model == "gemini-2.5-flash"
+    assert get_model_settings("final_agent").model == "gemini-2.5-flash"
+
+
+def test_config_file_and_env_overrides(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    config = tmp_path / "models.json"
+    config.write_text(
+        json.dumps({"final_agent": {"model": "pro", "max_output_tokens": 512}})
+    )
+    monkeypatch.setenv("MODEL_CONFIG_FILE", str(config))
+    monkeypatch.setenv("MODEL_TIER_PRO", "gemini-custom-pro")
+    monkeypatch.setenv("FINAL_AGENT_THINKING_BUDGET", "256")
+    monkeypatch.setenv("FINAL_AGENT_MODEL", "")
+    settings = get_model_settings("final_agent")
+    assert settings.model == "gemini-custom-pro"
+    assert settings.max_output_tokens == 512
+    assert settings.thinking_budget == 256
+    kwargs = agent_model_kwargs("final_agent")
+    assert kwargs["generate_content_config"].max_output_tokens == 512
+    assert kwargs["planner"].thinking_config.thinking_budget == 256
+
+
+def test_low_confidence_response_escalates_following_calls() -> None:
+    context = cast(CallbackContext, SimpleNamespace(state={}, agent_name="root_agent"))
+    callback = EscalateModel(get_model_settings("root_agent"))
+    request = LlmRequest(model="gemini-2.5-flash-lite")
+
+    confident = LlmResponse(
+        content=types.Content(role="model", parts=[types.Part(text="Sure")]),
+        avg_logprobs=-0.1,
+    )
+    record_confidence(context, confident)
+    callback(context, request)
+    assert request.model == "gemini-2.5-flash-lite"
+
+    unsure = confident.model_copy(update={"avg_logprobs": -2.5})
+    record_confidence(context, unsure)
+    callback(context, request)
+    assert request.model == "gemini-2.5-flash"
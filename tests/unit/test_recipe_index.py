@@ -0,0 +1,143 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import json
+import threading
+from pathlib import Path
+from typing import Any
+
+from sub_agents.Recipe_Finder.recipe_index import RecipeIndex
+
+RECIPES = [
+    {
+        "recipe_name": "Chicken Biryani",
+        "summary": "Fragrant Indian rice dish with spiced chicken.",
+        "ingredients_preview": ["chicken", "basmati rice", "yogurt", "onions"],
+    },
+    {
+        "recipe_name": "Vegetable Biryani",
+        "summary": "Layered rice with mixed vegetables and spices.",
+        "ingredients_preview": ["basmati rice", "carrots", "peas", "cashews"],
+    },
+    {
+        "recipe_name": "Paneer Biryani",
+        "summary": "Biryani with paneer cubes and saffron rice.",
+        "ingredients_preview": ["paneer", "basmati rice", "saffron"],
+    },
+]
+
+
+def _index(
+    path: Path | None = None, intolerances: list[str] | None = None
+) -> RecipeIndex:
+    index = RecipeIndex(path=str(path) if path else None)
+    for recipe in RECIPES:
+        index.add(
+            recipe,
+            cuisine="Indian",
+            diet_tags=["vegetarian"],
+            intolerances=intolerances,
+        )
+    return index
+
+
+def test_search_ranks_by_similarity() -> None:
+    hits = _index().search("easy chicken biryani recipe", max_results=3)
+    assert hits[0][0]["recipe_name"] == "Chicken Biryani"
+    assert hits[0][1] == 1.0
+    assert hits[0][1] > hits[-1][1]
+
+
+def test_intolerances_cuisine_and_diet_are_filters() -> None:
+    index = _index(intolerances=["cashews", "peanuts"])
+    names = [
+        r["recipe_name"] for r, _ in index.search("biryani", intolerances=["cashew"])
+    ]
+    assert "Vegetable Biryani" not in names
+    assert len(index.search("biryani", intolerances=["Peanut"])) == 3
+    assert index.search("biryani", cuisine="Italian") == []
+    assert index.search("biryani", diet="vegan") == []
+
+
+def test_intolerances_must_be_covered_by_the_original_search() -> None:
+    index = _index()
+    # Found without excluding peanuts: the preview cannot rule them out
+    assert index.search("biryani", intolerances=["peanuts"]) == []
+    index.add(
+        {
+            "recipe_name": "Mushroom Biryani",
+            "ingredients_preview": ["mushrooms", "rice"],
+        },
+        intolerances=["peanuts", "shellfish"],
+    )
+    hits = index.search("biryani", intolerances=["peanuts"])
+    assert [recipe["recipe_name"] for recipe, _ in hits] == ["Mushroom Biryani"]
+    assert index.search("biryani", intolerances=["peanuts", "dairy"]) == []
+
+
+def test_lookup_returns_none_on_low_confidence() -> None:
+    index = _index()
+    assert index.lookup("biryani", max_results=3) is not None
+    assert index.lookup("biryani", max_results=4) is None
+    assert index.lookup("chicken biryani", max_results=2) is None
+    assert index.lookup("tiramisu") is None
+
+
+def test_duplicates_ignored_and_store_persisted(tmp_path: Path) -> None:
+    path = tmp_path / "recipes.jsonl"
+    index = _index(path)
+    assert not index.add(dict(RECIPES[0]))
+    index.add(
+        {
+            "recipe_name": "Mushroom Biryani",
+            "ingredients_preview": ["mushrooms", "rice"],
+        },
+        intolerances=["peanuts"],
+    )
+    reloaded = RecipeIndex(path=str(path))
+    assert len(reloaded) == len(RECIPES) + 1
+    assert len(reloaded.search("biryani", intolerances=["peanuts"])) == 1
+
+
+class InterleavingLock:
+    """Index lock that lets another add run as soon as the first add releases it."""
+
+    def __init__(self, index: RecipeIndex, recipe: dict[str, Any]) -> None:
+        self.lock = threading.Lock()
+        self.index = index
+        self.waiting = [recipe]
+
+    def __enter__(self) -> None:
+        self.lock.acquire()
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.lock.release()
+        if self.waiting:
+            self.index.add(self.waiting.pop())
+
+
+def test_concurrent_adds_persist_every_recipe(tmp_path: Path) -> None:
+    path = tmp_path / "recipes.jsonl"
+    index = RecipeIndex(path=str(path))
+    index._lock = InterleavingLock(
+        index, {"recipe_name": "Second", "ingredients_preview": ["rice"]}
+    )
+
+    index.add({"recipe_name": "First", "ingredients_preview": ["rice"]})
+
+    names = [
+        json.loads(line)["recipe"]["recipe_name"]
+        for line in path.read_text().splitlines()
+    ]
+    assert sorted(names) == ["First", "Second"]
@@ -0,0 +1,192 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+import time
+from types import SimpleNamespace
+from typing import Any
+
+import pytest
+import sub_agents.Recipe_Finder.agent as recipe_finder
+from sub_agents.Recipe_Finder.recipe_index import RecipeIndex
+
+from app.utils.resilience import (
+    AdaptiveLimiter,
+    Backoff,
+    CircuitBreaker,
+    CircuitOpenError,
+    ResiliencePolicy,
+)
+
+
+class ApiError(Exception):
+    """Shaped like google.genai.errors.APIError."""
+
+    def __init__(self, code: int, retry_after: str | None = None) -> None:
+        super().__init__(f"{code} error")
+        self.code = code
+        headers = {"retry-after": retry_after} if retry_after else {}
+        self.response = SimpleNamespace(headers=headers)
+
+
+class FakeEndpoint:
+    """Local endpoint injecting 429s and latency, tracking peak concurrency."""
+
+    def __init__(
+        self,
+        fail_first: int = 0,
+        code: int = 429,
+        latency: float = 0.0,
+        retry_after: str | None = None,
+    ) -> None:
+        self.fail_first = fail_first
+        self.code = code
+        self.latency = latency
+        self.retry_after = retry_after
+        self.calls = 0
+        self.active = self.peak = 0
+        self.lock = threading.Lock()
+
+    def __call__(self, value: str = "ok") -> str:
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+        try:
+            time.sleep(self.latency)
+            if call <= self.fail_first:
+                raise ApiError(self.code, self.retry_after)
+            return value
+        finally:
+            with self.lock:
+                self.active -= 1
+
+
+def _policy(**kwargs: Any) -> tuple[ResiliencePolicy, list[float]]:
+    sleeps: list[float] = []
+    kwargs.setdefault("backoff", Backoff(base_seconds=0.1, max_seconds=5))
+    policy = ResiliencePolicy("test", sleep=sleeps.append, **kwargs)
+    return policy, sleeps
+
+
+def test_retries_429_honoring_retry_after_and_lowers_limit() -> None:
+    endpoint = FakeEndpoint(fail_first=2, retry_after="2")
+    limiter = AdaptiveLimiter("test", initial=8, decrease_interval=0)
+    policy, sleeps = _policy(limiter=limiter)
+    assert policy.call(endpoint, "done") == "done"
+    assert endpoint.calls == 3
+    assert sleeps == [2.0, 2.0]
+    assert limiter.limit == pytest.approx(2 + 1 / 2)
+
+
+def test_non_retryable_errors_are_raised_at_once() -> None:
+    endpoint = FakeEndpoint(fail_first=1, code=400)
+    policy, sleeps = _policy()
+    with pytest.raises(ApiError):
+        policy.call(endpoint)
+    assert endpoint.calls == 1
+    assert sleeps == []
+
+
+def test_circuit_opens_and_fast_fails_with_fallback() -> None:
+    now = [0.0]
+    breaker = CircuitBreaker(
+        "test", failure_threshold=3, reset_timeout=10, clock=lambda: now[0]
+    )
+    endpoint = FakeEndpoint(fail_first=100, code=503)
+    policy, _ = _policy(max_attempts=3, breaker=breaker)
+
+    assert policy.call(endpoint, fallback=lambda e: "fallback") == "fallback"
+    assert breaker.state == CircuitBreaker.OPEN
+    calls = endpoint.calls
+    with pytest.raises(CircuitOpenError):
+        policy.call(endpoint)
+    assert endpoint.calls == calls
+
+    # After the cooldown a single probe closes the circuit again
+    now[0] = 11
+    endpoint.fail_first = 0
+    assert policy.call(endpoint, "recovered") == "recovered"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_queue_timeout_gives_back_the_probe() -> None:
+    now = [0.0]
+    breaker = CircuitBreaker(
+        "test", failure_threshold=1, reset_timeout=10, clock=lambda: now[0]
+    )
+    limiter = AdaptiveLimiter("test", initial=1, maximum=1)
+    policy, _ = _policy(
+        max_attempts=1, breaker=breaker, limiter=limiter, acquire_timeout=0
+    )
+    with pytest.raises(ApiError):
+        policy.call(FakeEndpoint(fail_first=1, code=503))
+    assert breaker.state == CircuitBreaker.OPEN
+
+    # The probe times out waiting for a concurrency slot
+    now[0] = 11
+    assert limiter.acquire()
+    with pytest.raises(TimeoutError):
+        policy.call(FakeEndpoint())
+    assert breaker.state == CircuitBreaker.HALF_OPEN
+
+    # The next call probes and closes the circuit
+    limiter.release()
+    assert policy.call(FakeEndpoint(), "recovered") == "recovered"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+
+def test_limiter_bounds_concurrency_under_load() -> None:
+    endpoint = FakeEndpoint(latency=0.02)
+    policy, _ = _policy(limiter=AdaptiveLimiter("test", initial=3, maximum=3))
+    threads = [
+        threading.Thread(target=policy.call, args=(endpoint,)) for _ in range(12)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert endpoint.calls == 12
+    assert endpoint.peak == 3
+    assert policy.limiter.inflight == 0
+
+
+def test_search_outage_error_is_cleared_once_search_recovers(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    outage = [True]
+
+    def search(**params: object) -> list[dict[str, Any]]:
+        if outage[0]:
+            raise CircuitOpenError("recipe_search")
+        return [
+            {
+                "recipe_name": "Dal",
+                "summary": "Lentils.",
+                "ingredients_preview": ["lentils"],
+            }
+        ]
+
+    monkeypatch.setattr(recipe_finder, "search_recipes_with_gemini", search)
+    monkeypatch.setattr(recipe_finder, "recipe_index", RecipeIndex())
+    tool_context = SimpleNamespace(state={}, invocation_id="inv-1")
+
+    assert asyncio.run(recipe_finder.google_search_tool("dal", tool_context)) == []
+    assert "unavailable" in tool_context.state["finder_error"]
+    outage[0] = False
+    tool_context.invocation_id = "inv-2"
+    assert asyncio.run(recipe_finder.google_search_tool("dal", tool_context))
+    assert tool_context.state["finder_error"] is None
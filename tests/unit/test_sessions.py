@@ -0,0 +1,237 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from typing import Any
+
+import pytest
+from google.adk.events import Event, EventActions
+from google.adk.sessions import InMemorySessionService, Session
+from google.genai import types
+
+from app.utils.sessions import (
+    CachingSessionService,
+    SessionServiceBuilder,
+    WriteBehindSessionService,
+)
+
+
+class CountingSessionService(InMemorySessionService):
+    """In-memory service recording appends, optionally failing some of them."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.appended: list[str] = []
+        self.fail_on: str | None = None
+
+    async def append_event(self, session: Session, event: Event) -> Event:
+        if event.invocation_id == self.fail_on:
+            raise ConnectionError("unavailable")
+        self.appended.append(event.invocation_id)
+        return await super().append_event(session, event)
+
+
+def _event(name: str, **state: Any) -> Event:
+    return Event(
+        author="user",
+        invocation_id=name,
+        content=types.Content(role="user", parts=[types.Part(text=name)]),
+        actions=EventActions(state_delta=state),
+    )
+
+
+async def _session(service: WriteBehindSessionService) -> Session:
+    return await service.create_session(app_name="app", user_id="user")
+
+
+def test_events_are_buffered_until_flush_with_read_your_writes() -> None:
+    async def run() -> None:
+        inner = CountingSessionService()
+        service = WriteBehindSessionService(inner, flush_interval_seconds=60)
+        session = await _session(service)
+        for i in range(3):
+            await service.append_event(
+                session, _event(f"e{i}", step=i, **{"temp:x": 1})
+            )
+        assert inner.appended == []
+        assert service.pending_events(session.id) == 3
+
+        read = await service.get_session(
+            app_name="app", user_id="user", session_id=session.id
+        )
+        assert read is not None
+        assert [e.invocation_id for e in read.events] == ["e0", "e1", "e2"]
+        assert read.state == {"step": 2}
+
+        await service.flush(session.id)
+        assert inner.appended == ["e0", "e1", "e2"]
+        stored = await inner.get_session(
+            app_name="app", user_id="user", session_id=session.id
+        )
+        assert stored is not None
+        assert stored.state == {"step": 2}
+        assert len(stored.events) == 3
+
+    asyncio.run(run())
+
+
+def test_batch_size_and_timer_trigger_flush() -> None:
+    async def run() -> None:
+        inner = CountingSessionService()
+        service = WriteBehindSessionService(
+            inner, max_batch_events=2, flush_interval_seconds=0.01
+        )
+        session = await _session(service)
+        await service.append_event(session, _event("e0"))
+        await service.append_event(session, _event("e1"))
+        await asyncio.sleep(0)
+        assert inner.appended == ["e0", "e1"]
+
+        await service.append_event(session, _event("e2"))
+        await asyncio.sleep(0.05)
+        assert inner.appended == ["e0", "e1", "e2"]
+
+    asyncio.run(run())
+
+
+def test_failed_flush_keeps_order_and_retries() -> None:
+    async def run() -> None:
+        inner = CountingSessionService()
+        service = WriteBehindSessionService(inner, flush_interval_seconds=60)
+        session = await _session(service)
+        for name in ("e0", "e1", "e2"):
+            await service.append_event(session, _event(name))
+        inner.fail_on = "e1"
+        with pytest.raises(ConnectionError):
+            await service.flush()
+        assert inner.appended == ["e0"]
+        assert service.pending_events() == 2
+
+        inner.fail_on = None
+        await service.flush()
+        assert inner.appended == ["e0", "e1", "e2"]
+        assert service.pending_events() == 0
+
+    asyncio.run(run())
+
+
+def test_flushed_and_idle_sessions_are_not_retained() -> None:
+    async def run() -> None:
+        inner = CountingSessionService()
+        service = WriteBehindSessionService(
+            inner, flush_interval_seconds=60, max_idle_sessions=2
+        )
+        sessions = [await _session(service) for _ in range(4)]
+        assert len(service._shadows) == 2
+
+        await asyncio.gather(
+            *(service.append_event(s, _event(f"e-{s.id}")) for s in sessions)
+        )
+        await asyncio.gather(service.flush(), service.flush())
+        assert len(inner.appended) == 4
+        assert not (
+            service._pending or service._views or service._shadows or service._locks
+        )
+
+    asyncio.run(run())
+
+
+def test_session_cache_serves_repeated_reads_and_tracks_appends(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    async def run() -> None:
+        inner = CountingSessionService()
+        service = CachingSessionService(inner)
+        created = await service.create_session(app_name="app", user_id="user")
+
+        reads = 0
+        original_get = inner.get_session
+
+        async def counting_get(**kwargs: Any) -> Session | None:
+            nonlocal reads
+            reads += 1
+            return await original_get(**kwargs)
+
+        monkeypatch.setattr(inner, "get_session", counting_get)
+        session = await service.get_session(
+            app_name="app", user_id="user", session_id=created.id
+        )
+        assert session is not None
+        await service.append_event(session, _event("e0", step=1, **{"temp:x": 1}))
+        await service.append_event(session, _event("e1", step=2))
+
+        cached = await service.get_session(
+            app_name="app", user_id="user", session_id=session.id
+        )
+        assert cached is not None
+        assert reads == 0
+        assert [e.invocation_id for e in cached.events] == ["e0", "e1"]
+        assert cached.state == {"step": 2}
+        assert cached.last_update_time == session.last_update_time
+
+        # An append on an outdated copy drops the entry
+        stale = cached.model_copy(deep=True)
+        await service.append_event(session, _event("e2"))
+        stale.last_update_time -= 1
+        await service.append_event(stale, _event("e3"))
+        assert len(service) == 0
+        await service.get_session(app_name="app", user_id="user", session_id=session.id)
+        assert reads == 1
+
+    asyncio.run(run())
+
+
+def test_session_cache_without_write_behind_has_nothing_to_flush() -> None:
+    service = CachingSessionService(InMemorySessionService())
+    asyncio.run(service.flush("session"))
+
+
+def test_session_cache_evicts_least_recently_used_by_bytes() -> None:
+    async def run() -> None:
+        service = CachingSessionService(InMemorySessionService(), max_bytes=10_000)
+        sessions = [
+            await service.create_session(app_name="app", user_id="user")
+            for _ in range(3)
+        ]
+        for session in sessions:
+            for _ in range(10):
+                await service.append_event(session, _event("x" * 300))
+        assert service.size_bytes <= 10_000
+        assert len(service) < 3
+
+    asyncio.run(run())
+
+
+def test_builder_enables_session_cache_only_when_sized(
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    builder = SessionServiceBuilder(InMemorySessionService)
+
+    assert type(builder()) is InMemorySessionService
+    monkeypatch.setenv("SESSION_CACHE_BYTES", "1048576")
+    service = builder()
+    assert isinstance(service, CachingSessionService)
+    assert service.max_bytes == 1048576
+
+
+def test_builder_warns_that_write_behind_is_not_crash_safe(
+    monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture
+) -> None:
+    builder = SessionServiceBuilder(InMemorySessionService)
+
+    assert type(builder()) is InMemorySessionService
+    assert not caplog.records
+    monkeypatch.setenv("SESSION_WRITE_BEHIND", "true")
+    assert isinstance(builder(), WriteBehindSessionService)
+    assert "lost if the process crashes" in caplog.text
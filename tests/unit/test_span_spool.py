@@ -0,0 +1,222 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+import time
+from collections.abc import Sequence
+from pathlib import Path
+
+import pytest
+from opentelemetry.sdk.trace import ReadableSpan, TracerProvider
+from opentelemetry.sdk.trace.export import (
+    SimpleSpanProcessor,
+    SpanExporter,
+    SpanExportResult,
+)
+
+from app.utils.metrics import metrics
+from app.utils.resilience import Backoff
+from app.utils.span_spool import (
+    MmapRingBuffer,
+    SpoolingSpanExporter,
+    SpoolLockedError,
+    deserialize_span,
+    open_spool,
+    serialize_span,
+)
+
+
+class FlakyExporter(SpanExporter):
+    """Fake backend that is down for its first `outages` exports, and slow."""
+
+    def __init__(self, outages: int = 0, delay: float = 0.0) -> None:
+        self.outages = outages
+        self.delay = delay
+        self.attempts = 0
+        self.exported: list[str] = []
+        self.lock = threading.Lock()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        time.sleep(self.delay)
+        with self.lock:
+            self.attempts += 1
+            if self.attempts <= self.outages:
+                if self.attempts % 2:
+                    raise ConnectionError("backend unavailable")
+                return SpanExportResult.FAILURE
+            self.exported.extend(span.name for span in spans)
+        return SpanExportResult.SUCCESS
+
+
+def _spans(count: int) -> list[ReadableSpan]:
+    captured: list[ReadableSpan] = []
+
+    class Capture(SpanExporter):
+        def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+            captured.extend(spans)
+            return SpanExportResult.SUCCESS
+
+    provider = TracerProvider()
+    provider.add_span_processor(SimpleSpanProcessor(Capture()))
+    tracer = provider.get_tracer("test")
+    with tracer.start_as_current_span("turn"):
+        for i in range(count - 1):
+            with tracer.start_as_current_span(
+                f"span-{i}", attributes={"i": i, "tags": ["a", "b"]}
+            ) as span:
+                span.add_event("called", {"tool": "search"})
+    return captured
+
+
+def test_span_round_trip() -> None:
+    span = _spans(2)[0]
+    copy = deserialize_span(serialize_span(span))
+    assert copy.name == span.name
+    assert copy.get_span_context() == span.get_span_context()
+    assert copy.parent is not None and span.parent is not None
+    assert copy.parent.span_id == span.parent.span_id
+    assert copy.attributes == {"i": 0, "tags": ("a", "b")}
+    assert copy.events[0].attributes is not None
+    assert copy.events[0].attributes["tool"] == "search"
+    assert (copy.start_time, copy.end_time) == (span.start_time, span.end_time)
+    assert copy.to_json() == span.to_json()
+
+
+def test_ring_buffer_wraps_overwrites_and_persists(tmp_path: Path) -> None:
+    path = str(tmp_path / "spans.spool")
+    ring = MmapRingBuffer(path, capacity_bytes=40 + 100)
+    for i in range(5):
+        ring.append(f"record-{i}".encode() * 2)  # 4 + 16 bytes each, fills it
+    ring.commit(3)
+    for i in range(6, 9):
+        ring.append(f"record-{i}".encode() * 2)
+    assert ring.peek(10)[0] == b"record-3" * 2
+
+    overwritten = metrics.counter("spool.overwritten")
+    ring.append(b"x" * 40)
+    assert metrics.counter("spool.overwritten") > overwritten
+    assert ring.peek(10)[-1] == b"x" * 40
+    records = ring.peek(10)
+    ring.close()
+
+    reopened = MmapRingBuffer(path, capacity_bytes=40 + 100)
+    assert reopened.peek(10) == records
+    assert not reopened.append(b"y" * 200)
+
+
+def test_commit_keeps_records_appended_over_the_read_ones(tmp_path: Path) -> None:
+    ring = MmapRingBuffer(str(tmp_path / "spans.spool"), capacity_bytes=40 + 100)
+    for i in range(5):
+        ring.append(f"record-{i}".encode() * 2)
+    first, delivered = ring.read(2)
+    # Overwrites record-0 while records 0 and 1 are being delivered
+    ring.append(b"record-5" * 2)
+    ring.commit(len(delivered), first)
+    assert ring.peek(10) == [f"record-{i}".encode() * 2 for i in range(2, 6)]
+
+
+class BlockingExporter(FlakyExporter):
+    """Fake backend whose first export waits until it is released."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.started = threading.Event()
+        self.released = threading.Event()
+
+    def export(self, spans: Sequence[ReadableSpan]) -> SpanExportResult:
+        if not self.started.is_set():
+            self.started.set()
+            assert self.released.wait(5)
+        return super().export(spans)
+
+
+def test_spans_overwritten_during_an_export_do_not_drop_newer_ones(
+    tmp_path: Path,
+) -> None:
+    backend = BlockingExporter()
+    exporter = SpoolingSpanExporter(
+        backend,
+        str(tmp_path / "spans.spool"),
+        capacity_bytes=8 * 1024,
+        idle_interval=0.01,
+    )
+    spans = _spans(40)
+    exporter.export(spans[:1])
+    assert backend.started.wait(5)
+    # A burst overwrites the span being exported and some of its own spans
+    overwritten = metrics.counter("spool.overwritten")
+    exporter.export(spans[1:])
+    assert metrics.counter("spool.overwritten") > overwritten
+    spooled = [
+        deserialize_span(record).name for record in exporter.spool.peek(len(spans))
+    ]
+
+    backend.released.set()
+    assert exporter.force_flush(5000)
+    assert backend.exported == [spans[0].name, *spooled]
+    exporter.shutdown()
+
+
+def test_outage_neither_blocks_nor_loses_spans(tmp_path: Path) -> None:
+    backend = FlakyExporter(outages=3, delay=0.05)
+    exporter = SpoolingSpanExporter(
+        backend,
+        str(tmp_path / "spans.spool"),
+        capacity_bytes=1024 * 1024,
+        batch_size=16,
+        backoff=Backoff(base_seconds=0.01, max_seconds=0.02),
+        idle_interval=0.01,
+    )
+    spans = _spans(50)
+
+    start = time.perf_counter()
+    for i in range(0, len(spans), 10):
+        assert exporter.export(spans[i : i + 10]) is SpanExportResult.SUCCESS
+    assert time.perf_counter() - start < 0.05
+
+    assert exporter.force_flush(5000)
+    assert backend.exported == [span.name for span in spans]
+    exporter.shutdown()
+
+
+def test_spooled_spans_survive_a_restart(tmp_path: Path) -> None:
+    path = str(tmp_path / "spans.spool")
+    down = FlakyExporter(outages=10**6)
+    exporter = SpoolingSpanExporter(
+        down, path, backoff=Backoff(0.01, 0.01), idle_interval=0.01
+    )
+    exporter.export(_spans(5))
+    exporter.shutdown(timeout_millis=50)
+
+    backend = FlakyExporter()
+    restarted = SpoolingSpanExporter(backend, path, idle_interval=0.01)
+    assert restarted.force_flush(5000)
+    assert len(backend.exported) == 5
+    restarted.shutdown()
+
+
+def test_spool_files_are_not_shared_between_processes(tmp_path: Path) -> None:
+    path = str(tmp_path / "spans.spool")
+    first = open_spool(path, 1024)
+    # Another open file description contends for the lock like another process would
+    with pytest.raises(SpoolLockedError):
+        MmapRingBuffer(path, 1024)
+    second = open_spool(path, 1024)
+    assert (first.path, second.path) == (path, f"{path}.1")
+
+    first.close()
+    reopened = open_spool(path, 1024)
+    assert reopened.path == path
+    reopened.close()
+    second.close()
@@ -0,0 +1,152 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import threading
+from concurrent.futures import Future
+from types import SimpleNamespace
+
+import pytest
+import sub_agents.Recipe_Finder.agent as recipe_finder
+from sub_agents.Recipe_Finder.recipe_index import RecipeIndex
+
+from app.utils.metrics import metrics
+from app.utils.speculation import Speculator, enabled_kinds
+
+
+def _done(value: object) -> Future:
+    future: Future = Future()
+    future.set_result(value)
+    return future
+
+
+def test_only_exact_requests_are_served_within_the_turn() -> None:
+    speculator = Speculator()
+    speculator.start("test_exact", "a", lambda: _done(1))
+    assert metrics.counter("speculation.test_exact.started") == 0
+
+    with speculator.turn("turn"):
+        speculator.start("test_exact", "a", lambda: _done(1))
+        assert speculator.get("test_exact", "b") is None
+        served = speculator.get("test_exact", "a")
+        assert served is not None and served.result() == 1
+    assert speculator.get("test_exact", "a") is None
+    assert metrics.counter("speculation.test_exact.hit") == 1
+
+
+def test_unused_speculations_are_cancelled_and_counted_as_misses() -> None:
+    speculator = Speculator()
+    pending: Future = Future()
+    with speculator.turn("used"):
+        speculator.start("test_miss", "a", lambda: _done(1))
+        speculator.get("test_miss", "a")
+    with speculator.turn("unused"):
+        speculator.start("test_miss", "a", lambda: pending)
+    assert pending.cancelled()
+    assert metrics.snapshot()["gauges"]["speculation.test_miss.hit_rate"] == 0.5
+
+
+def test_guess_search_params() -> None:
+    guess = recipe_finder.guess_search_params
+    assert guess("I want the recipe of chicken biriyani")["query"] == "chicken biriyani"
+    assert guess("How do I make pad thai? I am allergic to peanuts and shellfish.") == {
+        "query": "pad thai",
+        "diet": None,
+        "intolerances": ["peanuts", "shellfish"],
+        "cuisine": "Thai",
+    }
+    assert guess("Give me a vegan lasagna recipe please")["diet"] == "vegan"
+    assert guess("I need a weekly diet plan for weight loss") is None
+
+
+@pytest.fixture
+def search_calls(monkeypatch: pytest.MonkeyPatch) -> list[dict]:
+    calls: list[dict] = []
+
+    def search(**params: object) -> list[dict]:
+        calls.append({**params, "thread": threading.get_ident()})
+        return [
+            {
+                "recipe_name": "Chicken Biryani",
+                "summary": "Spiced rice with chicken.",
+                "ingredients_preview": ["chicken", "rice"],
+            }
+        ]
+
+    monkeypatch.setattr(recipe_finder, "search_recipes_with_gemini", search)
+    monkeypatch.setattr(recipe_finder, "recipe_index", RecipeIndex())
+    return calls
+
+
+@pytest.mark.parametrize(
+    "tool_query, speculated",
+    [
+        ("{'query': 'Chicken  Biriyani'}", True),
+        ("{'query': 'chicken biriyani', 'cuisine': 'Indian'}", False),
+    ],
+)
+def test_search_tool_uses_matching_speculation(
+    search_calls: list[dict],
+    tool_query: str,
+    speculated: bool,
+    monkeypatch: pytest.MonkeyPatch,
+) -> None:
+    speculator = Speculator()
+    monkeypatch.setattr(recipe_finder, "speculator", speculator)
+    tool_context = SimpleNamespace(state={}, invocation_id="inv-1")
+    with speculator.turn("turn"):
+        recipe_finder.speculate_recipe_search("I want the recipe of chicken biriyani")
+        recipes = asyncio.run(
+            recipe_finder.google_search_tool(tool_query, tool_context)
+        )
+    assert recipes[0]["recipe_name"] == "Chicken Biryani"
+    # The tool searched on its own only when its parameters differed, and
+    # off the event loop's thread
+    own = [call for call in search_calls if call["cuisine"] == "Indian"]
+    assert bool(own) != speculated
+    assert all(call["thread"] != threading.get_ident() for call in own)
+
+
+def test_memory_prefetch_is_shared_by_the_turn(monkeypatch: pytest.MonkeyPatch) -> None:
+    from app.agent_engine_app import CustomMemoryBankService
+
+    retrievals = []
+
+    async def retrieve(**scope: str) -> str:
+        retrievals.append(scope)
+        await asyncio.sleep(0)
+        return "memories"
+
+    service = CustomMemoryBankService(agent_engine_id="123")
+    monkeypatch.setattr(service, "_search_memory", retrieve)
+
+    async def turn() -> list[str]:
+        from app.utils.speculation import speculator
+
+        with speculator.turn("turn"):
+            service.prefetch(app_name="app", user_id="u", query="hi")
+            return [
+                await service.search_memory(app_name="app", user_id="u", query="hi"),
+                await service.search_memory(app_name="app", user_id="u", query="hi"),
+            ]
+
+    assert asyncio.run(turn()) == ["memories", "memories"]
+    assert len(retrievals) == 1
+
+
+def test_only_memory_is_speculated_by_default(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.delenv("SPECULATIVE_PREFETCH", raising=False)
+    assert enabled_kinds() == {"memory"}
+    monkeypatch.setenv("SPECULATIVE_PREFETCH", "memory, search")
+    assert enabled_kinds() == {"memory", "search"}
@@ -0,0 +1,126 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+from collections.abc import AsyncIterator
+from typing import Any
+
+import pytest
+from google.adk.agents.run_config import RunConfig, StreamingMode
+
+from app.utils.streaming import StreamingPolicy, shape_stream
+
+
+def _event(
+    author: str, text: str | None = None, partial: bool = True, **part: Any
+) -> dict[str, Any]:
+    parts = [{"text": text, **part}] if text is not None else [part]
+    return {
+        "author": author,
+        "invocation_id": "inv-1",
+        "partial": partial,
+        "content": {"role": "model", "parts": parts},
+    }
+
+
+def _shape(
+    events: list[dict[str, Any]], policy: StreamingPolicy, times: list[float]
+) -> list[dict[str, Any]]:
+    clock = iter(times)
+
+    async def source() -> AsyncIterator[dict[str, Any]]:
+        for event in events:
+            yield event
+
+    async def collect() -> list[dict[str, Any]]:
+        return [
+            event
+            async for event in shape_stream(source(), policy, clock=lambda: next(clock))
+        ]
+
+    return asyncio.run(collect())
+
+
+def _texts(events: list[dict[str, Any]]) -> list[str]:
+    return [event["content"]["parts"][0].get("text") for event in events]
+
+
+def test_run_config_defaults_to_sse() -> None:
+    policy = StreamingPolicy()
+
+    assert (
+        RunConfig.model_validate(policy.run_config(None)).streaming_mode
+        == StreamingMode.SSE
+    )
+    assert policy.run_config({"max_llm_calls": 5}) == {
+        "max_llm_calls": 5,
+        "streaming_mode": "sse",
+    }
+    assert policy.run_config({"streaming_mode": None}) == {"streaming_mode": None}
+    assert StreamingPolicy(sse=False).run_config(None) is None
+
+
+def test_from_env(monkeypatch: pytest.MonkeyPatch) -> None:
+    monkeypatch.setenv("STREAM_SSE", "false")
+    monkeypatch.setenv("STREAM_VISIBLE_AGENTS", "final_agent, root_agent")
+    monkeypatch.setenv("STREAM_FLUSH_MS", "50")
+
+    assert StreamingPolicy.from_env() == StreamingPolicy(
+        sse=False, visible_agents=["final_agent", "root_agent"], flush_ms=50
+    )
+
+
+def test_internal_partials_are_suppressed() -> None:
+    events = [
+        _event("user_requirement_agent", '{"diet": '),
+        _event("user_requirement_agent", '{"diet": "vegan"}', partial=False),
+        _event("recipe_finder_agent", "Searching"),
+        _event(
+            "recipe_finder_agent",
+            partial=False,
+            function_call={"name": "google_search_tool"},
+        ),
+    ]
+
+    shaped = _shape(events, StreamingPolicy(), [0.0] * 10)
+
+    assert shaped == [events[1], events[3]]
+
+
+def test_small_chunks_are_coalesced_per_flush_interval() -> None:
+    events = [_event("final_agent", text) for text in ("Here ", "is ", "your ", "plan")]
+    events.append(_event("root_agent", "Saved"))
+
+    # started, then (arrival, [flush]) per chunk
+    shaped = _shape(
+        events,
+        StreamingPolicy(flush_ms=100),
+        [0.0, 0.2, 0.2, 0.21, 0.25, 0.35, 0.35, 0.4, 0.4, 0.4, 0.4],
+    )
+
+    assert _texts(shaped) == ["Here ", "is your ", "plan", "Saved"]
+    assert all(event["partial"] for event in shaped)
+
+
+def test_final_event_supersedes_buffered_chunks() -> None:
+    events = [
+        _event("final_agent", "Here "),
+        _event("final_agent", "is "),
+        _event("final_agent", "Here is your plan", partial=False),
+    ]
+
+    shaped = _shape(events, StreamingPolicy(flush_ms=100), [0.0, 0.2, 0.2, 0.25, 0.3])
+
+    assert _texts(shaped) == ["Here ", "Here is your plan"]
+    assert shaped[-1]["partial"] is False
@@ -0,0 +1,120 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import io
+import json
+import logging
+import queue
+from collections.abc import Iterator
+from types import SimpleNamespace
+from typing import cast
+
+import pytest
+from google.adk.agents.invocation_context import InvocationContext
+
+from app.utils.metrics import metrics
+from app.utils.structured_logging import (
+    BoundedQueueHandler,
+    CorrelationPlugin,
+    RateLimitFilter,
+    configure_logging,
+    correlation_ids,
+    parse_levels,
+    shutdown_logging,
+)
+
+
+@pytest.fixture
+def log_stream() -> Iterator[io.StringIO]:
+    root = logging.getLogger()
+    handlers, level = list(root.handlers), root.level
+    stream = io.StringIO()
+    configure_logging(level="INFO", levels={"test.quiet": "WARNING"}, stream=stream)
+    yield stream
+    shutdown_logging()
+    root.handlers[:] = handlers
+    root.setLevel(level)
+    logging.getLogger("test.quiet").setLevel(logging.NOTSET)
+
+
+def _lines(stream: io.StringIO) -> list[dict]:
+    shutdown_logging()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_records_are_json_with_correlation_ids(log_stream: io.StringIO) -> None:
+    plugin = CorrelationPlugin()
+    context = cast(
+        InvocationContext,
+        SimpleNamespace(
+            invocation_id="e-1", session=SimpleNamespace(id="s-1"), user_id="u-1"
+        ),
+    )
+
+    async def run() -> None:
+        await plugin.before_run_callback(invocation_context=context)
+        # Ids follow the run into worker threads
+        await asyncio.to_thread(
+            logging.getLogger("test.app").info, "tool %s done", "search"
+        )
+        await plugin.after_run_callback(invocation_context=context)
+        assert correlation_ids() == {}
+
+    asyncio.run(run())
+    logging.getLogger("test.quiet").info("hidden by its module level")
+    try:
+        raise ValueError("boom")
+    except ValueError:
+        logging.getLogger("test.quiet").exception("failed")
+
+    lines = _lines(log_stream)
+    assert lines[0]["message"] == "tool search done"
+    assert (lines[0]["invocation_id"], lines[0]["session_id"], lines[0]["user_id"]) == (
+        "e-1",
+        "s-1",
+        "u-1",
+    )
+    assert lines[0]["severity"] == "INFO"
+    assert [line["message"] for line in lines] == ["tool search done", "failed"]
+    assert "ValueError: boom" in lines[1]["exception"]
+
+
+def test_rate_limit_samples_past_the_burst() -> None:
+    limiter = RateLimitFilter(burst=3, interval=60, sample_every=10)
+
+    def record(level: int = logging.INFO) -> logging.LogRecord:
+        return logging.LogRecord("test", level, __file__, 1, "progress %d", (1,), None)
+
+    allowed = [r for r in (record() for _ in range(25)) if limiter.filter(r)]
+    assert len(allowed) == 5
+    assert getattr(allowed[3], "suppressed", None) == 9
+    assert limiter.filter(record(logging.WARNING))
+
+
+def test_full_queue_drops_instead_of_blocking() -> None:
+    dropped = metrics.counter("logging.dropped")
+    handler = BoundedQueueHandler(queue.Queue(maxsize=1))
+    logger = logging.Logger("test.full")
+    logger.addHandler(handler)
+    logger.warning("first")
+    logger.warning("second")
+    assert metrics.counter("logging.dropped") == dropped + 1
+
+
+def test_parse_levels() -> None:
+    assert parse_levels("app.utils.drive=warning, google_adk=INFO,bad") == {
+        "app.utils.drive": "WARNING",
+        "google_adk": "INFO",
+    }
@@ -0,0 +1,242 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import asyncio
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+from google.adk.events import Event
+from google.adk.memory.base_memory_service import (
+    BaseMemoryService,
+    SearchMemoryResponse,
+)
+from google.adk.memory.memory_entry import MemoryEntry
+from google.adk.sessions.session import Session
+from google.genai import types
+
+from app.utils.vector_memory import (
+    HashingEmbedder,
+    LocalVectorMemoryService,
+    TieredMemoryService,
+)
+
+FACTS = [
+    "I am allergic to peanuts",
+    "I follow a vegetarian diet",
+    "My favourite cuisine is Korean food",
+]
+
+
+def _memory(text: str) -> MemoryEntry:
+    return MemoryEntry(
+        author="user", content=types.Content(role="user", parts=[types.Part(text=text)])
+    )
+
+
+def _texts(response: SearchMemoryResponse) -> list[str | None]:
+    return [
+        memory.content.parts[0].text
+        for memory in response.memories
+        if memory.content.parts
+    ]
+
+
+class FakeMemoryBank(BaseMemoryService):
+    def __init__(self, memories: list[str]) -> None:
+        self.memories = memories
+        self.searches = 0
+        self.sessions: list[Session] = []
+
+    async def add_session_to_memory(self, session: Session) -> None:
+        self.sessions.append(session)
+
+    async def search_memory(
+        self, *, app_name: str, user_id: str, query: str
+    ) -> SearchMemoryResponse:
+        self.searches += 1
+        return SearchMemoryResponse(memories=[_memory(self.memories[0])])
+
+    async def list_memories(
+        self, *, app_name: str, user_id: str
+    ) -> SearchMemoryResponse:
+        return SearchMemoryResponse(memories=[_memory(text) for text in self.memories])
+
+
+def test_hashing_embedder_is_deterministic_and_normalized() -> None:
+    first = HashingEmbedder(dimension=64).embed(["peanut allergy", ""])
+    second = HashingEmbedder(dimension=64).embed(["peanut allergy", ""])
+
+    np.testing.assert_array_equal(first, second)
+    assert np.isclose(np.linalg.norm(first[0]), 1.0)
+    assert not first[1].any()
+
+
+def test_search_ranks_a_users_memories_only() -> None:
+    service = LocalVectorMemoryService()
+    service.add("app", "alice", [{"text": text, "author": "user"} for text in FACTS])
+    service.add(
+        "app", "bob", [{"text": "I am allergic to shellfish", "author": "user"}]
+    )
+
+    response = asyncio.run(
+        service.search_memory(app_name="app", user_id="alice", query="peanuts allergic")
+    )
+
+    assert _texts(response)[0] == FACTS[0]
+    assert "I am allergic to shellfish" not in _texts(response)
+    assert (
+        asyncio.run(
+            service.search_memory(app_name="app", user_id="carol", query="peanuts")
+        ).memories
+        == []
+    )
+
+
+def test_add_deduplicates_and_caps_per_user() -> None:
+    service = LocalVectorMemoryService(max_entries_per_user=2)
+
+    assert (
+        service.add("app", "alice", [{"text": text} for text in FACTS + FACTS[:1]]) == 3
+    )
+    assert service.add("app", "alice", [{"text": FACTS[2]}]) == 0
+    assert len(service) == 2
+    assert [
+        entry["text"] for entry, _ in service.search("app", "alice", "peanuts")
+    ] == []
+
+
+def test_add_session_indexes_compacted_events() -> None:
+    service = LocalVectorMemoryService()
+    session = Session(
+        id="s1",
+        app_name="app",
+        user_id="alice",
+        events=[
+            Event(
+                author="user",
+                invocation_id="i1",
+                content=types.Content(role="user", parts=[types.Part(text=FACTS[1])]),
+            ),
+            Event(
+                author="final_agent",
+                invocation_id="i1",
+                content=types.Content(
+                    role="model", parts=[types.Part(text="Here is a vegetarian plan")]
+                ),
+            ),
+        ],
+    )
+
+    asyncio.run(service.add_session_to_memory(session))
+
+    results = service.search("app", "alice", "vegetarian diet")
+    assert [entry["text"] for entry, _ in results] == [
+        FACTS[1],
+        "Here is a vegetarian plan",
+    ]
+    assert results[1][0]["author"] == "model"
+
+
+def test_index_is_persisted_per_user(tmp_path: Path) -> None:
+    path = str(tmp_path / "memory")
+    service = LocalVectorMemoryService(path=path)
+    service.add("app", "alice", [{"text": text} for text in FACTS])
+    service.add("app", "bob", [{"text": "I am allergic to shellfish"}])
+    files = {
+        name: os.stat(os.path.join(path, name)).st_mtime_ns for name in os.listdir(path)
+    }
+    assert len(files) == 2
+
+    # Only the changed user's file is rewritten
+    time.sleep(0.01)
+    service.add("app", "bob", [{"text": "I like spicy food"}])
+    changed = [
+        name
+        for name in files
+        if os.stat(os.path.join(path, name)).st_mtime_ns != files[name]
+    ]
+    assert len(changed) == 1
+
+    reloaded = LocalVectorMemoryService(path=path)
+    assert len(reloaded) == 5
+    assert reloaded.search("app", "alice", "korean food")[0][0]["text"] == FACTS[2]
+    reloaded.forget("app", "bob")
+    assert len(os.listdir(path)) == 1
+
+    # Vectors of another embedder are not reused
+    assert (
+        len(LocalVectorMemoryService(embedder=HashingEmbedder(dimension=32), path=path))
+        == 0
+    )
+
+
+def test_concurrent_adds_of_a_user_are_saved(tmp_path: Path) -> None:
+    path = str(tmp_path / "memory")
+    service = LocalVectorMemoryService(path=path)
+
+    def add_many(thread: int) -> None:
+        for i in range(50):
+            service.add("app", "alice", [{"text": f"fact {thread}-{i}"}])
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        list(executor.map(add_many, range(4)))
+    assert os.listdir(path) == [os.path.basename(service._file_path(("app", "alice")))]
+    assert len(LocalVectorMemoryService(path=path)) == 200
+
+
+def test_tiered_serves_hot_users_locally() -> None:
+    async def scenario() -> None:
+        remote = FakeMemoryBank(FACTS)
+        tiered = TieredMemoryService(remote, LocalVectorMemoryService())
+
+        miss = await tiered.search_memory(
+            app_name="app", user_id="alice", query="korean food"
+        )
+        assert _texts(miss) == [FACTS[0]]
+        await asyncio.gather(*tiered._loading.values())
+        assert tiered.is_hot("app", "alice")
+
+        hit = await tiered.search_memory(
+            app_name="app", user_id="alice", query="korean food"
+        )
+        assert _texts(hit)[0] == FACTS[2]
+        assert remote.searches == 1
+
+    asyncio.run(scenario())
+
+
+def test_tiered_evicts_least_recently_used_users() -> None:
+    async def scenario() -> None:
+        now = [0.0]
+        local = LocalVectorMemoryService()
+        tiered = TieredMemoryService(
+            FakeMemoryBank(FACTS),
+            local,
+            max_hot_users=1,
+            hot_ttl_seconds=10,
+            clock=lambda: now[0],
+        )
+        for user in ("alice", "bob"):
+            await tiered.search_memory(app_name="app", user_id=user, query="diet")
+            await asyncio.gather(*tiered._loading.values())
+
+        assert not tiered.is_hot("app", "alice") and not local.has_user("app", "alice")
+        assert tiered.is_hot("app", "bob")
+        now[0] = 11
+        assert not tiered.is_hot("app", "bob")
+
+    asyncio.run(scenario())
@@ -0,0 +1,41 @@
+# Copyright 2025 Google LLC
+#
+# Licensed under the Apache License, Version 2.0 (the "License");
+# you may not use this file except in compliance with the License.
+# You may obtain a copy of the License at
+#
+#     http://www.apache.org/licenses/LICENSE-2.0
+#
+# Unless required by applicable law or agreed to in writing, software
+# distributed under the License is distributed on an "AS IS" BASIS,
+# WITHOUT WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied.
+# See the License for the specific language governing permissions and
+# limitations under the License.
+
+import threading
+from collections.abc import Callable
+
+from app.utils.metrics import metrics
+from app.utils.warmup import run_warmup
+
+
+def test_warmup_runs_tasks_concurrently_and_skips_failures() -> None:
+    # Each task waits for the other, so they only finish if they overlap
+    both_started = threading.Barrier(2, timeout=5)
+
+    def meeting(value: str) -> Callable[[], str]:
+        def task() -> str:
+            both_started.wait()
+            return value
+
+        return task
+
+    def broken() -> None:
+        raise RuntimeError("no credentials")
+
+    results = run_warmup({"a": meeting("a"), "b": meeting("b"), "broken": broken})
+
+    assert results == {"a": "a", "b": "b"}
+    snapshot = metrics.snapshot()
+    assert "startup.warmup.a_ms" in snapshot["gauges"]
+    assert metrics.counter("startup.warmup.broken_error") >= 1